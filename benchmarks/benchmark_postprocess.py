@@ -0,0 +1,617 @@
+"""Benchmark the result post-processing components outside of Grasshopper.
+
+The benchmark generates synthetic annual results folders and runs the source of
+the result components on them with light-weight stand-ins for the Rhino and
+Grasshopper modules. The wall time and peak memory of each run are reported as
+JSON such that the performance of the components can be compared release over
+release.
+
+The following results folders are generated for each benchmark:
+    * legacy - .ill text files as written by older versions of the recipes
+    * legacy_dgp - .dgp text files of an imageless annual glare study (--dgp)
+    * numpy - NumPy arrays of static apertures, processed with the
+        honeybee-radiance-postprocess CLI
+    * numpy_dynamic - NumPy arrays with an aperture group of two states and a
+        dynamic schedule connected to the component (--dynamic)
+
+Each run of a component happens in a new Python process and reports:
+    * import - seconds to run the component imports and helper definitions
+    * cold - seconds for the first solution, without any caches
+    * warm - seconds for a second solution with the same inputs
+    * peak_rss_mb - peak resident memory of the component process
+    * child_peak_rss_mb - peak resident memory of the largest child process
+        such as the post-process worker (only available on Unix)
+    * python_peak_mb - peak memory allocated by Python during the cold solution
+        (only with --trace-memory, which slows down the cold solution)
+
+The same components of an older revision of this repository can be run on the
+same results folders by giving a git revision such as a release tag (--baseline).
+The runs of the revision are reported under baseline for each component, along
+with the speedup of the best cold time of this checkout over that of the revision.
+Components that fail or do not exist in the revision report its error instead.
+
+The .ill reader of HB Annual Results to Data can also be compared against the
+reader that it replaced, which split and converted every value of every row
+(--ill-reader). Each reader is timed on the legacy folder for all sensors and for
+a selection of 1% of the sensors and reports:
+    * seconds - seconds to create the data collections on the first read
+    * python_peak_mb - peak memory allocated by Python while reading
+    * new_warm_seconds - seconds for a second read with the new reader, which
+        uses the row index that the first read wrote for selected sensors
+    * speedup - seconds of the previous reader over those of the new reader
+
+The components that process the grids of legacy folders with several threads can
+also be run with a cpu_count_ of 1, 2, 4 and so on up to the number of processors
+or grids (--cpu-sweep) or with a list of cpu_count_ (--cpu-sweep 1 2 4 8). Each cpu_count_ reports the best cold seconds over the
+repeated runs and the speedup against the serial run with a cpu_count_ of 1.
+Note that the threads of CPython share one interpreter lock and so they scale
+less than those of IronPython inside of Grasshopper.
+
+Usage:
+    python benchmarks/benchmark_postprocess.py --grids 4 --sensors 1000 \\
+        --hours 4380 --dgp --dynamic --baseline master > bench_output.txt
+"""
+import os
+import io
+import sys
+import json
+import time
+import types
+import uuid
+import shutil
+import argparse
+import platform
+import tarfile
+import tempfile
+import subprocess
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import numpy
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_FOLDER = os.path.join(ROOT, 'honeybee_grasshopper_radiance', 'src')
+sys.path.insert(0, ROOT)  # the components import the package of this checkout
+COMPONENTS = {
+    'results_to_data': 'HB Annual Results to Data',
+    'peak_values': 'HB Annual Peak Values',
+    'average_values': 'HB Annual Average Values',
+    'cumulative_values': 'HB Annual Cumulative Values',
+    'statistics': 'HB Annual Statistics',
+    'daylight_metrics': 'HB Annual Daylight Metrics',
+    'batch_metrics': 'HB Annual Batch Metrics',
+    'control_schedule': 'HB Daylight Control Schedule',
+    'glare_metrics': 'HB Annual Glare Metrics'
+}
+FOLDER_TYPES = {  # results folders of the components that cannot process all of them
+    'statistics': ('numpy', 'numpy_dynamic'),
+    'batch_metrics': ('numpy', 'numpy_dynamic'),
+    'daylight_metrics': ('legacy', 'numpy', 'numpy_dynamic'),
+    'control_schedule': ('legacy', 'numpy', 'numpy_dynamic'),
+    'glare_metrics': ('legacy_dgp',)
+}
+APERTURE_GROUP = 'ApertureGroup_1'
+REQUIRED = [True]  # switch to only load a component without solving it
+
+
+def _sun_up_steps(hours, timestep, rng):
+    """Get a sorted array of the sun-up timesteps of the year."""
+    steps = 8760 * timestep
+    assert hours <= steps, \
+        '--hours cannot be greater than {} for a timestep of {}.'.format(steps, timestep)
+    return numpy.sort(rng.choice(steps, hours, replace=False))
+
+
+def _sensor_values(rng, sensors, hours, max_value):
+    """Get an array of random sensor values with some hours in the dark."""
+    values = (rng.random((sensors, hours)) * max_value).astype(numpy.float32)
+    values[:, rng.random(hours) < 0.3] = 0
+    return values
+
+
+def write_legacy_folder(folder, grids, sensors, hours, timestep, dgp, seed):
+    """Write a results folder with .ill or .dgp text files."""
+    rng = numpy.random.default_rng(seed)
+    os.makedirs(folder)
+    su_steps = _sun_up_steps(hours, timestep, rng)
+    numpy.savetxt(os.path.join(folder, 'sun-up-hours.txt'),
+                  (su_steps + 0.5) / timestep, fmt='%.4f')
+    if timestep != 1:
+        with open(os.path.join(folder, 'timestep.txt'), 'w') as tf:
+            tf.write(str(timestep))
+    grids_info = []
+    for i in range(grids):
+        grid_id = 'grid_{}'.format(i)
+        grids_info.append(
+            {'name': grid_id, 'identifier': grid_id, 'full_id': grid_id, 'count': sensors})
+        if dgp:
+            values = _sensor_values(rng, sensors, hours, 0.6)
+            numpy.savetxt(os.path.join(folder, grid_id + '.dgp'), values, fmt='%.4f')
+        else:
+            values = _sensor_values(rng, sensors, hours, 2000)
+            numpy.savetxt(os.path.join(folder, grid_id + '.ill'), values, fmt='%.2f')
+    with open(os.path.join(folder, 'grids_info.json'), 'w') as gf:
+        json.dump(grids_info, gf)
+
+
+def write_numpy_folder(folder, grids, sensors, hours, timestep, dynamic, seed):
+    """Write a results folder with NumPy arrays of the total and direct results."""
+    rng = numpy.random.default_rng(seed)
+    os.makedirs(folder)
+    su_steps = _sun_up_steps(hours, timestep, rng)
+    if timestep == 1:
+        numpy.savetxt(os.path.join(folder, 'sun-up-hours.txt'), su_steps, fmt='%d')
+    else:
+        numpy.savetxt(os.path.join(folder, 'sun-up-hours.txt'),
+                      su_steps / float(timestep), fmt='%.4f')
+        study_info = {'timestep': timestep,
+                      'study_hours': (numpy.arange(8760 * timestep) / timestep).tolist()}
+        with open(os.path.join(folder, 'study_info.json'), 'w') as sf:
+            json.dump(study_info, sf)
+
+    def write_arrays(light_path, state, grid_id, values):
+        for res_type, factor in (('total', 1), ('direct', 0.6)):
+            res_folder = os.path.join(folder, light_path, state, res_type)
+            if not os.path.isdir(res_folder):
+                os.makedirs(res_folder)
+            numpy.save(os.path.join(res_folder, grid_id + '.npy'), values * factor)
+
+    grids_info, grid_states = [], {}
+    for i in range(grids):
+        grid_id = 'grid_{}'.format(i)
+        grid_info = {'name': grid_id, 'identifier': grid_id, 'full_id': grid_id,
+                     'count': sensors}
+        write_arrays('__static_apertures__', 'default', grid_id,
+                     _sensor_values(rng, sensors, hours, 2000))
+        if dynamic:
+            grid_info['light_path'] = [['__static_apertures__'], [APERTURE_GROUP]]
+            states = ['{}_{}'.format(s, APERTURE_GROUP) for s in range(2)]
+            grid_states[grid_id] = {APERTURE_GROUP: states}
+            for s, state in enumerate(states):
+                write_arrays(APERTURE_GROUP, state, grid_id,
+                             _sensor_values(rng, sensors, hours, 500.0 / (s + 1)))
+        grids_info.append(grid_info)
+    with open(os.path.join(folder, 'grids_info.json'), 'w') as gf:
+        json.dump(grids_info, gf)
+    if dynamic:
+        with open(os.path.join(folder, 'grid_states.json'), 'w') as gf:
+            json.dump(grid_states, gf)
+
+
+def clean_folder(folder, generated):
+    """Remove everything that a component has written to a results folder."""
+    for name in os.listdir(folder):
+        if name not in generated:
+            path = os.path.join(folder, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+
+
+def install_stand_ins():
+    """Install modules that stand in for Rhino and Grasshopper in this process."""
+    def module(name, **attributes):
+        mod = types.ModuleType(name)
+        mod.__dict__.update(attributes)
+        sys.modules[name] = mod
+        return mod
+
+    def data_tree_to_list(tree):
+        return [((i,), branch) for i, branch in enumerate(tree)]
+
+    module('ladybug_rhino')
+    module('ladybug_rhino.grasshopper',
+           all_required_inputs=lambda component: REQUIRED[0],
+           list_to_data_tree=lambda data: data,
+           data_tree_to_list=data_tree_to_list,
+           give_warning=lambda component, message: None)
+    module('ladybug_rhino.config',
+           current_tolerance=lambda: 0.01, units_system=lambda: 'Meters')
+    module('ladybug_rhino.togeometry',
+           to_point3d=lambda pt: pt, to_vector3d=lambda vec: vec)
+    module('scriptcontext', sticky={})
+
+
+class _Component(object):
+    """Stand-in for the Grasshopper component of a script."""
+    Name = NickName = Message = Category = SubCategory = ''
+    AdditionalHelpFromDocStrings = ''
+
+    def __init__(self):
+        self.InstanceGuid = uuid.uuid4()
+
+
+class _Env(object):
+    """Stand-in for the ghenv of a script."""
+
+    def __init__(self):
+        self.Component = _Component()
+
+
+def default_inputs(component, root=ROOT):
+    """Get the inputs of a component with nothing connected to them."""
+    json_folder = os.path.join(root, 'honeybee_grasshopper_radiance', 'json')
+    comp_file = os.path.join(json_folder, component.replace(' ', '_') + '.json')
+    with open(comp_file) as cf:
+        comp_def = json.load(cf)
+    return {inp['name']: None if inp['access'] == 'item' else []
+            for inp in comp_def['inputs']}
+
+
+def dynamic_schedule():
+    """Get a schedule that switches the aperture group state every 12 hours."""
+    from honeybee_radiance_postprocess.dynamic import \
+        DynamicSchedule, ApertureGroupSchedule
+    schedule = [(h // 12) % 2 for h in range(8760)]
+    return DynamicSchedule.from_group_schedules(
+        [ApertureGroupSchedule(APERTURE_GROUP, schedule)])
+
+
+def stop_workers(sticky):
+    """Stop any post-process workers such that their memory use is reported."""
+    for value in sticky.values():
+        if isinstance(value, subprocess.Popen) and value.poll() is None:
+            value.stdin.close()
+            try:
+                value.wait(60)
+            except subprocess.TimeoutExpired:
+                value.kill()
+                value.wait()
+
+
+def _max_rss_mb(who):
+    """Get the peak resident memory of this process or its children in MB."""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(who).ru_maxrss
+    factor = 1048576.0 if sys.platform == 'darwin' else 1024.0  # bytes or KB
+    return round(max_rss / factor, 1)
+
+
+def run_case(case):
+    """Run a component on a results folder and get the timing and memory use."""
+    install_stand_ins()
+    root = case.get('root', ROOT)
+    sys.path.insert(0, root)
+    comp_file = os.path.join(
+        root, 'honeybee_grasshopper_radiance', 'src', case['component'] + '.py')
+    with open(comp_file) as cf:
+        code = compile(cf.read(), comp_file, 'exec')
+    inputs = default_inputs(case['component'], root)
+    inputs['_results'] = case['folder'] if inputs['_results'] is None \
+        else [case['folder']]
+    inputs.update(case.get('inputs', {}))
+    env = _Env()
+
+    def solve():
+        script_globals = {'ghenv': env, '__name__': '__main__'}
+        script_globals.update({k: list(v) if isinstance(v, list) else v
+                               for k, v in inputs.items()})
+        stdout, sys.stdout = sys.stdout, io.StringIO()
+        start = time.perf_counter()
+        try:
+            exec(code, script_globals)
+        finally:
+            sys.stdout = stdout
+        return round(time.perf_counter() - start, 4)
+
+    result = {}
+    REQUIRED[0] = False
+    result['import'] = solve()
+    REQUIRED[0] = True
+    if case['dynamic']:
+        inputs['dyn_sch_'] = [dynamic_schedule()]
+    if case['trace_memory']:
+        tracemalloc.start()
+    result['cold'] = solve()
+    if case['trace_memory']:
+        result['python_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 1048576.0, 1)
+        tracemalloc.stop()
+    result['warm'] = solve()
+    stop_workers(sys.modules['scriptcontext'].sticky)
+    if resource is not None:
+        result['peak_rss_mb'] = _max_rss_mb(resource.RUSAGE_SELF)
+        result['child_peak_rss_mb'] = _max_rss_mb(resource.RUSAGE_CHILDREN)
+    result['version'] = env.Component.Message
+    return result
+
+
+def _previous_file_to_data(ill_file, point_filter, su_pattern, header, timestep, grid_id):
+    """Get data collections from a result file with the reader before version 1.10.
+
+    This is the reader that HB Annual Results to Data used before the results were
+    memory-mapped and it is only kept here to measure the new reader against it.
+    """
+    from ladybug.datacollection import HourlyContinuousCollection
+    data_colls = []
+    new_header = header.duplicate()
+    new_header.metadata['sensor grid'] = grid_id
+    with open(ill_file) as results:
+        if point_filter is None:
+            for pt_res in results:
+                base_values = [0] * 8760 * timestep
+                for val, hr in zip(pt_res.split(), su_pattern):
+                    base_values[hr] = float(val)
+                data_colls.append(HourlyContinuousCollection(new_header, base_values))
+        else:
+            for i, pt_res in enumerate(results):
+                if i in point_filter:
+                    new_header = new_header.duplicate()
+                    new_header.metadata['sensor index'] = i
+                    base_values = [0] * 8760 * timestep
+                    for val, hr in zip(pt_res.split(), su_pattern):
+                        base_values[hr] = float(val)
+                    data_colls.append(HourlyContinuousCollection(new_header, base_values))
+    return data_colls
+
+
+def run_ill_reader(case):
+    """Time the .ill reader of HB Annual Results to Data against the previous reader."""
+    from ladybug.analysisperiod import AnalysisPeriod
+    from ladybug.datatype.illuminance import Illuminance
+    from ladybug.header import Header
+    install_stand_ins()
+    comp_file = os.path.join(SRC_FOLDER, 'HB Annual Results to Data.py')
+    with open(comp_file) as cf:
+        code = compile(cf.read(), comp_file, 'exec')
+    script_globals = {'ghenv': _Env(), '__name__': '__main__'}
+    script_globals.update(default_inputs('HB Annual Results to Data'))
+    REQUIRED[0] = False
+    exec(code, script_globals)
+    file_to_data = script_globals['file_to_data']
+
+    folder, timestep = case['folder'], case['timestep']
+    with open(os.path.join(folder, 'grids_info.json')) as gf:
+        grid = json.load(gf)[0]
+    ill_file = os.path.join(folder, grid['full_id'] + '.ill')
+    with open(os.path.join(folder, 'sun-up-hours.txt')) as sf:
+        su_pattern = [int(float(h) * timestep) for h in sf]
+    header = Header(Illuminance(), 'lux', AnalysisPeriod(timestep=timestep))
+    rng = numpy.random.default_rng(case['seed'])
+    sample = max(1, grid['count'] // 100)
+    selections = {
+        'all': None,
+        'selected': sorted(rng.choice(grid['count'], sample, replace=False).tolist())
+    }
+
+    def read(reader, point_filter):
+        start = time.perf_counter()
+        data = reader(ill_file, point_filter, su_pattern, header, timestep, grid['full_id'])
+        seconds = round(time.perf_counter() - start, 4)
+        # only keep a digest of the data so that it does not slow down the next read
+        return [hash(data_coll.values) for data_coll in data], seconds
+
+    def measure(reader, point_filter):
+        # tracing the memory slows some readers much more than others and so the
+        # memory is measured with a second read that is not timed
+        digest, seconds = read(reader, point_filter)
+        tracemalloc.start()
+        read(reader, point_filter)
+        peak = round(tracemalloc.get_traced_memory()[1] / 1048576.0, 1)
+        tracemalloc.stop()
+        return digest, {'seconds': seconds, 'python_peak_mb': peak}
+
+    result = {}
+    for name, point_filter in selections.items():
+        old_data, old = measure(_previous_file_to_data, point_filter)
+        clean_folder(folder, case['generated'])
+        new_data, cold = measure(file_to_data, point_filter)
+        _, warm = read(file_to_data, point_filter)
+        assert old_data == new_data, \
+            'The readers do not give the same data for {} sensors.'.format(name)
+        result[name] = {
+            'sensors': grid['count'] if point_filter is None else len(point_filter),
+            'previous': old, 'new': cold, 'new_warm_seconds': warm,
+            'speedup': round(old['seconds'] / max(cold['seconds'], 1e-6), 2)
+        }
+    return result
+
+
+def run_in_process(case):
+    """Run a case in a new Python process and get its result or its error."""
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--case', json.dumps(case)],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    stdout, stderr = process.communicate()
+    if process.returncode != 0:
+        return None, stderr.strip().splitlines()[-1:]
+    return json.loads(stdout.strip().splitlines()[-1]), None
+
+
+def sweep_counts(grids):
+    """Get the cpu_count_ values of a sweep for a number of grids."""
+    max_count = min(os.cpu_count() or 1, grids)
+    counts, count = [], 1
+    while count < max_count:
+        counts.append(count)
+        count *= 2
+    counts.append(max_count)
+    return counts
+
+
+def run_cpu_sweep(folder, generated, components, args):
+    """Run the components with several cpu_count_ and get the speedup of each."""
+    sweep = []
+    for comp_key in components:
+        if 'cpu_count_' not in default_inputs(COMPONENTS[comp_key]):
+            continue
+        entry = {'component': comp_key, 'runs': []}
+        for count in args.cpu_sweep or sweep_counts(args.grids):
+            case = {'component': COMPONENTS[comp_key], 'folder': folder,
+                    'dynamic': False, 'trace_memory': False,
+                    'inputs': {'cpu_count_': count}}
+            colds = []
+            for _ in range(args.repeat):
+                clean_folder(folder, generated)
+                run, error = run_in_process(case)
+                if error is not None:
+                    entry['error'] = error
+                    break
+                colds.append(run['cold'])
+            if not colds:
+                break
+            entry['runs'].append({'cpu_count': count, 'best_cold': min(colds)})
+        for run in entry['runs']:
+            run['speedup'] = round(
+                entry['runs'][0]['best_cold'] / max(run['best_cold'], 1e-6), 2)
+        sys.stderr.write('{} cpu sweep: {}\n'.format(
+            comp_key, entry['runs'] or entry.get('error')))
+        sweep.append(entry)
+    return sweep
+
+
+def export_revision(revision, folder):
+    """Write the components of a git revision of this checkout to a folder."""
+    archive = subprocess.check_output(
+        ['git', 'archive', '--format=tar', revision, 'honeybee_grasshopper_radiance'],
+        cwd=ROOT)
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(folder)
+    return folder
+
+
+def run_repeated(case, folder, generated, repeat):
+    """Run a case several times and get the runs with the best cold and warm time."""
+    entry = {'runs': []}
+    for _ in range(repeat):
+        clean_folder(folder, generated)
+        run, error = run_in_process(case)
+        if error is not None:
+            entry['error'] = error
+            break
+        entry['runs'].append(run)
+    if entry['runs']:
+        entry['best_cold'] = min(run['cold'] for run in entry['runs'])
+        entry['best_warm'] = min(run['warm'] for run in entry['runs'])
+    return entry
+
+
+def run_benchmark(args):
+    """Generate the results folders, run all of the components and get a report."""
+    folders = {'legacy': (write_legacy_folder, False),
+               'numpy': (write_numpy_folder, False)}
+    if args.dgp:
+        folders['legacy_dgp'] = (write_legacy_folder, True)
+    if args.dynamic:
+        folders['numpy_dynamic'] = (write_numpy_folder, True)
+    components = args.components or sorted(COMPONENTS)
+    work_folder = tempfile.mkdtemp(prefix='hb_radiance_benchmark_')
+    report = {
+        'environment': {
+            'python': platform.python_version(), 'platform': platform.platform(),
+            'processors': os.cpu_count(), 'numpy': numpy.__version__
+        },
+        'config': {
+            'grids': args.grids, 'sensors': args.sensors, 'hours': args.hours,
+            'timestep': args.timestep, 'repeat': args.repeat,
+            'baseline': args.baseline
+        },
+        'results': []
+    }
+    try:
+        if args.baseline:
+            baseline_root = export_revision(
+                args.baseline, os.path.join(work_folder, 'baseline'))
+        for folder_type in sorted(folders):
+            write_folder, option = folders[folder_type]
+            folder = os.path.join(work_folder, folder_type)
+            start = time.perf_counter()
+            write_folder(folder, args.grids, args.sensors, args.hours, args.timestep,
+                         option, args.seed)
+            sys.stderr.write('Generated {} results in {:.1f} seconds.\n'.format(
+                folder_type, time.perf_counter() - start))
+            generated = set(os.listdir(folder))
+            for comp_key in components:
+                if folder_type not in FOLDER_TYPES.get(comp_key, folders):
+                    continue
+                case = {'component': COMPONENTS[comp_key], 'folder': folder,
+                        'dynamic': folder_type == 'numpy_dynamic',
+                        'trace_memory': args.trace_memory}
+                entry = {'component': comp_key, 'folder': folder_type}
+                entry.update(run_repeated(case, folder, generated, args.repeat))
+                if args.baseline:
+                    case['root'] = baseline_root
+                    baseline = run_repeated(case, folder, generated, args.repeat)
+                    entry['baseline'] = baseline
+                    if 'best_cold' in entry and 'best_cold' in baseline:
+                        entry['speedup'] = round(
+                            baseline['best_cold'] / max(entry['best_cold'], 1e-6), 2)
+                sys.stderr.write('{} on {}: {}{}\n'.format(
+                    comp_key, folder_type, entry.get('best_cold', entry.get('error')),
+                    ' ({}x the baseline)'.format(entry['speedup'])
+                    if 'speedup' in entry else ''))
+                report['results'].append(entry)
+            if args.ill_reader and folder_type == 'legacy':
+                clean_folder(folder, generated)
+                case = {'ill_reader': True, 'folder': folder, 'generated': list(generated),
+                        'timestep': args.timestep, 'seed': args.seed}
+                result, error = run_in_process(case)
+                report['ill_reader'] = result if error is None else {'error': error}
+                sys.stderr.write('ill reader: {}\n'.format(report['ill_reader']))
+            if args.cpu_sweep is not None and folder_type == 'legacy':
+                report['cpu_sweep'] = run_cpu_sweep(folder, generated, components, args)
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_folder, ignore_errors=True)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the result post-processing components.')
+    parser.add_argument('--grids', type=int, default=2,
+                        help='Number of sensor grids in each results folder.')
+    parser.add_argument('--sensors', type=int, default=500,
+                        help='Number of sensors in each grid.')
+    parser.add_argument('--hours', type=int, default=4380,
+                        help='Number of sun-up timesteps in the results.')
+    parser.add_argument('--timestep', type=int, default=1,
+                        help='Number of timesteps per hour of the results.')
+    parser.add_argument('--dgp', action='store_true',
+                        help='Also benchmark a results folder with .dgp files.')
+    parser.add_argument('--dynamic', action='store_true',
+                        help='Also benchmark results with dynamic aperture groups.')
+    parser.add_argument('--components', nargs='+', choices=sorted(COMPONENTS),
+                        help='Components to benchmark. (Default: all).')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of runs of each component.')
+    parser.add_argument('--baseline',
+                        help='A git revision of this checkout (eg. a release tag) '
+                        'to run on the same results and report the speedup against.')
+    parser.add_argument('--ill-reader', action='store_true',
+                        help='Compare the .ill reader of HB Annual Results to Data '
+                        'against the previous reader.')
+    parser.add_argument('--cpu-sweep', nargs='*', type=int,
+                        help='Run the components on the legacy results with each '
+                        'cpu_count_ and report the speedup. (Default: 1, 2, 4 and '
+                        'so on up to the number of processors or grids).')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='Report the peak Python memory of the cold solution.')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed for the random results.')
+    parser.add_argument('--keep', action='store_true',
+                        help='Keep the generated results folders.')
+    parser.add_argument('--output', help='Optional file to write the report to.')
+    parser.add_argument('--case', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:  # run a single case in this process
+        case = json.loads(args.case)
+        result = run_ill_reader(case) if case.get('ill_reader') else run_case(case)
+        sys.stdout.write(json.dumps(result) + '\n')
+        return
+    report = json.dumps(run_benchmark(args), indent=2)
+    if args.output:
+        with open(args.output, 'w') as outf:
+            outf.write(report)
+    else:
+        sys.stdout.write(report + '\n')
+
+
+if __name__ == '__main__':
+    main()
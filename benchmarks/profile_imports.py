@@ -0,0 +1,219 @@
+"""Profile the cost of loading each component outside of Grasshopper.
+
+Each component is loaded with nothing connected to its inputs, which is what
+happens to every component when a Grasshopper definition is opened. The imports
+are timed with the -X importtime option of Python and the time spent in each
+module is attributed to the top-level package that it belongs to. The modules
+of Rhino and Grasshopper are replaced with light-weight stand-ins and so they
+are not part of the report.
+
+Two modes are available:
+    * fresh - each component is loaded in a new Python process, which gives the
+        cost of a component when it is the first one that is loaded
+    * session - all components are loaded one after the other in the same
+        process (like in a Grasshopper session) and each component is only
+        charged for the modules that were not already loaded (--session)
+
+The report is JSON with the following for each component:
+    * load - seconds to run the component script with nothing connected
+    * imports - seconds spent importing modules for the component
+    * packages - milliseconds spent importing each top-level package
+    * error - the error raised by the component, if any
+
+Usage:
+    python benchmarks/profile_imports.py --session --top 15 > import_report.txt
+"""
+import os
+import io
+import sys
+import json
+import time
+import types
+import argparse
+import subprocess
+import importlib.abc
+import importlib.machinery
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_FOLDER = os.path.join(ROOT, 'honeybee_grasshopper_radiance', 'src')
+JSON_FOLDER = os.path.join(ROOT, 'honeybee_grasshopper_radiance', 'json')
+sys.path.insert(0, ROOT)  # the components import the package of this checkout
+STAND_IN_PACKAGES = (
+    'ladybug_rhino', 'scriptcontext', 'Rhino', 'Grasshopper', 'GhPython', 'System',
+    'clr', 'rhinoscriptsyntax'
+)
+MARKER = '@component '
+
+
+class _StandIn(object):
+    """Object that stands in for anything that comes from Rhino or Grasshopper."""
+
+    def __init__(self, name='stand_in'):
+        self.__dict__['_name'] = name
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return _StandIn(name)
+
+    def __setattr__(self, name, value):
+        self.__dict__[name] = value
+
+    def __call__(self, *args, **kwargs):
+        return _StandIn(self._name)
+
+    def __iter__(self):
+        return iter(())
+
+    def __bool__(self):
+        return False
+    __nonzero__ = __bool__
+
+
+class _StandInFinder(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    """Import finder that creates stand-in modules for Rhino and Grasshopper."""
+
+    def find_spec(self, fullname, path, target=None):
+        if fullname.split('.')[0] in STAND_IN_PACKAGES:
+            return importlib.machinery.ModuleSpec(fullname, self, is_package=True)
+        return None
+
+    def create_module(self, spec):
+        module = types.ModuleType(spec.name)
+        module.__path__ = []
+        module.__getattr__ = lambda name: _StandIn(name)
+        if spec.name == 'ladybug_rhino.grasshopper':
+            module.all_required_inputs = lambda component: False
+        elif spec.name == 'scriptcontext':
+            module.sticky = {}
+        return module
+
+    def exec_module(self, module):
+        pass
+
+
+def default_inputs(component):
+    """Get the inputs of a component with nothing connected to them."""
+    comp_file = os.path.join(JSON_FOLDER, component.replace(' ', '_') + '.json')
+    with open(comp_file) as cf:
+        comp_def = json.load(cf)
+    return {inp['name']: None if inp['access'] == 'item' else []
+            for inp in comp_def['inputs']}
+
+
+def load_components(components):
+    """Load components in this process and get the time and error of each one."""
+    sys.meta_path.insert(0, _StandInFinder())
+    results = {}
+    for component in components:
+        comp_file = os.path.join(SRC_FOLDER, component + '.py')
+        with open(comp_file) as cf:
+            code = compile(cf.read(), comp_file, 'exec')
+        sys.stderr.write('{}{}\n'.format(MARKER, component))
+        sys.stderr.flush()
+        script_globals = {'ghenv': _StandIn('ghenv'), '__name__': '__main__'}
+        script_globals.update(default_inputs(component))
+        stdout, sys.stdout = sys.stdout, io.StringIO()
+        start = time.perf_counter()
+        error = None
+        try:
+            exec(code, script_globals)
+        except Exception as e:
+            error = '{}: {}'.format(type(e).__name__, str(e).strip())
+        finally:
+            sys.stdout = stdout
+        results[component] = {'load': round(time.perf_counter() - start, 4)}
+        if error:
+            results[component]['error'] = error
+    return results
+
+
+def parse_import_times(stderr):
+    """Get the self time of the imported modules of each component from -X importtime.
+
+    Returns:
+        A dictionary with component names as keys and dictionaries of
+        {top-level package: microseconds} as values.
+    """
+    import_times, current = {}, None
+    for line in stderr.splitlines():
+        if line.startswith(MARKER):
+            current = import_times[line[len(MARKER):]] = {}
+        elif line.startswith('import time:') and current is not None:
+            try:
+                self_us, _, module = line[12:].split('|')
+                self_us = int(self_us)
+            except ValueError:  # the header of the import time table
+                continue
+            package = module.strip().split('.')[0]
+            current[package] = current.get(package, 0) + self_us
+    return import_times
+
+
+def profile(components, session, top):
+    """Load the components in new Python processes and get the import report."""
+    groups = [components] if session else [[comp] for comp in components]
+    results, totals = {}, {}
+    for group in groups:
+        cmds = [sys.executable, '-X', 'importtime', os.path.abspath(__file__),
+                '--case', json.dumps(group)]
+        process = subprocess.Popen(
+            cmds, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            universal_newlines=True)
+        stdout, stderr = process.communicate()
+        if process.returncode != 0:
+            for comp in group:
+                results[comp] = {'error': stderr.strip().splitlines()[-1]}
+            continue
+        loads = json.loads(stdout)
+        import_times = parse_import_times(stderr)
+        for comp in group:
+            packages = import_times.get(comp, {})
+            for package, us in packages.items():
+                totals[package] = totals.get(package, 0) + us
+            entry = loads[comp]
+            entry['imports'] = round(sum(packages.values()) / 1e6, 4)
+            ranked = sorted(packages.items(), key=lambda p: p[1], reverse=True)
+            entry['packages'] = {p: round(us / 1e3, 1) for p, us in ranked[:top]}
+            results[comp] = entry
+
+    # summarize the packages that are the most expensive across the components
+    ranked = sorted(totals.items(), key=lambda p: p[1], reverse=True)
+    return {
+        'python': sys.version.split()[0],
+        'mode': 'session' if session else 'fresh',
+        'total_load': round(sum(e.get('load', 0) for e in results.values()), 4),
+        'packages': {p: round(us / 1e3, 1) for p, us in ranked[:top]},
+        'components': results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Profile the import cost of loading the components.')
+    parser.add_argument('--components', nargs='+',
+                        help='Names of the components to profile. (Default: all).')
+    parser.add_argument('--session', action='store_true',
+                        help='Load all components in the same Python process.')
+    parser.add_argument('--top', type=int, default=10,
+                        help='Number of packages to report for each component.')
+    parser.add_argument('--output', help='Optional file to write the report to.')
+    parser.add_argument('--case', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:  # load the components in this process
+        sys.stdout.write(json.dumps(load_components(json.loads(args.case))))
+        return
+    components = args.components or sorted(
+        f[:-3] for f in os.listdir(SRC_FOLDER)
+        if f.endswith('.py') and not f.startswith('_'))
+    report = json.dumps(profile(components, args.session, args.top), indent=2)
+    if args.output:
+        with open(args.output, 'w') as outf:
+            outf.write(report)
+    else:
+        sys.stdout.write(report + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,14 @@
 """Honeybee Grasshopper Radiance Plugin.
 
-Note that this package is not intended to run with cPython and it only possesses
+Note that this package is not intended to run with cPython and it mostly possesses
 the Grasshopper components. In order to run the plugin, the core libraries must
 be installed in a manner that they can be discovered by Rhino.
 The package includes both the userobjects (.ghuser) and the Python source (.py).
+
+The postprocess and results modules hold the code that is shared by the components
+under the 4 :: Results sub-tab. The postprocess module is also run with the Python
+of the Ladybug Tools installation as the worker process of these components.
+The recipecache module lets the components under the 3 :: Recipes sub-tab reuse
+the results of a previous run with the same inputs and the version module checks
+the installation of Radiance once for all components that call it.
 """
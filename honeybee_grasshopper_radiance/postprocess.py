@@ -0,0 +1,896 @@
+"""Run post-processes of annual results for the components under 4 :: Results.
+
+The components send honeybee-radiance-postprocess commands to a long-lived worker
+process, which is this module run with the Python of the Ladybug Tools
+installation. The rest of the module runs inside Grasshopper and it holds the
+helpers that all of the result components share to run the commands, to cache
+their results and to record the time and memory of each solution.
+"""
+import os
+import io
+import errno
+import sys
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import tempfile
+import threading
+import subprocess
+
+try:
+    from Queue import Queue, Empty  # IronPython
+except ImportError:
+    from queue import Queue, Empty
+
+try:
+    from ladybug.futil import write_to_file
+except ImportError as e:
+    raise ImportError('\nFailed to import ladybug:\n\t{}'.format(e))
+
+try:
+    import scriptcontext as sc
+    sticky = sc.sticky
+except ImportError:  # not running inside of Rhino
+    sticky = {}
+
+try:
+    from Grasshopper import Instances
+    from Grasshopper.Kernel import GH_Document
+except ImportError:  # not running inside of Grasshopper
+    Instances = GH_Document = None
+
+
+WORKER_TAG = '@hb-radiance-postprocess '
+PROGRESS_TAG = '@hb-radiance-progress '
+START_TAG = '@hb-radiance-started'
+PROFILE_LOG = 'hb_radiance_profile.jsonl'
+RESULT_INFO_FILES = ('grids_info.json', 'sun-up-hours.txt', 'grid_states.json')
+RESULT_CACHE_LIMIT = 1024 ** 3  # bytes of post-processed results to keep in the cache
+INDEX_CACHE_LIMIT = 4 * 1024 ** 3  # bytes of sensor indices to keep in the cache
+INPUT_CACHE_LIMIT = 64 * 1024 ** 2  # bytes of command input files to keep in the cache
+RECENT_USE = 10  # seconds after their last use for which cache entries are never evicted
+MATRIX_CACHE_LIMIT = 2 * 1024 ** 3  # bytes of recently loaded matrices kept by the worker
+TIMEOUT = 4 * 3600  # seconds after which a post-process is stopped by default
+SLOT_FILE = os.path.join(tempfile.gettempdir(), 'hb_radiance_postprocess_slot_%d.lock')
+LOG_FILE = os.path.join(tempfile.gettempdir(), 'hb_radiance_postprocess.log')
+
+
+def _module_file():
+    """Get the path to the source of this module, which is run as the worker."""
+    return os.path.splitext(os.path.abspath(__file__))[0] + '.py'
+
+
+def _python_exe():
+    """Get the path to the Python of the Ladybug Tools installation.
+
+    honeybee is only imported once a command is run since it loads all of the
+    installed honeybee extensions.
+    """
+    try:
+        from honeybee.config import folders
+    except ImportError as e:
+        raise ImportError('\nFailed to import honeybee:\n\t{}'.format(e))
+    return folders.python_exe_path
+
+
+def _python_env():
+    """Get the environment to run this package with the Ladybug Tools Python."""
+    custom_env = os.environ.copy()
+    custom_env['PYTHONHOME'] = ''
+    custom_env['PYTHONPATH'] = os.path.dirname(os.path.dirname(_module_file()))
+    return custom_env
+
+
+def read_lines(stream, lines):
+    """Put each line of a stream in a queue and put None once the stream is closed."""
+    for line in iter(stream.readline, ''):
+        lines.put(line)
+    lines.put(None)
+
+
+def postprocess_worker():
+    """Get the worker process that is shared by all result components.
+
+    The worker is started the first time that it is requested and it is then
+    kept alive in the sticky for the rest of the Rhino session.
+    """
+    with open(_module_file(), 'rb') as mod:
+        worker_id = hashlib.md5(mod.read()).hexdigest()
+    sticky_key = 'hb_radiance_postprocess_worker_{}'.format(worker_id)
+    worker = sticky.get(sticky_key)
+    if worker is not None and worker.poll() is None:
+        return worker
+    # stderr goes to the log from the start such that nothing written before the
+    # worker redirects it (eg. import warnings) can fill a pipe and hang the worker
+    with open(LOG_FILE, 'a') as log_file:
+        worker = subprocess.Popen(
+            [_python_exe(), '-u', '-m', 'honeybee_grasshopper_radiance.postprocess'],
+            env=_python_env(), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=log_file, universal_newlines=True)
+    # read the output in the background such that it can be waited on with a timeout
+    worker.lines = Queue()
+    reader = threading.Thread(target=read_lines, args=(worker.stdout, worker.lines))
+    reader.daemon = True
+    reader.start()
+    sticky[sticky_key] = worker
+    return worker
+
+
+def show_progress(component, message):
+    """Show a line of progress from a post-process in the message of a component."""
+    component.Message = message if len(message) <= 40 else message[:37] + '...'
+    if Instances is not None and Instances.ActiveCanvas is not None:
+        Instances.ActiveCanvas.Refresh()
+
+
+def next_line(process, lines, started, timeout):
+    """Wait for the next line of output from a process.
+
+    The process is killed if the Escape key is pressed or if it has run for
+    longer than the timeout.
+
+    Returns:
+        A tuple with the line, which is None once the output has ended, and a
+        message for why the process was stopped, which is None unless it was
+        cancelled or timed out.
+    """
+    while True:
+        try:
+            return lines.get(timeout=0.1), None
+        except Empty:
+            if GH_Document is not None and GH_Document.IsEscapeKeyDown():
+                stop_msg = 'The post-process was cancelled.'
+            elif timeout is not None and time.time() - started > timeout:
+                stop_msg = 'The post-process did not finish within {} seconds.'.format(timeout)
+            else:
+                continue
+            process.kill()
+            process.wait()
+            return None, stop_msg
+
+
+def run_postprocess(component, args, res_folder, script=None, timeout=TIMEOUT):
+    """Run a honeybee-radiance-postprocess command.
+
+    The command is sent to a long-lived worker process such that subsequent
+    commands do not pay the cost of starting Python and importing numpy. If the
+    worker dies before the command has started, the command is sent to a new
+    worker and, if that one cannot be used either, the command is run in its
+    own process. A command that has started is never run again, even when it
+    stops the worker, since it would most likely fail the same way.
+
+    While the command runs, anything that it writes to stderr is shown in the
+    message of the component and the command can be cancelled by pressing the
+    Escape key. Only a limited number of commands run at once across all Rhino
+    sessions of the machine, whether they run in a worker or in their own
+    process, and the others wait in a queue.
+
+    Args:
+        component: The Grasshopper component that runs the command.
+        args: A list of arguments for the honeybee-radiance-postprocess CLI.
+        res_folder: The results folder in which the command will be run.
+        script: An optional path to a Python script, which will be run with the
+            args instead of the honeybee-radiance-postprocess CLI.
+        timeout: A number of seconds after which the command is stopped. If None,
+            the command can run for as long as it needs. (Default: TIMEOUT).
+
+    Returns:
+        A tuple with the return code, stdout and stderr of the command followed
+        by a dictionary with the seconds spent in each phase of the command.
+        The phases are start (starting the worker and sending the command),
+        queue (waiting for other commands on the machine), run and total.
+        When profiling is enabled, the dictionary also has the peak memory
+        in MB that Python allocated in the worker to run the command (worker_mb).
+    """
+    start_time, message = time.time(), component.Message
+    timings = {'start': 0, 'queue': 0, 'run': 0, 'total': 0}
+    request = json.dumps(
+        {'args': args, 'cwd': res_folder, 'script': script, 'trace': profiling()})
+    try:
+        for _ in range(2):  # try a new worker if the last died before the command
+            worker, started = None, False
+            try:
+                worker = postprocess_worker()
+                sent_time = time.time()
+                worker.stdin.write(request + '\n')
+                worker.stdin.flush()
+                line, stop_msg = next_line(worker, worker.lines, sent_time, timeout)
+                while line is not None:
+                    if line.startswith(START_TAG):
+                        started = True
+                    elif line.startswith(PROGRESS_TAG):
+                        show_progress(component, json.loads(line[len(PROGRESS_TAG):]))
+                    elif line.startswith(WORKER_TAG):
+                        result = json.loads(line[len(WORKER_TAG):])
+                        timings.update(result['timings'])
+                        timings['total'] = time.time() - start_time
+                        timings['start'] = \
+                            timings['total'] - timings['queue'] - timings['run']
+                        return result['returncode'], result['stdout'], \
+                            result['stderr'], timings
+                    line, stop_msg = next_line(worker, worker.lines, sent_time, timeout)
+                if stop_msg is not None:
+                    timings['total'] = time.time() - start_time
+                    return 1, '', stop_msg, timings
+            except (EnvironmentError, ValueError):
+                pass
+            if worker is not None and worker.poll() is None:
+                worker.kill()
+                worker.wait()
+            if started:
+                timings['total'] = time.time() - start_time
+                msg = 'The post-process stopped the worker process while it was ' \
+                    'running. See the log at {}'.format(LOG_FILE)
+                return 1, '', msg, timings
+
+        # fall back to running the command in its own process, which also waits
+        # for a free slot of the commands that are allowed to run on the machine
+        cmds = [_python_exe(), '-m', 'honeybee_grasshopper_radiance.postprocess']
+        if script is not None:
+            cmds.extend(['--script', script])
+        cmds.extend(args)
+        # the command is run without a shell such that killing the process stops it
+        run_time = time.time()
+        process = subprocess.Popen(
+            cmds, cwd=res_folder, env=_python_env(),
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        stdout, stderr, err_lines = [], [], Queue()
+        readers = [
+            threading.Thread(target=lambda: stdout.append(process.stdout.read())),
+            threading.Thread(target=read_lines, args=(process.stderr, err_lines))
+        ]
+        for reader in readers:
+            reader.daemon = True
+            reader.start()
+        line, stop_msg = next_line(process, err_lines, run_time, timeout)
+        while line is not None:
+            stderr.append(line)
+            if line.strip():
+                show_progress(component, line.strip())
+            line, stop_msg = next_line(process, err_lines, run_time, timeout)
+        returncode = process.wait()
+        readers[0].join()
+        timings['run'] = time.time() - run_time
+        timings['total'] = time.time() - start_time
+        if stop_msg is not None:
+            return 1, '', stop_msg, timings
+        return returncode, ''.join(stdout), ''.join(stderr), timings
+    finally:
+        component.Message = message
+
+
+def timings_report(timings):
+    """Get a line for the report of a component with the timings of a post-process."""
+    return 'Post-process took {total:.2f} seconds (start: {start:.2f}, ' \
+        'queue: {queue:.2f}, run: {run:.2f}).'.format(**timings)
+
+
+def input_file(res_folder, file_name, content):
+    """Get the path to an input file for a command, which is named after its content.
+
+    The file is only written if it does not already exist, such that components
+    that solve against the same results folder at once never overwrite each
+    other's inputs and repeated solves skip the write entirely.
+
+    Args:
+        res_folder: The results folder in which the command will be run.
+        file_name: The name of the file, which is suffixed with a hash of the content.
+        content: Text for the content of the file.
+    """
+    content_id = hashlib.md5(content.encode('utf-8')).hexdigest()
+    name, ext = os.path.splitext(file_name)
+    inp_file = os.path.join(
+        res_folder, '__cache__', 'inputs', '{}_{}{}'.format(name, content_id, ext))
+    if os.path.isfile(inp_file):
+        os.utime(inp_file, None)  # mark the input as recently used
+    else:
+        # write to a unique file first so that no one reads a partial file
+        temp_file = '{}.{}.tmp'.format(inp_file, uuid.uuid4().hex)
+        write_to_file(temp_file, content, mkdir=True)
+        try:
+            os.rename(temp_file, inp_file)
+        except OSError:  # the same file was written by another process
+            os.remove(temp_file)
+    return inp_file
+
+
+def write_atomic(file_path, content):
+    """Write text to a file such that other processes never read a partial file.
+
+    The content is written to a unique temporary file, which then replaces the file.
+    """
+    temp_file = '{}.{}.tmp'.format(file_path, uuid.uuid4().hex)
+    write_to_file(temp_file, content, mkdir=True)
+    try:
+        os.rename(temp_file, file_path)
+    except OSError:  # Windows does not rename over an existing file
+        try:
+            os.remove(file_path)
+            os.rename(temp_file, file_path)
+        except OSError:  # the file was replaced by another process in between
+            os.remove(temp_file)
+
+
+def postprocess_cache(res_folder, *inputs):
+    """Get the sub-folder of a results folder in which post-processed results are cached.
+
+    The name of the sub-folder is a hash of the result matrices in the folder
+    along with all of the inputs that affect the post-processed results.
+
+    Returns:
+        A tuple with two values.
+
+        -   sub_folder: The path of the cache sub-folder relative to res_folder.
+
+        -   is_cached: Boolean to note whether the results already exist in
+            the sub-folder.
+    """
+    fingerprint = []
+    for root, dirs, files in os.walk(res_folder):
+        dirs[:] = sorted(d for d in dirs if d != '__cache__')
+        for f in sorted(files):
+            if f.endswith('.npy') or f in RESULT_INFO_FILES:
+                f_stat = os.stat(os.path.join(root, f))
+                fingerprint.append((os.path.relpath(os.path.join(root, f), res_folder),
+                                    f_stat.st_size, f_stat.st_mtime))
+    key_str = json.dumps([fingerprint, inputs], sort_keys=True)
+    sub_folder = os.path.join('__cache__', hashlib.md5(key_str.encode('utf-8')).hexdigest())
+    info_file = os.path.join(res_folder, sub_folder, 'cache_info.json')
+    if os.path.isfile(info_file):
+        os.utime(info_file, None)  # mark the results as recently used
+        return sub_folder, True
+    return sub_folder, False
+
+
+def cache_postprocess(res_folder, sub_folder, group='results', owner=None):
+    """Record post-processed results in the cache and evict the least recently used.
+
+    Each group of entries has its own size limit and only the entries of the same
+    group are evicted. This way, large entries that are reused by the others
+    (eg. the sensor indices of the daylight metrics) are not evicted by the
+    results that are computed from them. Entries that have been used within
+    the last RECENT_USE seconds are never evicted since another process may
+    still be reading them, and entries whose cache_info.json cannot be read
+    yet are skipped.
+
+    Entries of the export group are never evicted for their size since the
+    outputs of the components read from them after they have been recorded.
+    Instead, each export entry notes the components that output it and it is
+    only removed once all of them have exported another entry or once all of
+    the Rhino processes of these components have closed.
+
+    Args:
+        res_folder: The results folder of the cache.
+        sub_folder: The cache sub-folder of the entry relative to res_folder.
+        group: Text for the group of the entry, which is either results, index
+            or export.
+        owner: Text for the InstanceGuid of the component that outputs an entry
+            of the export group. This should be passed every time that the
+            component outputs the entry, including when it was already cached.
+    """
+    cache_dir = os.path.join(res_folder, sub_folder)
+    cache_root = os.path.dirname(cache_dir)
+    if group == 'export':
+        _own_export(cache_root, os.path.basename(cache_dir), owner)
+        clean_inputs(cache_root)
+        return
+    size = sum(os.path.getsize(os.path.join(root, f))
+               for root, _, files in os.walk(cache_dir) for f in files)
+    write_atomic(os.path.join(cache_dir, 'cache_info.json'),
+                 json.dumps({'size': size, 'group': group}))
+    entries = []
+    for entry in os.listdir(cache_root):
+        info_file = os.path.join(cache_root, entry, 'cache_info.json')
+        try:
+            with open(info_file) as inf:
+                e_info = json.load(inf)
+            if e_info.get('group', 'results') == group:
+                entries.append((os.path.getmtime(info_file), e_info['size'], entry))
+        except (EnvironmentError, ValueError, KeyError):  # not a complete entry
+            continue
+    total_size = sum(entry[1] for entry in entries)
+    limit = INDEX_CACHE_LIMIT if group == 'index' else RESULT_CACHE_LIMIT
+    recent = time.time() - RECENT_USE
+    for e_time, e_size, entry in sorted(entries):
+        if total_size <= limit:
+            break
+        if entry != os.path.basename(cache_dir) and e_time < recent:
+            shutil.rmtree(os.path.join(cache_root, entry), ignore_errors=True)
+            total_size -= e_size
+    clean_inputs(cache_root)
+
+
+def _process_running(pid):
+    """Check whether a process with a given id is running on this machine."""
+    if pid == os.getpid():
+        return True
+    try:  # .NET process of Rhino
+        from System.Diagnostics import Process
+    except ImportError:
+        pass
+    else:
+        try:
+            Process.GetProcessById(pid)
+            return True
+        except Exception:  # the process is not running
+            return False
+    if os.name == 'nt':  # os.kill would terminate the process
+        return True
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.EPERM  # the process is running under another user
+    return True
+
+
+def _own_export(cache_root, entry, owner):
+    """Record a component as an owner of an export entry and release its others.
+
+    Owners are recorded as the id of the Rhino process and the InstanceGuid of
+    the component such that the same document opened in two Rhino instances
+    does not release the exports of the other instance.
+    """
+    owner = '{}:{}'.format(os.getpid(), owner)
+    recent = time.time() - RECENT_USE
+    for e_name in os.listdir(cache_root):
+        info_file = os.path.join(cache_root, e_name, 'cache_info.json')
+        try:
+            with open(info_file) as inf:
+                e_info = json.load(inf)
+            if e_info.get('group') != 'export':
+                continue
+            e_time = os.path.getmtime(info_file)
+        except (EnvironmentError, ValueError):  # not a complete entry
+            continue
+        owners = [o for o in e_info['owners'] if o != owner and
+                  _process_running(int(o.split(':', 1)[0]))]
+        if e_name == entry:
+            owners.append(owner)
+        elif len(owners) == 0 and e_time < recent:
+            shutil.rmtree(os.path.join(cache_root, e_name), ignore_errors=True)
+            continue
+        if owners != e_info['owners']:
+            e_info['owners'] = owners
+            write_atomic(info_file, json.dumps(e_info))
+    info_file = os.path.join(cache_root, entry, 'cache_info.json')
+    if not os.path.isfile(info_file):  # the entry has just been exported
+        cache_dir = os.path.join(cache_root, entry)
+        size = sum(os.path.getsize(os.path.join(root, f))
+                   for root, _, files in os.walk(cache_dir) for f in files)
+        write_atomic(info_file, json.dumps(
+            {'size': size, 'group': 'export', 'owners': [owner]}))
+
+
+def clean_inputs(cache_root):
+    """Remove the least recently used input files of commands beyond INPUT_CACHE_LIMIT.
+
+    Temporary files that were left behind by an interrupted write are removed
+    along with the input files.
+    """
+    inp_dir = os.path.join(cache_root, 'inputs')
+    if not os.path.isdir(inp_dir):
+        return
+    files, recent = [], time.time() - RECENT_USE
+    for f in os.listdir(inp_dir):
+        try:
+            f_stat = os.stat(os.path.join(inp_dir, f))
+        except EnvironmentError:  # removed by another process
+            continue
+        if f.endswith('.tmp'):
+            if f_stat.st_mtime < recent:
+                files.append((0, 0, f))  # remove it before any input file
+        else:
+            files.append((f_stat.st_mtime, f_stat.st_size, f))
+    total_size = sum(f_info[1] for f_info in files)
+    for f_time, f_size, f in sorted(files):
+        if f_time != 0 and (total_size <= INPUT_CACHE_LIMIT or f_time >= recent):
+            break
+        try:
+            os.remove(os.path.join(inp_dir, f))
+            total_size -= f_size
+        except EnvironmentError:  # in use or removed by another process
+            pass
+
+
+def profiling():
+    """Check whether the solutions of the result components are being recorded."""
+    return bool(sticky.get('hb_radiance_profile'))
+
+
+def peak_memory():
+    """Get the peak memory used by this process in MB or None if it is not available."""
+    try:  # .NET process of Rhino
+        from System.Diagnostics import Process
+        return round(Process.GetCurrentProcess().PeakWorkingSet64 / 1048576.0, 1)
+    except ImportError:
+        pass
+    try:
+        import resource
+    except ImportError:  # CPython on Windows
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(max_rss / (1048576.0 if sys.platform == 'darwin' else 1024.0), 1)
+
+
+def start_profile(component):
+    """Start a record of the phases of the solution of a component.
+
+    Returns:
+        A dictionary to be passed to mark_phase and write_profile, which is None
+        unless profiling has been enabled with the "HB Profile Components"
+        component.
+    """
+    if not profiling():
+        return None
+    now = time.time()
+    return {'component': component.Name, 'version': component.Message,
+            'started': now, 'mark': now, 'peak_mb': peak_memory(), 'phases': []}
+
+
+def mark_phase(profile, phase, timings=None):
+    """Record the wall time and peak memory of a phase of the solution that just ended.
+
+    The peak memory of the process never decreases and so the growth_mb of a
+    phase is how much it raised the peak memory above the previous phases.
+
+    Args:
+        profile: The record from start_profile, which is None when not profiling.
+        phase: Text for the name of the phase (eg. setup, post-process, read, tree).
+        timings: An optional dictionary of timings from run_postprocess, which
+            is added to the phase.
+    """
+    if profile is None:
+        return
+    now, peak_mb = time.time(), peak_memory()
+    entry = {'phase': phase, 'seconds': round(now - profile['mark'], 4),
+             'peak_mb': peak_mb}
+    if peak_mb is not None and profile['peak_mb'] is not None:
+        entry['growth_mb'] = round(peak_mb - profile['peak_mb'], 1)
+        profile['peak_mb'] = peak_mb
+    if timings is not None:
+        entry.update((key, round(val, 4)) for key, val in timings.items())
+    profile['phases'].append(entry)
+    profile['mark'] = time.time()
+
+
+def write_profile(profile, res_folder):
+    """Append the record of a solution to the profile log of a results folder.
+
+    Each line of the log is the JSON of one solution and the paths to the logs
+    are kept in the sticky such that the solutions of a Rhino session can be
+    summarized together.
+    """
+    if profile is None:
+        return
+    record = {
+        'session': sticky.setdefault('hb_radiance_profile_session', str(uuid.uuid4())),
+        'component': profile['component'], 'version': profile['version'],
+        'time': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(profile['started'])),
+        'seconds': round(time.time() - profile['started'], 4),
+        'peak_mb': peak_memory(), 'phases': profile['phases']
+    }
+    log_file = os.path.join(res_folder, PROFILE_LOG)
+    try:
+        with open(log_file, 'a') as log:
+            log.write(json.dumps(record) + '\n')
+    except EnvironmentError:  # the results folder is read-only
+        return
+    logs = sticky.setdefault('hb_radiance_profile_logs', [])
+    if log_file not in logs:
+        logs.append(log_file)
+
+
+# everything below only runs in the worker process with CPython
+
+def acquire_slot():
+    """Wait for a free slot of the commands that are allowed to run on the machine.
+
+    Each slot is a locked file, which the operating system unlocks if the
+    process that holds it is killed.
+    """
+    try:
+        import fcntl
+    except ImportError:  # Windows
+        import msvcrt
+        fcntl = None
+    while True:
+        for i in range(max_jobs()):
+            slot = open(SLOT_FILE % i, 'a+')
+            try:
+                if fcntl is not None:
+                    fcntl.flock(slot.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    slot.seek(0)
+                    msvcrt.locking(slot.fileno(), msvcrt.LK_NBLCK, 1)
+                return slot
+            except OSError:
+                slot.close()
+        time.sleep(0.1)
+
+
+def release_slot(slot):
+    """Release a slot that was acquired to run a command."""
+    if os.name == 'nt':
+        import msvcrt
+        slot.seek(0)
+        msvcrt.locking(slot.fileno(), msvcrt.LK_UNLCK, 1)
+    slot.close()
+
+
+def max_jobs():
+    """Get the number of commands that are allowed to run at once on the machine."""
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+def filter_grids(grids_info, grids_filter='*'):
+    """Get the information of the grids that match a filter.
+
+    The grids are matched in the same way as the grid_filter_ of the components
+    such that no private method of honeybee-radiance-postprocess is needed.
+
+    Args:
+        grids_info: A list of dictionaries for the grids of the results.
+        grids_filter: The name of a grid or a pattern to filter the grids.
+    """
+    if grids_filter == '*':
+        return grids_info
+    from honeybee_radiance.writer import _filter_by_pattern
+    return _filter_by_pattern(grids_info, grids_filter)
+
+
+def grid_array(results, grid_info, states=None, res_type='total'):
+    """Get the values of a grid for the states of its light paths as a NumPy array.
+
+    Light paths without a schedule in the states are in their default state and
+    the values of each state are only added for the sun-up hours in which the
+    state is used. The arrays are loaded using the layout of the results folder
+    such that no private method of honeybee-radiance-postprocess is needed.
+
+    Args:
+        results: A honeybee-radiance-postprocess Results object of the folder.
+        grid_info: A dictionary of the grid from the grids_info of the results.
+        states: An optional DynamicSchedule for the light paths. If None, all
+            light paths will be in their default state.
+        res_type: Text for the type of results to get (eg. total or direct).
+
+    Returns:
+        A float32 array with a row for each sensor and a column for each sun-up hour.
+    """
+    import numpy
+    from honeybee_radiance_postprocess.dynamic import DynamicSchedule
+    grid_id = grid_info['full_id']
+    sun_up_hours = numpy.array(results.sun_up_hours)
+    light_paths = [lp for lps in grid_info.get('light_path') or [['__static_apertures__']]
+                   for lp in lps if lp != '__static_apertures__' or len(lps) == 1]
+    states = DynamicSchedule() if states is None else states
+    array = numpy.zeros((grid_info['count'], len(sun_up_hours)), dtype=numpy.float32)
+    for light_path, schedule in \
+            states.filter_by_identifiers(light_paths).dynamic_schedule.items():
+        su_states = numpy.array(schedule.schedule)
+        su_states = numpy.full(len(sun_up_hours), su_states[0]) if len(su_states) == 1 \
+            else su_states[sun_up_hours.astype(int)]
+        for state in numpy.unique(su_states):
+            if state == -1:  # the light path is off
+                continue
+            state_id = 'default' if light_path == '__static_apertures__' else \
+                results.grid_states[grid_id][light_path][int(state)]
+            state_file = os.path.join(
+                str(results.folder), light_path, state_id, res_type, grid_id + '.npy')
+            mask = su_states == state
+            array[:, mask] += numpy.load(state_file)[:, mask]
+    return array
+
+
+def archive_file(res_file, compression='zlib', chunk_rows=100, remove_text=False):
+    """Write a compressed archive of a text result file next to it.
+
+    The archive is a sequence of compressed chunks of little-endian float32
+    values followed by a JSON footer with the position of each chunk and an
+    unsigned 64-bit integer for the length of the footer. The footer also has
+    the largest number of decimal places in the text file such that values are
+    rounded back to those of the text file when they are read with the
+    archive_rows function of the results module.
+
+    Args:
+        res_file: Path to a .ill or .dgp result file.
+        compression: Text for the compression of the chunks (zlib or lzma).
+        chunk_rows: The number of sensor rows in each chunk.
+        remove_text: Boolean to note whether the result file should be deleted
+            once its archive has been written.
+
+    Returns:
+        A list with the name of the result file, its size and the size of the archive.
+    """
+    import zlib
+    import array
+    import struct
+    if compression == 'lzma':
+        import lzma
+        compress = lzma.compress
+    else:
+        compress = lambda data: zlib.compress(data, 6)
+    arc_file = res_file + '.hbz'
+    temp_file = '{}.{}.tmp'.format(arc_file, uuid.uuid4().hex)
+    chunks, rows, columns, decimals = [], [], None, 0
+    with open(res_file) as results, open(temp_file, 'wb') as arc:
+        def write_chunk():
+            values = array.array('f', [v for row in rows for v in row])
+            if sys.byteorder == 'big':
+                values.byteswap()
+            data = compress(values.tobytes())
+            chunks.append([arc.tell(), len(data), len(rows)])
+            arc.write(data)
+            del rows[:]
+
+        for pt_res in results:
+            str_row = pt_res.split()
+            if decimals is not None:
+                for v in str_row:
+                    if 'e' in v or 'E' in v:  # values in scientific notation
+                        decimals = None
+                        break
+                    if '.' in v:
+                        decimals = max(decimals, len(v) - v.index('.') - 1)
+            row = [float(v) for v in str_row]
+            if columns is None:
+                columns = len(row)
+            elif len(row) != columns:
+                raise ValueError('The rows of {} do not have the same length.'.format(
+                    res_file))
+            rows.append(row)
+            if len(rows) == chunk_rows:
+                write_chunk()
+        if len(rows) != 0:
+            write_chunk()
+        footer = json.dumps({
+            'compression': compression, 'columns': columns or 0,
+            'rows': sum(chunk[2] for chunk in chunks), 'decimals': decimals,
+            'chunks': chunks
+        }).encode('utf-8')
+        arc.write(footer)
+        arc.write(struct.pack('<Q', len(footer)))
+    os.replace(temp_file, arc_file)
+    text_size = os.path.getsize(res_file)
+    if remove_text:
+        os.remove(res_file)
+    return [os.path.basename(res_file), text_size, os.path.getsize(arc_file)]
+
+
+class ProgressStream(io.StringIO):
+    """Stream that keeps the output of a command and also sends it as progress."""
+
+    def write(self, text):
+        for line in text.splitlines():
+            if line.strip():
+                sys.__stdout__.write('{}{}\n'.format(PROGRESS_TAG, json.dumps(line.strip())))
+        sys.__stdout__.flush()
+        return io.StringIO.write(self, text)
+
+
+def cache_matrix_loads():
+    """Make numpy.load keep recently loaded matrices in the memory of the worker.
+
+    Matrices are keyed by their path, size and modification time such that
+    commands that read the same results again skip reading them from disk.
+    The least recently used matrices are dropped once MATRIX_CACHE_LIMIT is
+    exceeded. The cached matrices are returned as read-only arrays instead of
+    copies such that each matrix is only held in memory once.
+    """
+    import collections
+    import numpy
+
+    cache, cache_size = collections.OrderedDict(), [0]
+    base_load = numpy.load
+
+    def cached_load(file, *args, **kwargs):
+        """Load a numpy file from memory if it has been loaded recently."""
+        if args or 'mmap_mode' in kwargs or not isinstance(file, (str, os.PathLike)):
+            return base_load(file, *args, **kwargs)
+        f_stat = os.stat(file)
+        key = (os.path.abspath(file), f_stat.st_size, f_stat.st_mtime,
+               tuple(sorted(kwargs.items())))
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+        array = base_load(file, **kwargs)
+        if isinstance(array, numpy.ndarray) and array.nbytes <= MATRIX_CACHE_LIMIT:
+            array.setflags(write=False)
+            cache[key] = array
+            cache_size[0] += array.nbytes
+            while cache_size[0] > MATRIX_CACHE_LIMIT:
+                cache_size[0] -= cache.popitem(last=False)[1].nbytes
+        return array
+
+    numpy.load = cached_load
+
+
+def run_worker():
+    """Run the commands that are requested through stdin until stdin is closed."""
+    import runpy
+    import logging
+    import traceback
+    import tracemalloc
+
+    # send anything written to stderr outside of a command to a log file
+    log_file = open(LOG_FILE, 'a')
+    os.dup2(log_file.fileno(), 2)
+
+    import click
+    from honeybee_radiance_postprocess.cli import postprocess
+    cache_matrix_loads()
+
+    for line in iter(sys.stdin.readline, ''):
+        request = json.loads(line)
+        stdout, stderr = io.StringIO(), ProgressStream()
+        handler = logging.StreamHandler(stderr)
+        logging.getLogger().addHandler(handler)
+        queued = time.time()
+        slot = acquire_slot()
+        started = time.time()
+        sys.stdout.write(START_TAG + '\n')
+        sys.stdout.flush()
+        if request.get('trace'):
+            tracemalloc.start()
+        sys.stdout, sys.stderr = stdout, stderr
+        try:
+            os.chdir(request['cwd'])
+            if request.get('script'):  # run a script instead of a command
+                sys.argv = [request['script']] + request['args']
+                runpy.run_path(request['script'], run_name='__main__')
+            else:
+                postprocess.main(args=request['args'],
+                                 prog_name='honeybee-radiance-postprocess',
+                                 standalone_mode=False)
+            returncode = 0
+        except click.ClickException as e:
+            e.show(file=stderr)
+            returncode = e.exit_code
+        except SystemExit as e:
+            returncode = e.code if isinstance(e.code, int) else 0 if e.code is None else 1
+        except Exception:
+            traceback.print_exc()
+            returncode = 1
+        finally:
+            sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+            logging.getLogger().removeHandler(handler)
+            release_slot(slot)
+        timings = {'queue': started - queued, 'run': time.time() - started}
+        if request.get('trace'):
+            timings['worker_mb'] = tracemalloc.get_traced_memory()[1] / 1048576.0
+            tracemalloc.stop()
+        response = {'returncode': returncode, 'stdout': stdout.getvalue(),
+                    'stderr': stderr.getvalue(), 'timings': timings}
+        sys.stdout.write('{}{}\n'.format(WORKER_TAG, json.dumps(response)))
+        sys.stdout.flush()
+
+
+def run_command(args):
+    """Run a single command in this process once a slot on the machine is free.
+
+    This is used in place of the worker when the worker cannot be used.
+
+    Args:
+        args: A list of arguments for the honeybee-radiance-postprocess CLI,
+            which can start with --script and the path to a Python script that
+            will be run with the rest of the args instead of the CLI.
+    """
+    slot = acquire_slot()
+    try:
+        if args[:1] == ['--script']:
+            import runpy
+            sys.argv = args[1:]
+            runpy.run_path(args[1], run_name='__main__')
+        else:
+            from honeybee_radiance_postprocess.cli import postprocess
+            postprocess.main(args=args, prog_name='honeybee-radiance-postprocess')
+    finally:
+        release_slot(slot)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        run_command(sys.argv[1:])
+    else:
+        run_worker()
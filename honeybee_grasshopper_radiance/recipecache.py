@@ -0,0 +1,294 @@
+"""Reuse the results of recipe runs for the components under 3 :: Recipes.
+
+Each recipe still runs in the project folder that its run settings specify. Once
+a run has finished, the files of its project folder are hard linked (or copied
+where links are not supported) into a sub-folder of the recipe cache that is named
+after a hash of the recipe name, all of its inputs and the versions of the
+libraries that produced the results. When the recipe is run again with the same
+inputs, these files are put back into the project folder instead of running the
+recipe again. The cache can be turned off by setting enabled to false in the
+cache_config.json of the recipe cache folder.
+"""
+import os
+import sys
+import json
+import shutil
+import hashlib
+
+try:
+    from honeybee.config import folders
+except ImportError as e:
+    raise ImportError('\nFailed to import honeybee:\n\t{}'.format(e))
+
+try:
+    from honeybee_radiance.config import folders as rad_folders
+except ImportError as e:
+    raise ImportError('\nFailed to import honeybee_radiance:\n\t{}'.format(e))
+
+from honeybee_grasshopper_radiance.postprocess import write_atomic
+
+
+CACHE_FOLDER = '__recipe_cache__'
+CACHE_CONFIG = 'cache_config.json'
+RECIPE_CACHE_LIMIT = 20  # default gigabytes of recipe runs to keep in the cache
+
+
+def _cache_root():
+    """Get the folder in which the recipe runs are cached."""
+    return os.path.join(folders.default_simulation_folder, CACHE_FOLDER)
+
+
+def package_version(package):
+    """Get the installed version of a package from the name of its metadata folder.
+
+    Args:
+        package: Text for the name of the importable package (eg. honeybee_radiance).
+
+    Returns:
+        Text for the version of the package. None if the package is not installed
+        or its version cannot be found.
+    """
+    for path in sys.path:
+        try:
+            entries = os.listdir(path)
+        except (OSError, TypeError):  # not a folder
+            continue
+        for entry in entries:
+            name, ext = os.path.splitext(entry)
+            if ext in ('.dist-info', '.egg-info') and '-' in name:
+                pkg_name, version = name.split('-')[:2]
+                if pkg_name.replace('.', '_').lower() == package.lower():
+                    return version
+    return None
+
+
+def cache_config():
+    """Get the settings of the recipe cache.
+
+    The settings are read from the cache_config.json in the recipe cache folder,
+    which is written with the default settings the first time that the cache is
+    used such that it can be edited to change them. The settings are limit_gb
+    for the gigabytes of recipe runs to keep in the cache and enabled to
+    note whether the cache is used at all.
+    """
+    config_file = os.path.join(_cache_root(), CACHE_CONFIG)
+    config = {'limit_gb': RECIPE_CACHE_LIMIT, 'enabled': True}
+    if os.path.isfile(config_file):
+        try:
+            with open(config_file) as inf:
+                user_config = json.load(inf)
+            config['limit_gb'] = float(user_config.get('limit_gb', RECIPE_CACHE_LIMIT))
+            config['enabled'] = bool(user_config.get('enabled', True))
+        except (EnvironmentError, ValueError, TypeError, AttributeError):
+            print('Failed to read the recipe cache settings from "{}". The default '
+                  'settings will be used.'.format(config_file))
+    else:
+        write_atomic(config_file, json.dumps(config))
+    return config
+
+
+def cache_limit():
+    """Get the number of bytes of recipe runs to keep in the cache."""
+    return int(cache_config()['limit_gb'] * 1024 ** 3)
+
+
+def _read_info(info_file):
+    """Read the cache_info.json of a cached run or get None if it cannot be read."""
+    try:
+        with open(info_file) as inf:
+            return json.load(inf)
+    except (EnvironmentError, ValueError):  # missing or being replaced
+        return None
+
+
+def input_fingerprint(value):
+    """Get a JSON-serializable fingerprint of the value of a recipe input.
+
+    Objects are represented by their dictionaries and files by a hash of their
+    contents such that identical inputs always produce the same fingerprint.
+    """
+    if isinstance(value, (list, tuple)):
+        return [input_fingerprint(val) for val in value]
+    try:
+        return value.to_dict()
+    except AttributeError:  # not a Ladybug Tools object
+        pass
+    if isinstance(value, str) and os.path.isfile(value):
+        file_hash = hashlib.md5()
+        with open(value, 'rb') as inf:
+            for chunk in iter(lambda: inf.read(1048576), b''):
+                file_hash.update(chunk)
+        return file_hash.hexdigest()
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def _settings_folder(run_settings):
+    """Get the folder of recipe settings without changing the settings."""
+    if run_settings is None:
+        return None
+    if isinstance(run_settings, str):
+        try:
+            from lbt_recipes.settings import RecipeSettings
+        except ImportError as e:
+            raise ImportError('\nFailed to import lbt_recipes:\n\t{}'.format(e))
+        run_settings = RecipeSettings.from_string(run_settings)
+    return run_settings.folder
+
+
+def _folder_files(folder):
+    """Get a list with the relative path, size and modified time of each file."""
+    files = []
+    for root, _, f_names in os.walk(folder):
+        for f_name in f_names:
+            f_path = os.path.join(root, f_name)
+            stat = os.stat(f_path)
+            files.append([os.path.relpath(f_path, folder), stat.st_size,
+                          int(stat.st_mtime)])
+    return files
+
+
+def _changed_files(folder, files):
+    """Get the files recorded for a run that have been changed or deleted in a folder."""
+    changed = []
+    for rel_path, size, mtime in files:
+        try:
+            stat = os.stat(os.path.join(folder, rel_path))
+        except OSError:  # the file has been deleted
+            changed.append([rel_path, size, mtime])
+            continue
+        if stat.st_size != size or int(stat.st_mtime) != mtime:
+            changed.append([rel_path, size, mtime])
+    return changed
+
+
+def _files_match(folder, files):
+    """Check whether a folder still contains the files recorded for a run."""
+    return len(_changed_files(folder, files)) == 0
+
+
+def _link_files(source, target, files):
+    """Hard link the files of a source folder into a target folder.
+
+    Files are copied instead if hard links are not supported, like when the
+    folders are on different drives. Any existing file of the target is replaced.
+    """
+    for rel_path, _, _ in files:
+        src_file = os.path.join(source, rel_path)
+        dest_file = os.path.join(target, rel_path)
+        dest_dir = os.path.dirname(dest_file)
+        if not os.path.isdir(dest_dir):
+            os.makedirs(dest_dir)
+        elif os.path.isfile(dest_file):
+            os.remove(dest_file)
+        try:
+            os.link(src_file, dest_file)
+        except (AttributeError, OSError):  # hard links are not available
+            shutil.copy2(src_file, dest_file)
+
+
+def recipe_cache(recipe_name, run_settings, *inputs):
+    """Get the cache folder of a recipe run and the project folder of an identical run.
+
+    If the recipe has already been run with the same inputs and settings folder,
+    the project folder of that run is returned. Any file of the run that has since
+    been changed or deleted is first put back from the cache while all other
+    files of the project folder are left as they are.
+
+    Args:
+        recipe_name: Text for the name of the recipe.
+        run_settings: The run_settings_ of the recipe component, which are only
+            read to get the folder in which the recipe is run.
+        inputs: The values of all inputs that are passed to the recipe.
+
+    Returns:
+        A tuple with two values.
+
+        -   cache_dir: The sub-folder of the recipe cache for this run, which
+            should be passed to cache_recipe once the results have been loaded.
+            This is None if the cache is turned off.
+
+        -   project_folder: The project folder of a previous run with the same
+            inputs. This is None if there is no such run in the cache.
+    """
+    if not cache_config()['enabled']:
+        return None, None
+    key = [
+        recipe_name, [input_fingerprint(inp) for inp in inputs],
+        _settings_folder(run_settings), package_version('honeybee_radiance'),
+        package_version('lbt_recipes'), rad_folders.radiance_version_str
+    ]
+    key_str = json.dumps(key, sort_keys=True)
+    cache_dir = os.path.join(
+        _cache_root(), hashlib.md5(key_str.encode('utf-8')).hexdigest())
+    info_file = os.path.join(cache_dir, 'cache_info.json')
+    info = _read_info(info_file)
+    if info is None:
+        return cache_dir, None
+    project_folder, files = info['project_folder'], info['files']
+    changed = _changed_files(project_folder, files)
+    if changed:
+        # put the changed results back as if the recipe had been run again
+        cached_files = os.path.join(cache_dir, 'project')
+        if not _files_match(cached_files, changed):
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            return cache_dir, None
+        _link_files(cached_files, project_folder, changed)
+    os.utime(info_file, None)  # mark the run as recently used
+    return cache_dir, project_folder
+
+
+def cache_recipe(recipe_name, cache_dir, project_folder):
+    """Record a recipe run in the cache and evict the least recently used runs.
+
+    Args:
+        recipe_name: Text for the name of the recipe.
+        cache_dir: The cache sub-folder returned by recipe_cache. If None, the
+            cache is turned off and the run is not recorded.
+        project_folder: The project folder of the successful recipe run.
+
+    Returns:
+        Text to report the runs that were removed from the cache to keep it
+        under its limit. None if no runs were removed.
+    """
+    if cache_dir is None:
+        return None
+    project_folder = os.path.abspath(project_folder)
+    info_file = os.path.join(cache_dir, 'cache_info.json')
+    info = _read_info(info_file)
+    if info is not None and info['project_folder'] == project_folder and \
+            _files_match(project_folder, info['files']):
+        return None  # the run is already in the cache
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    files = _folder_files(project_folder)
+    _link_files(project_folder, os.path.join(cache_dir, 'project'), files)
+    write_atomic(info_file, json.dumps(
+        {'recipe': recipe_name, 'project_folder': project_folder,
+         'size': sum(f[1] for f in files), 'files': files}))
+
+    # evict the least recently used runs if the cache is larger than its limit
+    limit, cache_root = cache_limit(), _cache_root()
+    entries = []
+    for entry in os.listdir(cache_root):
+        entry_info = os.path.join(cache_root, entry, 'cache_info.json')
+        e_info = _read_info(entry_info)
+        if e_info is not None:  # skip runs that are still being recorded
+            entries.append((os.path.getmtime(entry_info), e_info['size'], entry,
+                            e_info['recipe'], e_info['project_folder']))
+    total_size = sum(entry[1] for entry in entries)
+    removed = []
+    for _, e_size, entry, e_recipe, e_folder in sorted(entries):
+        if total_size <= limit:
+            break
+        if entry != os.path.basename(cache_dir):
+            shutil.rmtree(os.path.join(cache_root, entry), ignore_errors=True)
+            total_size -= e_size
+            removed.append('{} run of {} ({:.2f} GB)'.format(
+                e_recipe, e_folder, e_size / 1024. ** 3))
+    if not removed:
+        return None
+    return 'Removed {} previous runs from the recipe cache to keep it under {:.2f} GB. ' \
+        'This limit can be changed in "{}".\n  {}'.format(
+            len(removed), limit / 1024. ** 3, os.path.join(cache_root, CACHE_CONFIG),
+            '\n  '.join(removed))
@@ -0,0 +1,602 @@
+"""Read the results of legacy annual results folders for the components under 4 :: Results.
+
+Legacy results folders have a .ill or .dgp text file for each sensor grid (or a
+compressed archive of one from the "HB Archive Results" component) and the
+helpers in this module read them without NumPy such that they run inside of
+Grasshopper. A manifest of the grids of each folder and of the offset of each
+sensor row in its files is kept in the __cache__ of the folder such that the
+rows of selected sensors can be read without scanning the files.
+
+The module also holds the compact Grid Results that the result components can
+output in place of a data tree and the data collections of annual data that are
+only read from their exported binary file once they are used.
+"""
+import os
+import sys
+import json
+import mmap
+import uuid
+import zlib
+import array
+import heapq
+import struct
+import hashlib
+import threading
+from itertools import compress
+
+try:
+    import lzma
+except ImportError:  # IronPython does not have lzma
+    lzma = None
+
+try:
+    from ladybug.datacollection import HourlyContinuousCollection
+    from ladybug.futil import write_to_file
+except ImportError as e:
+    raise ImportError('\nFailed to import ladybug:\n\t{}'.format(e))
+
+try:
+    from honeybee_radiance.postprocess.annualdaylight import _process_input_folder
+except ImportError as e:
+    raise ImportError('\nFailed to import honeybee_radiance:\n\t{}'.format(e))
+
+try:
+    import scriptcontext as sc
+    sticky = sc.sticky
+except ImportError:  # not running inside of Rhino
+    sticky = {}
+
+from honeybee_grasshopper_radiance.postprocess import cache_postprocess
+
+
+ARCHIVE_EXT = '.hbz'  # extension of compressed result archives
+CACHE_LOCK = threading.Lock()  # grids can be cached at the same time by map_grids
+
+
+def processor_count():
+    """Get the number of processors that are available on this machine."""
+    try:
+        import System
+        return System.Environment.ProcessorCount
+    except ImportError:  # not running in IronPython
+        import multiprocessing
+        return multiprocessing.cpu_count()
+
+
+def map_grids(grid_func, grids, cpu_count=None):
+    """Apply a function to each grid using several threads.
+
+    Args:
+        grid_func: A function that takes a single grid and returns its result.
+        grids: A list of the grids to be processed.
+        cpu_count: An integer for the number of threads to use. If None, one
+            thread will be used for each available processor.
+
+    Returns:
+        A list with the result of each grid in the same order as the input grids.
+    """
+    cpu_count = processor_count() if cpu_count is None else cpu_count
+    if cpu_count <= 1 or len(grids) <= 1:
+        return [grid_func(grid) for grid in grids]
+
+    results, errors, lock = [None] * len(grids), [], threading.Lock()
+    remaining = list(reversed(range(len(grids))))
+
+    def process_grids():
+        while len(errors) == 0:
+            with lock:
+                if len(remaining) == 0:
+                    return
+                i = remaining.pop()
+            try:
+                results[i] = grid_func(grids[i])
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=process_grids)
+               for _ in range(min(cpu_count, len(grids)))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if len(errors) != 0:
+        raise errors[0]
+    return results
+
+
+def sun_up_hour_mask(res_folder, sun_up_hours, hoys, timestep):
+    """Get a mask for the sun-up hours that fall within a list of hoys.
+
+    Masks are cached in the sticky for each sun-up-hours file, list of hoys and
+    timestep such that they are shared by all of the result components.
+
+    Args:
+        res_folder: The results folder containing the sun-up-hours.txt file.
+        sun_up_hours: A list of numbers for the sun-up hours.
+        hoys: A list of 8760 * timestep values for the hoys to select. If an empty
+            list is passed, None will be returned.
+        timestep: Integer for the timestep of the analysis.
+
+    Returns:
+        A bytearray with a 1 for each sun-up hour to include and a 0 for each
+        sun-up hour to exclude.
+    """
+    if len(hoys) == 0:
+        return None
+    suh_file = os.path.abspath(os.path.join(res_folder, 'sun-up-hours.txt'))
+    suh_stat = os.stat(suh_file)
+    mask_key = (suh_file, suh_stat.st_size, suh_stat.st_mtime, tuple(hoys), timestep)
+    masks = sticky.setdefault('hb_radiance_sun_up_hour_masks', {})
+    su_mask = masks.get(mask_key)
+    if su_mask is None:
+        hoy_steps = set(int(hr * timestep) for hr in hoys)
+        su_mask = bytearray(1 if int(h * timestep) in hoy_steps else 0
+                            for h in sun_up_hours)
+        if len(masks) >= 16:  # only keep the masks of the last few inputs
+            masks.clear()
+        masks[mask_key] = su_mask
+    return su_mask
+
+
+def archive_rows(arc_file, wanted=None):
+    """Yield the index and an array of the values of each row of a result archive.
+
+    Archives that record the decimal places of their text file yield arrays of
+    doubles that are rounded to these decimal places such that the values equal
+    those of the text file. Otherwise, arrays of float32 values are yielded.
+
+    Args:
+        arc_file: Path to an archive from the "HB Archive Results" component.
+        wanted: An optional set of row indices to yield. Chunks of the archive
+            without any of these rows are skipped without being decompressed.
+    """
+    with open(arc_file, 'rb') as arc:
+        arc.seek(-8, os.SEEK_END)
+        footer_len = struct.unpack('<Q', arc.read(8))[0]
+        arc.seek(-8 - footer_len, os.SEEK_END)
+        info = json.loads(arc.read(footer_len).decode('utf-8'))
+        if info['compression'] == 'lzma':
+            if lzma is None:
+                raise ValueError('Archives with lzma compression can only be read '
+                                 'with CPython:\n{}'.format(arc_file))
+            decompress = lzma.decompress
+        else:
+            decompress = zlib.decompress
+        columns, decimals, row_i = info['columns'], info.get('decimals'), 0
+        for start, size, rows in info['chunks']:
+            if wanted is None or any(i in wanted for i in range(row_i, row_i + rows)):
+                arc.seek(start)
+                data = decompress(arc.read(size))
+                values = array.array('f')
+                try:
+                    values.frombytes(data)
+                except AttributeError:  # IronPython
+                    values.fromstring(data)
+                if sys.byteorder == 'big':
+                    values.byteswap()
+                for i in range(rows):
+                    if wanted is None or row_i + i in wanted:
+                        row = values[i * columns:(i + 1) * columns]
+                        if decimals is not None:  # undo the float32 rounding
+                            row = array.array('d', [round(v, decimals) for v in row])
+                        yield row_i + i, row
+            row_i += rows
+
+
+def result_file(res_folder, full_id):
+    """Get the path to the result file of a grid, which may be a compressed archive.
+
+    The .dgp file of a glare study is used over a .ill file and a text file is
+    used over an archive of the same results.
+    """
+    for ext in ('.dgp', '.ill'):
+        res_file = os.path.join(res_folder, '{}{}'.format(full_id, ext))
+        if os.path.isfile(res_file):
+            return res_file
+        if os.path.isfile(res_file + ARCHIVE_EXT):
+            return res_file + ARCHIVE_EXT
+    return os.path.join(res_folder, '{}.ill'.format(full_id))
+
+
+def result_values(res_file, su_pattern=None):
+    """Yield the values of each sensor row in a result file or a compressed archive.
+
+    Args:
+        res_file: Path to a .ill or .dgp result file or an archive of one.
+        su_pattern: An optional mask for the values to include from each row.
+    """
+    if res_file.endswith(ARCHIVE_EXT):
+        for _, values in archive_rows(res_file):
+            yield values.tolist() if su_pattern is None else \
+                list(compress(values, su_pattern))
+        return
+    with open(res_file) as results:
+        for pt_res in results:
+            yield list(map(float, pt_res.split())) if su_pattern is None else \
+                list(map(float, compress(pt_res.split(), su_pattern)))
+
+
+def write_manifest_file(man_file, content):
+    """Write a file of the results folder manifest without others reading a partial file.
+
+    Returns:
+        True if the file was written and False if the results folder is read-only.
+    """
+    man_dir = os.path.dirname(man_file)
+    try:
+        if not os.path.isdir(man_dir):
+            try:
+                os.makedirs(man_dir)
+            except EnvironmentError:  # another grid may have created it first
+                if not os.path.isdir(man_dir):
+                    raise
+        temp_file = '{}.{}.tmp'.format(man_file, uuid.uuid4().hex)
+        with open(temp_file, 'wb') as outf:
+            outf.write(content)
+        try:
+            os.rename(temp_file, man_file)
+        except OSError:  # the same file was written by another grid
+            os.remove(temp_file)
+    except EnvironmentError:  # the results folder is read-only
+        return False
+    return True
+
+
+def results_manifest(res_folder):
+    """Get the grids and the sun-up hours of a results folder from its manifest.
+
+    The manifest is written once per results folder and it is only rebuilt
+    if the grids_info.json or the sun-up-hours.txt of the folder change.
+    """
+    sources = [os.path.join(res_folder, f) for f in ('grids_info.json', 'sun-up-hours.txt')]
+    signature = [[os.path.getsize(f), os.path.getmtime(f)] for f in sources]
+    man_file = os.path.join(res_folder, '__cache__', 'manifest', 'manifest.json')
+    if os.path.isfile(man_file):
+        with open(man_file) as inf:
+            manifest = json.load(inf)
+        if manifest['signature'] == signature:
+            return manifest['grids'], manifest['sun_up_hours']
+    grids, sun_up_hours = _process_input_folder(res_folder, '*')
+    manifest = {'signature': signature, 'grids': grids, 'sun_up_hours': sun_up_hours}
+    write_manifest_file(man_file, json.dumps(manifest).encode('utf-8'))
+    return grids, sun_up_hours
+
+
+def row_index(res_file):
+    """Get the path to a file with the byte offset of each sensor row in a result file.
+
+    The index is written to the manifest of the results folder the first time
+    that the result file is read with a point filter. It is a list of unsigned
+    64-bit integers for the start of each row followed by the end of the file.
+
+    Returns:
+        The path to the index file or None if it cannot be written.
+    """
+    f_stat = os.stat(res_file)
+    idx_file = os.path.join(
+        os.path.dirname(res_file), '__cache__', 'manifest', '{}_{}_{}.idx'.format(
+            os.path.basename(res_file), f_stat.st_size, int(f_stat.st_mtime)))
+    if os.path.isfile(idx_file):
+        return idx_file
+    offsets = [0]
+    with open(res_file, 'rb') as results:
+        try:
+            res_map = mmap.mmap(results.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:  # empty file or memory-mapping is not supported
+            res_map = None
+        if res_map is None:
+            for pt_res in results:
+                offsets.append(offsets[-1] + len(pt_res))
+        else:
+            try:
+                size = len(res_map)
+                end = res_map.find(b'\n')
+                while end != -1:
+                    offsets.append(end + 1)
+                    end = res_map.find(b'\n', end + 1)
+                if offsets[-1] != size:
+                    offsets.append(size)
+            finally:
+                res_map.close()
+    content = struct.pack('<{}Q'.format(len(offsets)), *offsets)
+    return idx_file if write_manifest_file(idx_file, content) else None
+
+
+def _ranked_value(values, zero_count, rank):
+    """Get the value at a rank of the values after adding zeros to them.
+
+    Only the values between the zeros and the rank are selected with a heap, which
+    avoids sorting all of the values. This is often instant for annual results
+    since the sun-down hours put the middle of each sensor among the zeros.
+    """
+    negatives = [v for v in values if v < 0]
+    if rank < len(negatives):
+        return heapq.nsmallest(rank + 1, negatives)[-1]
+    positives = [v for v in values if v > 0]
+    rank -= len(negatives) + zero_count + len(values) - len(negatives) - len(positives)
+    if rank < 0:
+        return 0
+    if rank < len(positives) // 2:
+        return heapq.nsmallest(rank + 1, positives)[-1]
+    return heapq.nlargest(len(positives) - rank, positives)[-1]
+
+
+def sensor_median(values, total_count):
+    """Get the median of sensor values that are padded with zeros to a total count.
+
+    The zeros stand for the sun-down hours in the same way as the median-values
+    command of honeybee-radiance-postprocess.
+    """
+    zero_count = max(total_count - len(values), 0)
+    count = len(values) + zero_count
+    if count == 0:
+        return 0
+    mid = count // 2
+    if count % 2 == 1:
+        return _ranked_value(values, zero_count, mid)
+    return (_ranked_value(values, zero_count, mid - 1) +
+            _ranked_value(values, zero_count, mid)) / 2.0
+
+
+def result_statistics(res_file, su_pattern, statistics, median_count=None):
+    """Get statistics of each sensor in a result file using a single pass.
+
+    The statistics are written to a sub-folder of the __cache__ folder next to
+    the result file such that any of the result components can reuse them as long
+    as the result file and the su_pattern have not changed.
+
+    Args:
+        res_file: Path to a .ill or .dgp result file or an archive of one.
+        su_pattern: A mask for the sun-up hours to include from sun_up_hour_mask.
+            If None, all sun-up hours will be included.
+        statistics: A list of the statistics to get, which can include total,
+            count, median, minimum and maximum for each sensor as well as
+            timestep_total for the total across all sensors at each timestep.
+        median_count: An integer for the number of hours over which the median
+            of each sensor is computed. Hours that are not in the result file
+            count as zero. This is required when the median is requested.
+
+    Returns:
+        A dictionary with a list of values for each of the statistics along with
+        any other statistics that have already been computed for the file.
+    """
+    # check whether the statistics have already been computed
+    pattern_str = 'all' if su_pattern is None else \
+        ''.join('1' if is_hoy else '0' for is_hoy in su_pattern)
+    res_stat = os.stat(res_file)
+    key_str = json.dumps([
+        'result-statistics', os.path.basename(res_file), res_stat.st_size,
+        res_stat.st_mtime, hashlib.md5(pattern_str.encode('utf-8')).hexdigest()])
+    res_dir = os.path.dirname(res_file)
+    sub_folder = os.path.join(
+        '__cache__', hashlib.md5(key_str.encode('utf-8')).hexdigest())
+    stat_file = os.path.join(res_dir, sub_folder, 'statistics.json')
+    cached = {}
+    try:
+        with open(stat_file) as sf:
+            cached = json.load(sf)
+        if 'median' in cached and cached.get('median_count') != median_count:
+            cached.pop('median')  # a median over another number of hours
+        if all(stat in cached for stat in statistics):
+            os.utime(os.path.join(res_dir, sub_folder, 'cache_info.json'), None)
+            return cached
+    except (EnvironmentError, ValueError):  # not computed or evicted
+        pass
+
+    # compute the statistics in one pass over the result file
+    statistics = set(statistics).union(
+        stat for stat in cached if stat != 'median_count')
+    funcs = [(stat, func) for stat, func in (
+        ('total', sum), ('count', len), ('minimum', min), ('maximum', max),
+        ('median', lambda values: sensor_median(values, median_count)))
+        if stat in statistics]
+    stats = {stat: [] for stat, _ in funcs}
+    step_totals = [] if 'timestep_total' in statistics else None
+    for values in result_values(res_file, su_pattern):
+        for stat, func in funcs:
+            stats[stat].append(func(values) if len(values) != 0 else 0)
+        if step_totals is not None:
+            step_totals = values if len(step_totals) == 0 else \
+                [tot + val for tot, val in zip(step_totals, values)]
+    if step_totals is not None:
+        stats['timestep_total'] = step_totals
+    if 'median' in stats:
+        stats['median_count'] = median_count
+
+    # write the statistics into the cache so other components can use them
+    try:
+        write_to_file(stat_file, json.dumps(stats), mkdir=True)
+        with CACHE_LOCK:
+            cache_postprocess(res_dir, sub_folder)
+    except EnvironmentError:  # the results folder is read-only
+        pass
+    return stats
+
+
+def dynamic_schedule(schedules):
+    """Get a DynamicSchedule from the objects connected to the dyn_sch_ input.
+
+    The honeybee_radiance_postprocess package loads NumPy (and CuPy when it is
+    installed) and so it is only imported once a dynamic schedule is connected.
+    """
+    try:
+        from honeybee_radiance_postprocess.dynamic import DynamicSchedule
+    except ImportError as e:
+        raise ImportError('\nFailed to import honeybee_radiance_postprocess:\n\t{}'.format(e))
+    return schedules[0] if isinstance(schedules[0], DynamicSchedule) else \
+        DynamicSchedule.from_group_schedules(schedules)
+
+
+class GridResults(object):
+    """Compact results of sensor grids with the values of all sensors in one array.
+
+    Passing these objects between components avoids building a data tree with
+    a number for every sensor, which is slow and uses a lot of memory for large
+    models. The "HB Expand Grid Results" component can turn them into a data
+    tree for any component that needs one.
+
+    Args:
+        metric: Text for the metric of the values (eg. average, DA).
+        grid_ids: A list with the full_id of each sensor grid.
+        counts: A list with the number of sensors in each grid.
+        values: An array of doubles with the values of all sensors, ordered
+            by the grids.
+    """
+    __slots__ = ('metric', 'grid_ids', 'counts', 'values')
+
+    def __init__(self, metric, grid_ids, counts, values):
+        assert len(grid_ids) == len(counts), 'The number of grid_ids ({}) does not ' \
+            'match the number of counts ({}).'.format(len(grid_ids), len(counts))
+        assert sum(counts) == len(values), 'The number of values ({}) does not ' \
+            'match the number of sensors ({}).'.format(len(values), sum(counts))
+        self.metric = metric
+        self.grid_ids = list(grid_ids)
+        self.counts = list(counts)
+        self.values = values
+
+    @classmethod
+    def from_lists(cls, metric, grids, grid_values):
+        """Create results from a list of grids_info and a list of values for each grid."""
+        values = array.array('d')
+        for grid_vals in grid_values:
+            values.extend(grid_vals)
+        return cls(metric, [grid['full_id'] for grid in grids],
+                   [len(grid_vals) for grid_vals in grid_values], values)
+
+    @classmethod
+    def from_folder(cls, metric, folder, extension, is_percent=False):
+        """Read results from a folder with a grids_info.json and a file for each grid.
+
+        The values are parsed directly into the array without creating a list
+        for each grid.
+        """
+        with open(os.path.join(folder, 'grids_info.json')) as inf:
+            grids = json.load(inf)
+        values = array.array('d')
+        for grid in grids:
+            res_file = os.path.join(folder, '{}.{}'.format(grid['full_id'], extension))
+            with open(res_file) as inf:
+                for _ in range(grid.get('start_ln', 0)):
+                    next(inf)
+                grid_vals = (float(next(inf)) for _ in range(grid['count']))
+                if is_percent:
+                    grid_vals = (min(val, 100) for val in grid_vals)
+                values.extend(grid_vals)
+        return cls(metric, [grid['full_id'] for grid in grids],
+                   [grid['count'] for grid in grids], values)
+
+    def grid_values(self, grid_id):
+        """Get a list of the values of a grid using its full_id."""
+        i = self.grid_ids.index(grid_id)
+        start = sum(self.counts[:i])
+        return self.values[start:start + self.counts[i]].tolist()
+
+    def to_lists(self):
+        """Get a list of lists with the values of each grid."""
+        grid_values, start = [], 0
+        for count in self.counts:
+            grid_values.append(self.values[start:start + count].tolist())
+            start += count
+        return grid_values
+
+    def ToString(self):
+        """Overwrite .NET ToString method."""
+        return self.__repr__()
+
+    def __len__(self):
+        return len(self.grid_ids)
+
+    def __repr__(self):
+        return 'Grid Results: {} [{} grids, {} sensors]'.format(
+            self.metric, len(self.grid_ids), len(self.values))
+
+
+class AnnualDataCollection(HourlyContinuousCollection):
+    """Hourly continuous collection that reads its values from a binary file when used.
+
+    Until the values are first needed, the collection only holds its header and
+    either the position of its row of float32 values in the binary file of a grid
+    that was exported by "HB Annual Results to Data" or a typed array of its values.
+    Otherwise, it behaves like any other HourlyContinuousCollection.
+
+    Args:
+        header: A Ladybug Header object.
+        values: A list of values.
+    """
+    __slots__ = ('_row', '_row_values', '_row_steps')
+
+    def __init__(self, header, values):
+        self._row, self._row_steps = None, None
+        HourlyContinuousCollection.__init__(self, header, values)
+
+    @classmethod
+    def from_row(cls, header, bin_file, row_index):
+        """Create a data collection from a row of values in a binary file.
+
+        Args:
+            header: A Ladybug Header object with an annual analysis period.
+            bin_file: Path to a binary file with a row of little-endian float32
+                values for each timestep of the year for each sensor.
+            row_index: The index of the row of this data collection in the file.
+        """
+        data_coll = cls.__new__(cls)
+        data_coll._header = header
+        data_coll._datetimes = None
+        data_coll._validated_a_period = True
+        data_coll._row_values, data_coll._row_steps = None, None
+        data_coll._row = (bin_file, row_index)
+        return data_coll
+
+    @classmethod
+    def from_array(cls, header, values, timesteps=None):
+        """Create a data collection from a typed array of values.
+
+        Args:
+            header: A Ladybug Header object with an annual analysis period.
+            values: An array.array of values, which is only converted to a list
+                when the values of the data collection are used.
+            timesteps: An optional list with the index of the timestep of the year
+                of each of the values, in which case all other timesteps are zero.
+                If None, the values must have one value for each timestep
+                of the year. (Default: None).
+        """
+        data_coll = cls.__new__(cls)
+        data_coll._header = header
+        data_coll._datetimes = None
+        data_coll._validated_a_period = True
+        data_coll._row_values, data_coll._row_steps = values, timesteps
+        data_coll._row = None
+        return data_coll
+
+    @property
+    def _values(self):
+        """Get the list of values, which is read from the binary file the first time."""
+        if self._row is not None:
+            bin_file, row_index = self._row
+            count = 8760 * self._header.analysis_period.timestep
+            row = array.array('f')
+            try:
+                with open(bin_file, 'rb') as inf:
+                    inf.seek(4 * count * row_index)
+                    row.fromfile(inf, count)
+            except (EnvironmentError, EOFError):
+                raise ValueError(
+                    'The annual data of the "HB Annual Results to Data" component has '
+                    'been removed from:\n{}\nRecompute the component to export it '
+                    'again.'.format(os.path.dirname(bin_file)))
+            if sys.byteorder != 'little':
+                row.byteswap()
+            self._row_values, self._row = row, None
+        if isinstance(self._row_values, array.array):
+            if self._row_steps is None:
+                self._row_values = self._row_values.tolist()
+            else:
+                values = [0] * (8760 * self._header.analysis_period.timestep)
+                for step, val in zip(self._row_steps, self._row_values):
+                    values[step] = val
+                self._row_values, self._row_steps = values, None
+        return self._row_values
+
+    @_values.setter
+    def _values(self, values):
+        self._row, self._row_values, self._row_steps = None, values, None
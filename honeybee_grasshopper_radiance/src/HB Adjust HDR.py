@@ -31,7 +31,7 @@ be seen by a human eye and adding an optional text label to the image.
 
 ghenv.Component.Name = 'HB Adjust HDR'
 ghenv.Component.NickName = 'AdjustHDR'
-ghenv.Component.Message = '1.10.0'
+ghenv.Component.Message = '1.10.1'
 ghenv.Component.Category = 'HB-Radiance'
 ghenv.Component.SubCategory = '4 :: Results'
 ghenv.Component.AdditionalHelpFromDocStrings = '3'
@@ -55,12 +55,13 @@ try:  # import ladybug_rhino dependencies
 except ImportError as e:
     raise ImportError('\nFailed to import ladybug_rhino:\n\t{}'.format(e))
 
-# check the Radiance date of the installed radiance
-try:  # import lbt_recipes dependencies
-    from lbt_recipes.version import check_radiance_date
+try:
+    from honeybee_grasshopper_radiance.version import check_radiance_date_once
 except ImportError as e:
-    raise ImportError('\nFailed to import lbt_recipes:\n\t{}'.format(e))
-check_radiance_date()
+    raise ImportError('\nFailed to import honeybee_grasshopper_radiance:\n\t{}'.format(e))
+
+# check the Radiance date of the installed radiance once per Rhino session
+check_radiance_date_once()
 
 
 if all_required_inputs(ghenv.Component):
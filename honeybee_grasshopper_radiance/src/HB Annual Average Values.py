@@ -28,20 +28,30 @@ hour/timestep of the simulation.
             for which results will be computed. These HOYs can be obtained from the
             "LB Calculate HOY" or the "LB Analysis Period" components. If None, all
             hours of the results will be used.
-        median_: Set to True to get the median values instead of the average. The median
-            values can only be calculated for a results folder from the
-            "HB Annual Daylight" component. (Default: False).
+        median_: Set to True to get the median values instead of the average. The
+            hours when the sun is down count as zero for the median values.
+            (Default: False).
         grid_filter_: The name of a grid or a pattern to filter the grids. For instance,
             first_floor_* will simulate only the sensor grids that have an
             identifier that starts with first_floor_. By default all the grids
             will be processed.
+        cpu_count_: An integer to set the number of CPUs used to process the sensor
+            grids at the same time. This only applies to results that are not
+            in the newer numpy format. If unspecified, all available CPUs will
+            be used. Set to 1 to process the grids one after the other.
+        compact_: Set to True to output the values as a single compact Grid Results object
+            instead of a data tree. This object keeps the values of all sensors
+            in one array, which avoids the time and memory needed to build a
+            data tree for large models. It can be connected to the "HB Expand
+            Grid Results" component to get a data tree. (Default: False).
 
     Returns:
         report: Reports, errors, warnings, etc.
         values: Average illuminance or irradiance valules for each sensor in lux or W/m2.
             Each value is for a different sensor of the grid. These can be plugged
             into the "LB Spatial Heatmap" component along with meshes of the sensor
-            grids to visualize results.
+            grids to visualize results. This is a Grid Results object when
+            compact_ is set to True.
 """
 
 ghenv.Component.Name = 'HB Annual Average Values'
@@ -52,79 +62,33 @@ ghenv.Component.SubCategory = '4 :: Results'
 ghenv.Component.AdditionalHelpFromDocStrings = '2'
 
 import os
-import subprocess
-
-try:
-    from ladybug.futil import write_to_file
-except ImportError as e:
-    raise ImportError('\nFailed to import ladybug:\n\t{}'.format(e))
-
-try:
-    from honeybee.config import folders
-except ImportError as e:
-    raise ImportError('\nFailed to import honeybee:\n\t{}'.format(e))
+import json
+import shutil
 
 try:
     from honeybee_radiance.postprocess.annualdaylight import _process_input_folder
 except ImportError as e:
     raise ImportError('\nFailed to import honeybee_radiance:\n\t{}'.format(e))
 
-try:
-    from honeybee_radiance_postprocess.dynamic import DynamicSchedule
-except ImportError as e:
-    raise ImportError('\nFailed to import honeybee_radiance:\n\t{}'.format(e))
-
-try:
-    from pollination_handlers.outputs.helper import read_sensor_grid_result
-except ImportError as e:
-    raise ImportError('\nFailed to import pollination_handlers:\n\t{}'.format(e))
-
 try:
     from ladybug_rhino.grasshopper import all_required_inputs, list_to_data_tree, \
         give_warning
 except ImportError as e:
     raise ImportError('\nFailed to import ladybug_rhino:\n\t{}'.format(e))
 
-
-def parse_sun_up_hours(sun_up_hours, hoys, timestep):
-    """Parse the sun-up hours from the result file .txt file.
-
-    Args:
-        sun_up_hours: A list of integers for the sun-up hours.
-        hoys: A list of 8760 * timestep values for the hoys to select. If an empty
-            list is passed, None will be returned.
-        timestep: Integer for the timestep of the analysis.
-    """
-    if len(hoys) != 0:
-        schedule = [False] * (8760 * timestep)
-        for hr in hoys:
-            schedule[int(hr * timestep)] = True
-        su_pattern = [schedule[int(h * timestep)] for h in sun_up_hours]
-        return su_pattern
-
-
-def average_values(ill_file, su_pattern, full_len):
-    """Compute average values for a given result file."""
-    avg_vals = []
-    with open(ill_file) as results:
-        if su_pattern is None:  # no HOY filter on results
-            for pt_res in results:
-                values = [float(r) for r in pt_res.split()]
-                total_val = sum(values)
-                avg_vals.append(total_val / full_len)
-        else: 
-            for pt_res in results:
-                values = [float(r) for r, is_hoy in zip(pt_res.split(), su_pattern) if is_hoy]
-                total_val = sum(values)
-                try:
-                    avg_vals.append(total_val / full_len)
-                except ZeroDivisionError:
-                    avg_vals.append(0)
-    return avg_vals
+try:
+    from honeybee_grasshopper_radiance.postprocess import run_postprocess, \
+        timings_report, start_profile, mark_phase, write_profile, input_file, \
+        postprocess_cache, cache_postprocess
+    from honeybee_grasshopper_radiance.results import map_grids, sun_up_hour_mask, \
+        result_file, result_statistics, dynamic_schedule, GridResults
+except ImportError as e:
+    raise ImportError('\nFailed to import honeybee_grasshopper_radiance:\n\t{}'.format(e))
 
 
 if all_required_inputs(ghenv.Component):
     # set up the default values
+    profile = start_profile(ghenv.Component)
     median_ = False if median_ is None else median_
     grid_filter_ = '*' if grid_filter_ is None else grid_filter_
     res_folder = os.path.dirname(_results[0]) if os.path.isfile(_results[0]) \
@@ -134,43 +98,57 @@ if all_required_inputs(ghenv.Component):
     if os.path.isdir(os.path.join(res_folder, '__static_apertures__')) or \
         os.path.isfile(os.path.join(res_folder, 'grid_states.json')):
         res_type = 'average' if median_ is False else 'median'
-        cmds = [folders.python_exe_path, '-m', 'honeybee_radiance_postprocess',
-                'post-process', '{}-values'.format(res_type), res_folder, '-sf',
-                'metrics']
-        if len(_hoys_) != 0:
-            hoys_str = '\n'.join(str(h) for h in _hoys_)
-            hoys_file = os.path.join(res_folder, 'hoys.txt')
-            write_to_file(hoys_file, hoys_str)
-            cmds.extend(['--hoys-file', hoys_file])
-        if grid_filter_ != '*':
-            cmds.extend(['--grids-filter', grid_filter_])
+        dyn_sch = None
         if len(dyn_sch_) != 0:
             if os.path.isfile(os.path.join(res_folder, 'grid_states.json')):
-                dyn_sch = dyn_sch_[0] if isinstance(dyn_sch_[0], DynamicSchedule) else \
-                    DynamicSchedule.from_group_schedules(dyn_sch_)
-                dyn_sch_file = dyn_sch.to_json(folder=res_folder)
-                cmds.extend(['--states', dyn_sch_file])
+                dyn_sch = dynamic_schedule(dyn_sch_)
             else:
                 msg = 'No dynamic aperture groups were found in the Model.\n' \
                     'The input dynamic schedules will be ignored.'
                 print(msg)
                 give_warning(ghenv.Component, msg)
-        use_shell = True if os.name == 'nt' else False
-        custom_env = os.environ.copy()
-        custom_env['PYTHONHOME'] = ''
-        process = subprocess.Popen(
-            cmds, cwd=res_folder, shell=use_shell, env=custom_env,
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        stdout, stderr = process.communicate()  # wait for the process to finish
-        print(stderr)
-        returncode = process.wait()
-        if returncode != 0:
+
+        # check whether the results have already been computed for these inputs
+        dyn_sch_dict = dyn_sch.to_dict() if dyn_sch is not None else None
+        sub_folder, is_cached = postprocess_cache(
+            res_folder, '{}-values'.format(res_type), list(_hoys_), grid_filter_,
+            dyn_sch_dict)
+        mark_phase(profile, 'setup')
+        if not is_cached:
+            cmds = ['post-process', '{}-values'.format(res_type), res_folder, '-sf', sub_folder]
+            if len(_hoys_) != 0:
+                hoys_str = '\n'.join(str(h) for h in _hoys_)
+                hoys_file = input_file(res_folder, 'hoys.txt', hoys_str)
+                cmds.extend(['--hoys-file', hoys_file])
+            if grid_filter_ != '*':
+                cmds.extend(['--grids-filter', grid_filter_])
+            if dyn_sch is not None:
+                dyn_sch_file = input_file(
+                    res_folder, 'dynamic_schedule.json', json.dumps(dyn_sch.to_dict()))
+                cmds.extend(['--states', dyn_sch_file])
+            returncode, stdout, stderr, timings = run_postprocess(
+                ghenv.Component, cmds, res_folder)
             print(stderr)
-            raise ValueError('Failed to compute {} values.'.format(res_type))
-        res_dir = os.path.join(res_folder, 'metrics', '{}_values'.format(res_type))
+            print(timings_report(timings))
+            if returncode != 0:
+                shutil.rmtree(os.path.join(res_folder, sub_folder), ignore_errors=True)
+                raise ValueError('Failed to compute {} values.'.format(res_type))
+            cache_postprocess(res_folder, sub_folder)
+            mark_phase(profile, 'post-process', timings)
+        try:  # only import the result readers once there are results to read
+            from pollination_handlers.outputs.helper import read_sensor_grid_result
+        except ImportError as e:
+            raise ImportError('\nFailed to import pollination_handlers:\n\t{}'.format(e))
+        res_dir = os.path.join(res_folder, sub_folder, '{}_values'.format(res_type))
         if os.path.isdir(res_dir):
-            values = read_sensor_grid_result(res_dir, res_type,'full_id', False)
-            values = list_to_data_tree(values)
+            if compact_:  # parse the values straight into an array
+                values = GridResults.from_folder(res_type, res_dir, res_type)
+                mark_phase(profile, 'read')
+            else:
+                values = read_sensor_grid_result(res_dir, res_type,'full_id', False)
+                mark_phase(profile, 'read')
+                values = list_to_data_tree(values)
+                mark_phase(profile, 'tree')
 
     else:
         if len(dyn_sch_) != 0:
@@ -178,10 +156,6 @@ if all_required_inputs(ghenv.Component):
                 'simulations.\nThe input schedules will be ignored.'
             print(msg)
             give_warning(ghenv.Component, msg)
-        if median_:
-            raise ValueError('The median values can only be calculated for a '
-                             'results folder from the "HB Annual Daylight" '
-                             'component.')
         # extract the timestep if it exists
         timestep = 1
         tstep_file = os.path.join(res_folder, 'timestep.txt')
@@ -192,16 +166,24 @@ if all_required_inputs(ghenv.Component):
 
         # parse the sun-up-hours
         grids, sun_up_hours = _process_input_folder(res_folder, grid_filter_)
-        su_pattern = parse_sun_up_hours(sun_up_hours, _hoys_, timestep)
-
-        # compute the average values
-        values = []
-        for grid_info in grids:
-            ill_file = os.path.join(res_folder, '%s.ill' % grid_info['full_id'])
-            dgp_file = os.path.join(res_folder, '%s.dgp' % grid_info['full_id'])
-            if os.path.isfile(dgp_file):
-                avg = average_values(dgp_file, su_pattern, full_len)
-            else:
-                avg = average_values(ill_file, su_pattern, full_len)
-            values.append(avg)
-        values = list_to_data_tree(values)
+        su_pattern = sun_up_hour_mask(res_folder, sun_up_hours, _hoys_, timestep)
+        mark_phase(profile, 'setup')
+
+        # compute the average or median values
+        def grid_values(grid_info):
+            res_file = result_file(res_folder, grid_info['full_id'])
+            if median_:  # each hour only counts once like the NumPy results
+                median_len = 8760 * timestep if len(_hoys_) == 0 else len(set(_hoys_))
+                return result_statistics(
+                    res_file, su_pattern, ['median'], median_len)['median']
+            stats = result_statistics(res_file, su_pattern, ['total'])
+            return [tot / full_len for tot in stats['total']]
+
+        res_type = 'average' if median_ is False else 'median'
+        values = map_grids(grid_values, grids, cpu_count_)
+        mark_phase(profile, 'read')
+        values = GridResults.from_lists(res_type, grids, values) if compact_ \
+            else list_to_data_tree(values)
+        mark_phase(profile, 'tree')
+
+    write_profile(profile, res_folder)
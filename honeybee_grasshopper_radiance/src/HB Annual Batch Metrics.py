@@ -0,0 +1,389 @@
+# Honeybee: A Plugin for Environmental Analysis (GPL)
+# This file is part of Honeybee.
+#
+# Copyright (c) 2026, Ladybug Tools.
+# You should have received a copy of the GNU Affero General Public License
+# along with Honeybee; If not, see <http://www.gnu.org/licenses/>.
+# 
+# @license AGPL-3.0-or-later <https://spdx.org/licenses/AGPL-3.0-or-later>
+
+"""
+Compute several annual metrics from the same results folder in a single request.
+_
+Average, median, peak and cumulative values along with the annual daylight metrics
+(DA, cDA and UDI) and daylight control schedules are computed by one run of
+honeybee-radiance-postprocess, which loads the result matrices only once for all
+of the requested metrics. This is much faster than connecting the same results to
+the "HB Annual Average Values", "HB Annual Peak Values", "HB Annual Cumulative
+Values", "HB Annual Daylight Metrics" and "HB Daylight Control Schedule" components,
+which each load the matrices again.
+_
+Note that this component only supports results folders that contain NumPy arrays,
+which are written by the recent versions of the "HB Annual Daylight" and "HB Annual
+Irradiance" components.
+
+-
+    Args:
+        _results: An list of annual Radiance result files from either the "HB Annual Daylight"
+            or the "HB Annual Irradiance" component. This can also be just the
+            path to the folder containing these result files.
+        dyn_sch_: Optional dynamic Aperture Group Schedules from the "HB Aperture Group
+            Schedule" component, which will be used to customize the behavior
+            of any dyanmic aperture geometry in the output metrics. If unsupplied,
+            all dynamic aperture groups will be in their default state in for
+            the output metrics.
+        _metrics_: A list of text for the metrics to compute. Choose from the following
+            options. (Default: average, peak, cumulative, daylight).
+                * average - average values of each sensor
+                * median - median values of each sensor
+                * peak - peak values of each sensor
+                * cumulative - cumulative values of each sensor
+                * daylight - DA, cDA and UDI of each sensor
+                * control - daylight control schedule of each grid
+        _hoys_: An optional numbers or list of numbers to select the hours of the year (HOYs)
+            for which the average, median, peak and cumulative values will be
+            computed. These HOYs can be obtained from the "LB Calculate HOY" or
+            the "LB Analysis Period" components. If None, all hours of the
+            results will be used.
+        coincident_: Boolean to indicate whether output peak values represent the the peak
+            value for each sensor throughout the entire analysis (False) or
+            they represent the highest overall value across each sensor grid
+            at a particular timestep (True). (Default: False).
+        _occ_sch_: An annual occupancy schedule for the daylight metrics as a Ladybug Data
+            Collection or a HB-Energy schedule object. This can also be the
+            identifier of a schedule in your HB-Energy schedule library. Any
+            value in this schedule that is 0.1 or above will be considered
+            occupied. If None, a schedule from 8AM to 6PM on all days will be used.
+            This occupancy is also the base lighting schedule of the daylight
+            control schedules.
+        _threshold_: Threshhold for daylight autonomy (DA) in lux, which is also the
+            illuminance setpoint of the daylight control schedules (default: 300).
+        _min_max_: A list for min, max illuminacne thresholds for useful daylight illuminance
+            in lux. (Default: (100, 3000)).
+        grid_filter_: The name of a grid or a pattern to filter the grids. For instance,
+            first_floor_* will simulate only the sensor grids that have an
+            identifier that starts with first_floor_. By default all the grids
+            will be processed.
+        compact_: Set to True to output the values of each metric as a single compact
+            Grid Results object instead of a data tree. These objects keep the
+            values of all sensors in one array, which avoids the time and memory
+            needed to build data trees for large models. They can be connected
+            to the "HB Expand Grid Results" component to get a data tree.
+            (Default: False).
+
+    Returns:
+        report: Reports, errors, warnings, etc.
+        average: Average illuminance or irradiance valules for each sensor in lux or W/m2.
+        median: Median illuminance or irradiance valules for each sensor in lux or W/m2.
+        peak: Peak illuminance or irradiance valules for each sensor in lux or W/m2.
+        peak_hoys: An integer for each sesnor grid that represents the hour of the year at
+            which the peak occurs. This will be None unless coincident_ is
+            set to True.
+        cumulative: In the case of an annual irradaince simulation, this is the cumulative
+            radiation valules for each sensor in Wh/m2. For annual daylight, it is
+            cumulative illuminance (lux-hours).
+        DA: Daylight autonomy results in percent. DA is the percentage of occupied hours
+            that each sensor recieves equal or more than the illuminance threshold.
+        cDA: Continuous daylight autonomy results in percent. cDA is similar to DA except
+            that values below the illuminance threshold can still count partially
+            towards the final percentage.
+        UDI: Useful daylight illuminance results in percent. UDI is the percentage of time
+            that illuminace falls between minimum and maximum thresholds.
+        UDI_low: Results for the percent of time that is below the lower threshold
+            of useful daylight illuminance in percent.
+        UDI_up: Results for the percent of time that is above the upper threshold
+            of useful daylight illuminance in percent.
+        schedules: Electric lighting schedules with daylight controls, one for each
+            sensor grid. The lights are dimmed with the default dimming curve
+            of the "HB Daylight Control Schedule" component (a minimum power
+            input of 0.3 and a minimum light output of 0.2).
+"""
+
+ghenv.Component.Name = 'HB Annual Batch Metrics'
+ghenv.Component.NickName = 'BatchMetrics'
+ghenv.Component.Message = '1.10.1'
+ghenv.Component.Category = 'HB-Radiance'
+ghenv.Component.SubCategory = '4 :: Results'
+ghenv.Component.AdditionalHelpFromDocStrings = '1'
+
+import os
+import json
+import hashlib
+import tempfile
+import shutil
+
+try:
+    from ladybug.datacollection import BaseCollection
+    from ladybug.futil import write_to_file
+except ImportError as e:
+    raise ImportError('\nFailed to import ladybug:\n\t{}'.format(e))
+
+try:
+    from honeybee_energy.lib.schedules import schedule_by_identifier
+    from honeybee_energy.lib.scheduletypelimits import schedule_type_limit_by_identifier
+    from honeybee_energy.schedule.fixedinterval import ScheduleFixedInterval
+except ImportError as e:  # honeybee schedule library is not available
+    schedule_by_identifier = None
+
+try:
+    from ladybug_rhino.grasshopper import all_required_inputs, list_to_data_tree, \
+        give_warning
+except ImportError as e:
+    raise ImportError('\nFailed to import ladybug_rhino:\n\t{}'.format(e))
+
+try:
+    from honeybee_grasshopper_radiance.postprocess import run_postprocess, \
+        timings_report, start_profile, mark_phase, write_profile, input_file, \
+        postprocess_cache, cache_postprocess
+    from honeybee_grasshopper_radiance.results import dynamic_schedule, GridResults
+except ImportError as e:
+    raise ImportError('\nFailed to import honeybee_grasshopper_radiance:\n\t{}'.format(e))
+
+
+BATCH_METRICS = ('average', 'median', 'peak', 'cumulative', 'daylight', 'control')
+DEFAULT_METRICS = ('average', 'peak', 'cumulative', 'daylight')
+# metric, sub-folder, extension and whether the values of each metric are percentages
+METRIC_FILES = (
+    ('average', 'average_values', 'average', False),
+    ('median', 'median_values', 'median', False),
+    ('peak', 'peak_values', 'peak', False),
+    ('cumulative', 'cumulative_values', 'cumulative', False),
+    ('DA', 'da', 'da', True), ('cDA', 'cda', 'cda', True), ('UDI', 'udi', 'udi', True),
+    ('UDI_low', 'udi_lower', 'udi', True), ('UDI_up', 'udi_upper', 'udi', True)
+)
+BATCH_SCRIPT = '''
+import os
+import json
+import argparse
+
+import numpy
+from honeybee_radiance_postprocess.dynamic import DynamicSchedule
+from honeybee_radiance_postprocess.annual import occupancy_schedule_8_to_6
+from honeybee_radiance_postprocess.electriclight import array_to_dimming_fraction
+from honeybee_radiance_postprocess.results.annual_daylight import AnnualDaylight
+from honeybee_grasshopper_radiance.postprocess import filter_grids, grid_array
+
+parser = argparse.ArgumentParser()
+parser.add_argument('folder')
+parser.add_argument('output_folder')
+parser.add_argument('request', help='JSON file with the metrics and their inputs.')
+args = parser.parse_args()
+
+with open(args.request) as req_file:
+    request = json.load(req_file)
+states = DynamicSchedule.from_dict(request['states']) if request.get('states') else None
+hoys = request.get('hoys', [])
+grids_filter = request.get('grids_filter', '*')
+
+
+def control_schedules_to_folder(output_folder, setpoint, base_schedule):
+    """Write the daylight control schedule of each grid with the default dimming curve."""
+    control_folder = os.path.join(output_folder, 'control_schedules')
+    if not os.path.isdir(control_folder):
+        os.makedirs(control_folder)
+    grids_info = filter_grids(results.grids_info, grids_filter)
+    with open(os.path.join(control_folder, 'grids_info.json'), 'w') as info_file:
+        json.dump(grids_info, info_file)
+    sun_up_hours = [int(h) for h in results.sun_up_hours]
+    for grid_info in grids_info:
+        array = grid_array(results, grid_info, states)
+        dim_fract = array_to_dimming_fraction(
+            array, sun_up_hours, setpoint, 0.3, 0.2, False) \\
+            if numpy.any(array) else numpy.ones(8760)
+        output_file = os.path.join(control_folder, '{}.txt'.format(grid_info['full_id']))
+        numpy.savetxt(output_file, base_schedule * dim_fract, fmt='%.2f')
+
+
+# keep the matrices in memory such that they are only loaded once for all metrics
+results = AnnualDaylight(args.folder, schedule=request.get('schedule'), cache_arrays=True)
+for metric in request['metrics']:
+    if metric == 'average':
+        results.average_values_to_folder(
+            args.output_folder, hoys=hoys, states=states, grids_filter=grids_filter)
+    elif metric == 'median':
+        results.median_values_to_folder(
+            args.output_folder, hoys=hoys, states=states, grids_filter=grids_filter)
+    elif metric == 'peak':
+        results.peak_values_to_folder(
+            args.output_folder, hoys=hoys, states=states, grids_filter=grids_filter,
+            coincident=request.get('coincident', False))
+    elif metric == 'cumulative':
+        results.cumulative_values_to_folder(
+            args.output_folder, hoys=hoys, states=states, grids_filter=grids_filter)
+    elif metric == 'daylight':
+        results.annual_metrics_to_folder(
+            args.output_folder, threshold=request.get('threshold', 300),
+            min_t=request.get('lower_threshold', 100),
+            max_t=request.get('upper_threshold', 3000),
+            states=states, grids_filter=grids_filter)
+    elif metric == 'control':
+        base_schedule = request.get('schedule') or \\
+            occupancy_schedule_8_to_6(timestep=results.timestep)
+        control_schedules_to_folder(
+            args.output_folder, request.get('threshold', 300), numpy.array(base_schedule))
+    else:
+        raise ValueError('Metric "%s" is not supported.' % metric)
+results.clear_cached_arrays()
+'''
+
+
+def batch_script():
+    """Get the path to the script that computes a batch of metrics from a results folder."""
+    script_id = hashlib.md5(BATCH_SCRIPT.encode('utf-8')).hexdigest()
+    script = os.path.join(
+        tempfile.gettempdir(), 'hb_radiance_batch_metrics_{}.py'.format(script_id))
+    if not os.path.isfile(script):
+        write_to_file(script, BATCH_SCRIPT)
+    return script
+
+
+if all_required_inputs(ghenv.Component):
+    # set default values for the metrics, thresholds and the grid filter
+    profile = start_profile(ghenv.Component)
+    metrics = [m.lower() for m in _metrics_] if len(_metrics_) != 0 \
+        else list(DEFAULT_METRICS)
+    for metric in metrics:
+        assert metric in BATCH_METRICS, 'Metric "{}" is not supported. Choose from ' \
+            'the following:\n{}'.format(metric, '\n'.join(BATCH_METRICS))
+    metrics = [m for m in BATCH_METRICS if m in metrics]  # remove duplicates
+    if 'control' in metrics and schedule_by_identifier is None:
+        raise ValueError('honeybee-energy must be installed to compute daylight '
+                         'control schedules.')
+    grid_filter_ = '*' if grid_filter_ is None else grid_filter_
+    _threshold_ = _threshold_ if _threshold_ else 300
+    if len(_min_max_) != 0:
+        assert len(_min_max_), 'Expected two values for _min_max_.'
+        min_t = _min_max_[0]
+        max_t = _min_max_[1]
+    else:
+        min_t = 100
+        max_t = 3000
+
+    # process the schedule
+    if _occ_sch_ is None:
+        schedule = None
+    elif isinstance(_occ_sch_, BaseCollection):
+        schedule = _occ_sch_.values
+    elif isinstance(_occ_sch_, str):
+        if schedule_by_identifier is not None:
+            try:
+                schedule = schedule_by_identifier(_occ_sch_).values()
+            except TypeError:  # it's probably a ScheduleFixedInterval
+                schedule = schedule_by_identifier(_occ_sch_).values
+        else:
+            raise ValueError('honeybee-energy must be installed to reference '
+                             'occupancy schedules by identifier.')
+    else:  # assume that it is a honeybee schedule object
+        try:
+            schedule = _occ_sch_.values()
+        except TypeError:  # it's probably a ScheduleFixedInterval
+            schedule = _occ_sch_.values
+    if schedule is not None:
+        bin_schedule = []
+        for val in schedule:
+            bin_val = 1 if val >= 0.1 else 0
+            bin_schedule.append(bin_val)
+        schedule = bin_schedule
+
+    # check that the results use the newer numpy arrays
+    res_folder = os.path.dirname(_results[0]) if os.path.isfile(_results[0]) \
+        else _results[0]
+    if not os.path.isdir(os.path.join(res_folder, '__static_apertures__')) and \
+            not os.path.isfile(os.path.join(res_folder, 'grid_states.json')):
+        raise ValueError(
+            'The results folder does not contain NumPy arrays of the results.\n'
+            'Use the separate result components to post-process .ill files.')
+    dyn_sch = None
+    if len(dyn_sch_) != 0:
+        if os.path.isfile(os.path.join(res_folder, 'grid_states.json')):
+            dyn_sch = dynamic_schedule(dyn_sch_)
+        else:
+            msg = 'No dynamic aperture groups were found in the Model.\n' \
+                'The input dynamic schedules will be ignored.'
+            print(msg)
+            give_warning(ghenv.Component, msg)
+
+    # check whether the results have already been computed for these inputs
+    request = {
+        'metrics': metrics, 'hoys': list(_hoys_), 'coincident': bool(coincident_),
+        'threshold': _threshold_, 'lower_threshold': min_t, 'upper_threshold': max_t,
+        'grids_filter': grid_filter_, 'schedule': schedule,
+        'states': dyn_sch.to_dict() if dyn_sch is not None else None
+    }
+    sub_folder, is_cached = postprocess_cache(res_folder, 'batch-metrics', request)
+    mark_phase(profile, 'setup')
+    if not is_cached:
+        request_file = input_file(
+            res_folder, 'batch_request.json', json.dumps(request, sort_keys=True))
+        cmds = [res_folder, sub_folder, request_file]
+        returncode, stdout, stderr, timings = run_postprocess(
+            ghenv.Component, cmds, res_folder, batch_script())
+        print(stderr)
+        print(timings_report(timings))
+        if returncode != 0:
+            shutil.rmtree(os.path.join(res_folder, sub_folder), ignore_errors=True)
+            raise ValueError('Failed to compute the batch of metrics.')
+        cache_postprocess(res_folder, sub_folder)
+        mark_phase(profile, 'post-process', timings)
+
+    # load all of the computed metrics
+    try:  # only import the result readers once there are results to read
+        from pollination_handlers.outputs.helper import read_sensor_grid_result
+        from pollination_handlers.outputs.daylight import read_da_from_folder, \
+            read_cda_from_folder, read_udi_from_folder
+    except ImportError as e:
+        raise ImportError('\nFailed to import pollination_handlers:\n\t{}'.format(e))
+    metric_dir, values = os.path.join(res_folder, sub_folder), {}
+    if compact_:  # parse the values straight into arrays
+        for metric, sub_dir, ext, is_percent in METRIC_FILES:
+            if os.path.isdir(os.path.join(metric_dir, sub_dir)):
+                values[metric] = GridResults.from_folder(
+                    metric, os.path.join(metric_dir, sub_dir), ext, is_percent)
+    else:
+        if 'average' in metrics:
+            values['average'] = read_sensor_grid_result(
+                os.path.join(metric_dir, 'average_values'), 'average', 'full_id', False)
+        if 'median' in metrics:
+            values['median'] = read_sensor_grid_result(
+                os.path.join(metric_dir, 'median_values'), 'median', 'full_id', False)
+        if 'peak' in metrics:
+            values['peak'] = read_sensor_grid_result(
+                os.path.join(metric_dir, 'peak_values'), 'peak', 'full_id', False)
+        if 'cumulative' in metrics:
+            values['cumulative'] = read_sensor_grid_result(
+                os.path.join(metric_dir, 'cumulative_values'), 'cumulative', 'full_id',
+                False)
+        if 'daylight' in metrics:
+            values['DA'] = read_da_from_folder(os.path.join(metric_dir, 'da'))
+            values['cDA'] = read_cda_from_folder(os.path.join(metric_dir, 'cda'))
+            values['UDI'] = read_udi_from_folder(os.path.join(metric_dir, 'udi'))
+            values['UDI_low'] = read_udi_from_folder(os.path.join(metric_dir, 'udi_lower'))
+            values['UDI_up'] = read_udi_from_folder(os.path.join(metric_dir, 'udi_upper'))
+    if 'peak' in metrics:
+        peak_dir = os.path.join(metric_dir, 'peak_values')
+        with open(os.path.join(peak_dir, 'max_hoys.txt'), 'r') as max_hoys:
+            peak_hoys = [line.rstrip() for line in max_hoys.readlines()]
+        if coincident_:
+            peak_hoys = [int(h) for h in peak_hoys]
+        else:
+            peak_hoys = [None] * len(peak_hoys)
+    if 'control' in metrics:
+        control_dir = os.path.join(metric_dir, 'control_schedules')
+        with open(os.path.join(control_dir, 'grids_info.json')) as inf:
+            grids = json.load(inf)
+        type_limit = schedule_type_limit_by_identifier('Fractional')
+        schedules = []
+        for grid in grids:
+            with open(os.path.join(control_dir, '{}.txt'.format(grid['full_id']))) as inf:
+                sch_vals = [float(v) for v in inf]
+            sch_id = '{} Daylight Control'.format(grid['full_id'])
+            schedules.append(ScheduleFixedInterval(sch_id, sch_vals, type_limit))
+    mark_phase(profile, 'read')
+
+    # convert the metrics to data trees
+    if not compact_:
+        values = dict((key, list_to_data_tree(val)) for key, val in values.items())
+    average, median, peak, cumulative, DA, cDA, UDI, UDI_low, UDI_up = \
+        [values.get(metric[0]) for metric in METRIC_FILES]
+    mark_phase(profile, 'tree')
+    write_profile(profile, res_folder)
@@ -9,6 +9,14 @@
 
 """
 Calculate Annual Daylight Metrics from a result (.ill) files.
+_
+For results in the newer NumPy format, this component saves the sorted occupied
+values of each sensor (along with their running totals) to the __cache__ sub-folder
+of the results. This way, the metrics for other thresholds can be computed without
+reading the result matrices again. This index takes up to twice the disk space
+of the result matrices and one index is kept for each combination of occupancy
+schedule and dynamic schedules. The indices have their own size limit in the
+cache, beyond which the least recently used indices are deleted.
 
 -
     Args:
@@ -33,6 +41,12 @@ Calculate Annual Daylight Metrics from a result (.ill) files.
             first_floor_* will simulate only the sensor grids that have an
             identifier that starts with first_floor_. By default all the grids
             will be processed.
+        compact_: Set to True to output each metric as a single compact Grid Results
+            object instead of a data tree. These objects keep the values of
+            all sensors in one array, which avoids the time and memory needed
+            to build data trees for large models. They can be connected to the
+            "HB Expand Grid Results" component to get a data tree or to the
+            "HB Spatial Daylight Autonomy" component directly. (Default: False).
 
     Returns:
         report: Reports, errors, warnings, etc.
@@ -71,7 +85,10 @@ ghenv.Component.SubCategory = '4 :: Results'
 ghenv.Component.AdditionalHelpFromDocStrings = '1'
 
 import os
-import subprocess
+import json
+import hashlib
+import tempfile
+import shutil
 
 try:
     from ladybug.datacollection import BaseCollection
@@ -80,17 +97,9 @@ except ImportError as e:
     raise ImportError('\nFailed to import ladybug:\n\t{}'.format(e))
 
 try:
-    from honeybee.config import folders
-except ImportError as e:
-    raise ImportError('\nFailed to import honeybee:\n\t{}'.format(e))
-
-try:
-    from honeybee_radiance.postprocess.annualdaylight import metrics_from_folder
-except ImportError as e:
-    raise ImportError('\nFailed to import honeybee_radiance:\n\t{}'.format(e))
-
-try:
-    from honeybee_radiance_postprocess.dynamic import DynamicSchedule
+    from honeybee_radiance.postprocess.annualdaylight import _metrics, \
+        _process_input_folder
+    from honeybee_radiance.postprocess.annual import filter_schedule_by_hours
 except ImportError as e:
     raise ImportError('\nFailed to import honeybee_radiance:\n\t{}'.format(e))
 
@@ -99,21 +108,225 @@ try:
 except ImportError as e:  # honeybee schedule library is not available
     schedule_by_identifier = None
 
-try:
-    from pollination_handlers.outputs.daylight import read_da_from_folder, \
-        read_cda_from_folder, read_udi_from_folder
-except ImportError as e:
-    raise ImportError('\nFailed to import pollination_handlers:\n\t{}'.format(e))
-
 try:
     from ladybug_rhino.grasshopper import all_required_inputs, list_to_data_tree,   \
         give_warning
 except ImportError as e:
     raise ImportError('\nFailed to import ladybug_rhino:\n\t{}'.format(e))
 
+try:
+    from honeybee_grasshopper_radiance.postprocess import run_postprocess, \
+        timings_report, start_profile, mark_phase, write_profile, input_file, \
+        postprocess_cache, cache_postprocess
+    from honeybee_grasshopper_radiance.results import result_file, result_values, \
+        dynamic_schedule, GridResults
+except ImportError as e:
+    raise ImportError('\nFailed to import honeybee_grasshopper_radiance:\n\t{}'.format(e))
+
+
+# metric, sub-folder and extension of the files of each metric in the results
+METRIC_FILES = (
+    ('DA', 'da', 'da'), ('cDA', 'cda', 'cda'), ('UDI', 'udi', 'udi'),
+    ('UDI_low', 'udi_lower', 'udi'), ('UDI_up', 'udi_upper', 'udi')
+)
+
+
+METRICS_SCRIPT = '''
+import os
+import json
+import uuid
+import argparse
+
+import numpy
+from ladybug.color import Colorset
+from ladybug.datatype.fraction import Fraction
+from ladybug.legend import LegendParameters
+from honeybee_radiance_postprocess.dynamic import DynamicSchedule
+from honeybee_radiance_postprocess.util import filter_array2d
+from honeybee_radiance_postprocess.results.annual_daylight import AnnualDaylight
+from honeybee_grasshopper_radiance.postprocess import filter_grids, grid_array
+
+parser = argparse.ArgumentParser()
+parser.add_argument('folder')
+parser.add_argument('output_folder')
+parser.add_argument('index_folder')
+parser.add_argument('--threshold', type=float, default=300)
+parser.add_argument('--lower-threshold', type=float, default=100)
+parser.add_argument('--upper-threshold', type=float, default=3000)
+parser.add_argument('--grids-filter', default='*')
+parser.add_argument('--states', default=None)
+parser.add_argument('--schedule', default=None)
+args = parser.parse_args()
+
+schedule = None
+if args.schedule:
+    with open(args.schedule) as hourly_schedule:
+        schedule = [int(float(v)) for v in hourly_schedule]
+states = DynamicSchedule.from_json(args.states) if args.states else None
+results = AnnualDaylight(args.folder, schedule=schedule)
+grids_info = filter_grids(results.grids_info, args.grids_filter)
+
+if not os.path.isdir(args.index_folder):
+    os.makedirs(args.index_folder)
+
+
+def save_atomic(npy_file, array):
+    """Save an array such that other processes never load a partial file."""
+    temp_file = '%s.%s.tmp' % (npy_file, uuid.uuid4().hex)
+    with open(temp_file, 'wb') as npy:
+        numpy.save(npy, array)
+    os.replace(temp_file, npy_file)
+
+
+def load_index(sorted_file, total_file, count):
+    """Load the index of a grid or get None if it is missing or incomplete."""
+    try:
+        values, totals = numpy.load(sorted_file), numpy.load(total_file)
+    except (EnvironmentError, ValueError, EOFError):
+        return None
+    if values.ndim != 2 or totals.ndim != 2 or values.shape[0] != count or \\
+            totals.shape[0] != count or totals.shape[1] not in (0, values.shape[1] + 1):
+        return None
+    return values, totals
+
+
+def sensor_index(grid_info):
+    """Get the sorted occupied values of each sensor and their running totals."""
+    sorted_file = os.path.join(args.index_folder, '%s.npy' % grid_info['full_id'])
+    total_file = os.path.join(args.index_folder, '%s_total.npy' % grid_info['full_id'])
+    index = load_index(sorted_file, total_file, grid_info['count'])
+    if index is None:
+        array = grid_array(results, grid_info, states)
+        if numpy.any(array):
+            values = numpy.sort(filter_array2d(array, mask=results.occ_mask), axis=1)
+            # sum in double precision but store the totals like the values
+            totals = numpy.zeros(
+                (values.shape[0], values.shape[1] + 1), dtype=numpy.float32)
+            totals[:, 1:] = numpy.cumsum(values, axis=1, dtype=numpy.float64)
+        else:  # an empty array of totals notes that the grid has no results
+            values = numpy.zeros((grid_info['count'], 0), dtype=numpy.float32)
+            totals = numpy.zeros((grid_info['count'], 0), dtype=numpy.float32)
+        save_atomic(sorted_file, values)
+        save_atomic(total_file, totals)
+        index = values, totals
+    return index
+
+
+def count_below(values, threshold, inclusive=False):
+    """Count the values of each sorted row that are below a threshold."""
+    rows = numpy.arange(values.shape[0])
+    low = numpy.zeros(values.shape[0], dtype=numpy.int64)
+    high = numpy.full(values.shape[0], values.shape[1], dtype=numpy.int64)
+    active = low < high
+    while numpy.any(active):
+        mid = (low + high) // 2
+        mid_values = values[rows, numpy.minimum(mid, values.shape[1] - 1)]
+        below = mid_values <= threshold if inclusive else mid_values < threshold
+        below &= active
+        high = numpy.where(active & ~below, mid, high)
+        low = numpy.where(below, mid + 1, low)
+        active = low < high
+    return low
+
+
+# compute each metric from the index using a binary search of each sensor
+total_occ = results.total_occ
+metrics = {'da': [], 'cda': [], 'udi': [], 'udi_lower': [], 'udi_upper': []}
+for grid_info in grids_info:
+    values, totals = sensor_index(grid_info)
+    count = grid_info['count']
+    if totals.shape[1] == 0:
+        metrics['da'].append(numpy.zeros(count))
+        metrics['cda'].append(numpy.zeros(count))
+        metrics['udi'].append(numpy.zeros(count))
+        metrics['udi_lower'].append(numpy.full(count, 100.0))
+        metrics['udi_upper'].append(numpy.zeros(count))
+        continue
+    occ_count = values.shape[1]
+    below_t = count_below(values, args.threshold)
+    below_min = count_below(values, args.lower_threshold)
+    up_to_max = count_below(values, args.upper_threshold, inclusive=True)
+    below_total = totals[numpy.arange(count), below_t]
+    metrics['da'].append((occ_count - below_t) / total_occ * 100)
+    metrics['cda'].append(
+        (occ_count - below_t + below_total / args.threshold) / total_occ * 100)
+    metrics['udi'].append(numpy.maximum(up_to_max - below_min, 0) / total_occ * 100)
+    metrics['udi_lower'].append(
+        numpy.zeros(count) if args.lower_threshold == 0 else
+        (below_min + results.sun_down_occ_hours) / total_occ * 100)
+    metrics['udi_upper'].append((occ_count - up_to_max) / total_occ * 100)
+
+# write the metrics in the same structure as the annual-daylight command
+for metric, data in metrics.items():
+    metric_folder = os.path.join(args.output_folder, metric)
+    extension = metric.split('_')[0]
+    for grid_data, grid_info in zip(data, grids_info):
+        output_file = os.path.join(
+            metric_folder, '%s.%s' % (grid_info['full_id'], extension))
+        if not os.path.isdir(os.path.dirname(output_file)):
+            os.makedirs(os.path.dirname(output_file))
+        numpy.savetxt(output_file, grid_data, fmt='%.2f')
+    if not os.path.isdir(metric_folder):
+        os.makedirs(metric_folder)
+    with open(os.path.join(metric_folder, 'grids_info.json'), 'w') as info_file:
+        json.dump(grids_info, info_file)
+vis_metadata = (
+    ('da', 'Daylight Autonomy', Colorset.annual_comfort()),
+    ('cda', 'Continuous Daylight Autonomy', Colorset.annual_comfort()),
+    ('udi', 'Useful Daylight Illuminance', Colorset.annual_comfort()),
+    ('udi_lower', 'Useful Daylight Illuminance Lower', Colorset.nuanced()),
+    ('udi_upper', 'Useful Daylight Illuminance Upper', Colorset.glare_study())
+)
+for metric, name, colors in vis_metadata:
+    metadata = {
+        'type': 'VisualizationMetaData', 'data_type': Fraction(name).to_dict(),
+        'unit': '%',
+        'legend_parameters': LegendParameters(min=0, max=100, colors=colors).to_dict()
+    }
+    with open(os.path.join(args.output_folder, metric, 'vis_metadata.json'), 'w') as f:
+        json.dump(metadata, f, indent=4)
+'''
+
+
+def metrics_from_results(res_folder, schedule=None, threshold=300, min_t=100,
+                         max_t=3000, grids_filter='*'):
+    """Compute annual daylight metrics from the legacy result files of a folder.
+
+    This matches the metrics_from_folder function of honeybee-radiance but the
+    compressed archives of the "HB Archive Results" component are read in place
+    of any .ill files that have been removed.
+    """
+    da, cda, udi_lower, udi, udi_upper = [], [], [], [], []
+    grids, sun_up_hours = _process_input_folder(res_folder, grids_filter)
+    occ_pattern, total_occ, sun_down_occ_hours = \
+        filter_schedule_by_hours(sun_up_hours=sun_up_hours, schedule=schedule)
+    for grid in grids:
+        grid_metrics = [[], [], [], [], []]
+        res_file = result_file(res_folder, grid['full_id'])
+        for values in result_values(res_file):
+            sensor_metrics = _metrics(values, occ_pattern, threshold, min_t, max_t,
+                                      total_occ, sun_down_occ_hours)
+            for metric_list, value in zip(grid_metrics, sensor_metrics):
+                metric_list.append(value)
+        for metric_list, grid_list in zip((da, cda, udi_lower, udi, udi_upper),
+                                          grid_metrics):
+            metric_list.append(grid_list)
+    return da, cda, udi_lower, udi, udi_upper
+
+
+def metrics_script():
+    """Get the path to the script that computes daylight metrics from a sensor index."""
+    script_id = hashlib.md5(METRICS_SCRIPT.encode('utf-8')).hexdigest()
+    script = os.path.join(
+        tempfile.gettempdir(), 'hb_radiance_daylight_metrics_{}.py'.format(script_id))
+    if not os.path.isfile(script):
+        write_to_file(script, METRICS_SCRIPT)
+    return script
+
 
 if all_required_inputs(ghenv.Component):
     # set default values for the thresholds and the grid filter
+    profile = start_profile(ghenv.Component)
     grid_filter_ = '*' if grid_filter_ is None else grid_filter_
     _threshold_ = _threshold_ if _threshold_ else 300
     if len(_min_max_) != 0:
@@ -155,56 +368,88 @@ if all_required_inputs(ghenv.Component):
         else _results[0]
     if os.path.isdir(os.path.join(res_folder, '__static_apertures__')) or \
             os.path.isfile(os.path.join(res_folder, 'grid_states.json')):
-        cmds = [
-            folders.python_exe_path, '-m', 'honeybee_radiance_postprocess',
-            'post-process', 'annual-daylight', res_folder, '-sf', 'metrics',
-            '-t', str(_threshold_), '-lt', str(min_t), '-ut', str(max_t)
-        ]
-        if grid_filter_ != '*':
-            cmds.extend(['--grids-filter', grid_filter_])
+        dyn_sch = None
         if len(dyn_sch_) != 0:
             if os.path.isfile(os.path.join(res_folder, 'grid_states.json')):
-                dyn_sch = dyn_sch_[0] if isinstance(dyn_sch_[0], DynamicSchedule) else \
-                    DynamicSchedule.from_group_schedules(dyn_sch_)
-                dyn_sch_file = dyn_sch.to_json(folder=res_folder)
-                cmds.extend(['--states', dyn_sch_file])
+                dyn_sch = dynamic_schedule(dyn_sch_)
             else:
                 msg = 'No dynamic aperture groups were found in the Model.\n' \
                     'The input dynamic schedules will be ignored.'
                 print(msg)
                 give_warning(ghenv.Component, msg)
-        if schedule is not None:
-            sch_str = '\n'.join(str(h) for h in schedule)
-            sch_file = os.path.join(res_folder, 'schedule.txt')
-            write_to_file(sch_file, sch_str)
-            cmds.extend(['--schedule', sch_file])
-        use_shell = True if os.name == 'nt' else False
-        custom_env = os.environ.copy()
-        custom_env['PYTHONHOME'] = ''
-        process = subprocess.Popen(
-            cmds, cwd=res_folder, shell=use_shell, env=custom_env,
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        stdout, stderr = process.communicate()  # wait for the process to finish
-        print(stderr)
-        returncode = process.wait()
-        if returncode != 0:
-            raise ValueError('Failed to compute annual daylight metrics.')
-        metric_dir = os.path.join(res_folder, 'metrics')
-        DA = list_to_data_tree(read_da_from_folder(os.path.join(metric_dir, 'da')))
-        cDA = list_to_data_tree(read_cda_from_folder(os.path.join(metric_dir, 'cda')))
-        UDI = list_to_data_tree(read_udi_from_folder(os.path.join(metric_dir, 'udi')))
-        UDI_low = list_to_data_tree(read_udi_from_folder(os.path.join(metric_dir, 'udi_lower')))
-        UDI_up = list_to_data_tree(read_udi_from_folder(os.path.join(metric_dir, 'udi_upper')))
+
+        # check whether the results have already been computed for these inputs
+        dyn_sch_dict = dyn_sch.to_dict() if dyn_sch is not None else None
+        sub_folder, is_cached = postprocess_cache(
+            res_folder, 'annual-daylight', _threshold_, min_t, max_t, grid_filter_,
+            schedule, dyn_sch_dict)
+        # the sorted values of each sensor are shared by all thresholds
+        index_folder = postprocess_cache(
+            res_folder, 'annual-daylight-index', schedule, dyn_sch_dict)[0]
+        mark_phase(profile, 'setup')
+        if not is_cached:
+            cmds = [
+                res_folder, sub_folder, index_folder, '--threshold', str(_threshold_),
+                '--lower-threshold', str(min_t), '--upper-threshold', str(max_t)
+            ]
+            if grid_filter_ != '*':
+                cmds.extend(['--grids-filter', grid_filter_])
+            if dyn_sch is not None:
+                dyn_sch_file = input_file(
+                    res_folder, 'dynamic_schedule.json', json.dumps(dyn_sch.to_dict()))
+                cmds.extend(['--states', dyn_sch_file])
+            if schedule is not None:
+                sch_str = '\n'.join(str(h) for h in schedule)
+                sch_file = input_file(res_folder, 'schedule.txt', sch_str)
+                cmds.extend(['--schedule', sch_file])
+            returncode, stdout, stderr, timings = run_postprocess(
+                ghenv.Component, cmds, res_folder, metrics_script())
+            print(stderr)
+            print(timings_report(timings))
+            if os.path.isdir(os.path.join(res_folder, index_folder)):
+                # record any index written before a failure such that it is evicted
+                cache_postprocess(res_folder, index_folder, 'index')
+            if returncode != 0:
+                shutil.rmtree(os.path.join(res_folder, sub_folder), ignore_errors=True)
+                raise ValueError('Failed to compute annual daylight metrics.')
+            cache_postprocess(res_folder, sub_folder)
+            mark_phase(profile, 'post-process', timings)
+        try:  # only import the result readers once there are results to read
+            from pollination_handlers.outputs.daylight import read_da_from_folder, \
+                read_cda_from_folder, read_udi_from_folder
+        except ImportError as e:
+            raise ImportError('\nFailed to import pollination_handlers:\n\t{}'.format(e))
+        metric_dir = os.path.join(res_folder, sub_folder)
+        if compact_:  # parse the values straight into arrays
+            DA, cDA, UDI, UDI_low, UDI_up = [
+                GridResults.from_folder(metric, os.path.join(metric_dir, sub_dir), ext, True)
+                for metric, sub_dir, ext in METRIC_FILES]
+        else:
+            DA = read_da_from_folder(os.path.join(metric_dir, 'da'))
+            cDA = read_cda_from_folder(os.path.join(metric_dir, 'cda'))
+            UDI = read_udi_from_folder(os.path.join(metric_dir, 'udi'))
+            UDI_low = read_udi_from_folder(os.path.join(metric_dir, 'udi_lower'))
+            UDI_up = read_udi_from_folder(os.path.join(metric_dir, 'udi_upper'))
     else:
         if len(dyn_sch_) != 0:
             msg = 'Dynamic Schedules are currently only supported for Annual Daylight ' \
                 'simulations.\nThe input schedules will be ignored.'
             print(msg)
             give_warning(ghenv.Component, msg)
-        DA, cDA, UDI_low, UDI, UDI_up = metrics_from_folder(
+        mark_phase(profile, 'setup')
+        DA, cDA, UDI_low, UDI, UDI_up = metrics_from_results(
             res_folder, schedule, _threshold_, min_t, max_t, grid_filter_)
+        if compact_:
+            grids = _process_input_folder(res_folder, grid_filter_)[0]
+            DA, cDA, UDI, UDI_low, UDI_up = [
+                GridResults.from_lists(metric[0], grids, metric_values)
+                for metric, metric_values in zip(METRIC_FILES, (DA, cDA, UDI, UDI_low, UDI_up))]
+    mark_phase(profile, 'read')
+    if not compact_:
         DA = list_to_data_tree(DA)
         cDA = list_to_data_tree(cDA)
         UDI = list_to_data_tree(UDI)
         UDI_low = list_to_data_tree(UDI_low)
         UDI_up = list_to_data_tree(UDI_up)
+        mark_phase(profile, 'tree')
+    write_profile(profile, res_folder)
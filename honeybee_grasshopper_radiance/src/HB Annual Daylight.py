@@ -69,7 +69,11 @@ _
             patches, making it unsuitable for ASE. (Default: True).
         run_settings_: Settings from the "HB Recipe Settings" component that specify
             how the recipe should be run. This can also be a text string of
-            recipe settings.
+            recipe settings. If the recipe has already been run with the same
+            inputs and folder, the results of that run are loaded instead of
+            running the recipe again. To always run the recipe, set enabled
+            to false in the cache_config.json of the __recipe_cache__ folder
+            within the default simulation folder.
         _run: Set to True to run the recipe and get results. This input can also be
             the integer "2" to run the recipe silently.
 
@@ -77,7 +81,9 @@ _
         report: Reports, errors, warnings, etc.
         results: Raw result files (.ill) that contain illuminance matrices for each sensor
             at each hour of the simulation. These can be postprocessed using
-            various components under the 4::Results sub-tab.
+            various components under the 4::Results sub-tab. The folder also
+            contains the area of each sensor's mesh face, which the "HB Spatial
+            Daylight Autonomy" component can use to weight the sensors.
         DA: Daylight autonomy results in percent. DA is the percentage of occupied hours
             that each sensor recieves equal or more than the illuminance threshold.
             Each value is for a different sensor of the grid. These can be plugged
@@ -109,26 +115,77 @@ _
 
 ghenv.Component.Name = 'HB Annual Daylight'
 ghenv.Component.NickName = 'AnnualDaylight'
-ghenv.Component.Message = '1.10.0'
+ghenv.Component.Message = '1.10.1'
 ghenv.Component.Category = 'HB-Radiance'
 ghenv.Component.SubCategory = '3 :: Recipes'
 ghenv.Component.AdditionalHelpFromDocStrings = '1'
 
-try:
-    from lbt_recipes.recipe import Recipe
-except ImportError as e:
-    raise ImportError('\nFailed to import lbt_recipes:\n\t{}'.format(e))
+import os
+import json
+import hashlib
 
 try:
     from ladybug_rhino.grasshopper import all_required_inputs, recipe_result
 except ImportError as e:
     raise ImportError('\nFailed to import ladybug_rhino:\n\t{}'.format(e))
 
+try:
+    from honeybee_grasshopper_radiance.recipecache import recipe_cache, cache_recipe, \
+        input_fingerprint
+except ImportError as e:
+    raise ImportError('\nFailed to import honeybee_grasshopper_radiance:\n\t{}'.format(e))
+
+
+def write_sensor_areas(model, res_folder):
+    """Write the face area of each sensor in a model's grids to a results folder.
+
+    Grids without a mesh are excluded and their sensors are assumed to have
+    equal areas. The file records a hash of the model along with the size and
+    modified time of the grids_info.json of the results such that it is only
+    rewritten for a different model and can be checked against the results
+    that it belongs to.
+    """
+    model_hash = hashlib.md5(json.dumps(
+        input_fingerprint(model), sort_keys=True).encode('utf-8')).hexdigest()
+    info_stat = os.stat(os.path.join(res_folder, 'grids_info.json'))
+    grids_info = [info_stat.st_size, int(info_stat.st_mtime)]
+    areas_file = os.path.join(res_folder, 'sensor_areas.json')
+    if os.path.isfile(areas_file):
+        with open(areas_file) as inf:
+            try:
+                areas_dict = json.load(inf)
+            except ValueError:  # not a valid JSON
+                areas_dict = {}
+        if areas_dict.get('model') == model_hash and \
+                areas_dict.get('grids_info') == grids_info:
+            return  # the areas have already been written for these results
+
+    # get the areas of the sensor grids of the model
+    if not hasattr(model, 'properties'):  # the model is a path to a HBJSON file
+        try:
+            from honeybee.model import Model
+        except ImportError as e:
+            raise ImportError('\nFailed to import honeybee:\n\t{}'.format(e))
+        model = Model.from_file(model)
+    areas = {}
+    for grid in model.properties.radiance.sensor_grids:
+        if grid.mesh is not None:
+            areas[grid.full_identifier] = grid.mesh.face_areas
+    areas_dict = {'model': model_hash, 'grids_info': grids_info, 'areas': areas}
+    with open(areas_file, 'w') as outf:
+        json.dump(areas_dict, outf)
+
 
 if all_required_inputs(ghenv.Component) and _run:
+    try:  # only load the recipe package once the recipe is run
+        from lbt_recipes.recipe import Recipe
+    except ImportError as e:
+        raise ImportError('\nFailed to import lbt_recipes:\n\t{}'.format(e))
+
     # create the recipe and set the input arguments
-    recipe = Recipe('annual-daylight') if enhanced_ is False else \
-        Recipe('annual-daylight-enhanced')
+    recipe_name = 'annual-daylight' if enhanced_ is False else \
+        'annual-daylight-enhanced'
+    recipe = Recipe(recipe_name)
     recipe.input_value_by_name('model', _model)
     recipe.input_value_by_name('wea', _wea)
     recipe.input_value_by_name('north', north_)
@@ -137,9 +194,15 @@ if all_required_inputs(ghenv.Component) and _run:
     recipe.input_value_by_name('grid-filter', grid_filter_)
     recipe.input_value_by_name('radiance-parameters', radiance_par_)
 
-    # run the recipe
-    silent = True if _run > 1 else False
-    project_folder = recipe.run(run_settings_, radiance_check=True, silent=silent)
+    # run the recipe unless it has already been run with the same inputs
+    cache_dir, project_folder = recipe_cache(
+        recipe_name, run_settings_, _model, _wea, north_, _thresholds_, _schedule_,
+        grid_filter_, radiance_par_)
+    if project_folder is None:
+        silent = True if _run > 1 else False
+        project_folder = recipe.run(run_settings_, radiance_check=True, silent=silent)
+    else:
+        print('Loading the results of a previous run with the same inputs.')
 
     # load the results
     try:
@@ -151,3 +214,11 @@ if all_required_inputs(ghenv.Component) and _run:
         UDI_up = recipe_result(recipe.output_value_by_name('udi-upper', project_folder))
     except Exception:
         raise Exception(recipe.failure_message(project_folder))
+
+    # record the area of each sensor for area-weighted spatial metrics
+    write_sensor_areas(_model, results)
+
+    # record the run so that it is reused by any run with the same inputs
+    evict_msg = cache_recipe(recipe_name, cache_dir, project_folder)
+    if evict_msg is not None:
+        print(evict_msg)
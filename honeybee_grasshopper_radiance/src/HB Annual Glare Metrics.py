@@ -23,6 +23,11 @@ value is expressed as a percentage of the sensors in the analysis grid.
             Glare" component (containing the .dgp files and the sun-up-hours.txt).
             This can also be just the path to the folder containing these result
             files.
+        dyn_sch_: Optional dynamic Aperture Group Schedules from the "HB Aperture Group
+            Schedule" component, which will be used to customize the behavior
+            of any dyanmic aperture geometry in the output metrics. If unsupplied,
+            all dynamic aperture groups will be in their default state in for
+            the output metrics.
         _occ_sch_: An annual occupancy schedule as a Ladybug Data Collection or a HB-Energy
             schedule object. This can also be the identifier of a schedule in
             your HB-Energy schedule library. Any value in this schedule that is
@@ -58,20 +63,26 @@ value is expressed as a percentage of the sensors in the analysis grid.
 
 ghenv.Component.Name = "HB Annual Glare Metrics"
 ghenv.Component.NickName = 'GlareMetrics'
-ghenv.Component.Message = '1.10.0'
+ghenv.Component.Message = '1.10.1'
 ghenv.Component.Category = 'HB-Radiance'
 ghenv.Component.SubCategory = '4 :: Results'
 ghenv.Component.AdditionalHelpFromDocStrings = '1'
 
 import os
+import json
+import hashlib
+import tempfile
+import shutil
 
 try:
     from ladybug.datacollection import BaseCollection
+    from ladybug.futil import write_to_file
 except ImportError as e:
     raise ImportError('\nFailed to import ladybug:\n\t{}'.format(e))
 
 try:
-    from honeybee_radiance.postprocess.annualglare import glare_autonomy_from_folder
+    from honeybee_radiance.postprocess.annualglare import _glare_autonomy, \
+        _process_input_folder, filter_schedule_by_hours
 except ImportError as e:
     raise ImportError('\nFailed to import honeybee_radiance:\n\t{}'.format(e))
 
@@ -82,13 +93,120 @@ except ImportError as e:  # honeybee schedule library is not available
 
 try:
     from ladybug_rhino.grasshopper import all_required_inputs, list_to_data_tree, \
-        data_tree_to_list
+        give_warning
 except ImportError as e:
     raise ImportError('\nFailed to import ladybug_rhino:\n\t{}'.format(e))
 
+try:
+    from honeybee_grasshopper_radiance.postprocess import run_postprocess, \
+        timings_report, start_profile, mark_phase, write_profile, input_file, \
+        postprocess_cache, cache_postprocess
+    from honeybee_grasshopper_radiance.results import result_file, result_values, \
+        dynamic_schedule
+except ImportError as e:
+    raise ImportError('\nFailed to import honeybee_grasshopper_radiance:\n\t{}'.format(e))
+
+
+GLARE_SCRIPT = '''
+import os
+import json
+import argparse
+
+import numpy
+from honeybee_radiance_postprocess.dynamic import DynamicSchedule
+from honeybee_radiance_postprocess.util import filter_array2d
+from honeybee_radiance_postprocess.results.results import Results
+from honeybee_grasshopper_radiance.postprocess import filter_grids, grid_array
+
+parser = argparse.ArgumentParser()
+parser.add_argument('folder')
+parser.add_argument('output_folder')
+parser.add_argument('--glare-threshold', type=float, default=0.4)
+parser.add_argument('--target-time', type=float, default=95)
+parser.add_argument('--grids-filter', default='*')
+parser.add_argument('--states', default=None)
+parser.add_argument('--schedule', default=None)
+args = parser.parse_args()
+
+schedule = None
+if args.schedule:
+    with open(args.schedule) as hourly_schedule:
+        schedule = [int(float(v)) for v in hourly_schedule]
+states = DynamicSchedule.from_json(args.states) if args.states else None
+results = Results(args.folder, schedule=schedule)
+grids_info = filter_grids(results.grids_info, args.grids_filter)
+
+# compute glare autonomy, pass/fail and spatial glare autonomy in one pass
+total_occ = results.total_occ
+ga_folder = os.path.join(args.output_folder, 'ga')
+pf_folder = os.path.join(args.output_folder, 'pass_fail')
+for folder in (ga_folder, pf_folder):
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+sga = []
+for grid_info in grids_info:
+    array = grid_array(results, grid_info, states)
+    occ_array = filter_array2d(array, mask=results.occ_mask)
+    above = numpy.count_nonzero(occ_array > args.glare_threshold, axis=1)
+    ga = numpy.round((total_occ - above) / total_occ * 100, 2)
+    pass_fail = (ga > args.target_time).astype(int)
+    sga.append(round(float(pass_fail.mean()) * 100, 2) if pass_fail.size else 0)
+    numpy.savetxt(os.path.join(ga_folder, '%s.ga' % grid_info['full_id']),
+                  ga, fmt='%.2f')
+    numpy.savetxt(os.path.join(pf_folder, '%s.pf' % grid_info['full_id']),
+                  pass_fail, fmt='%d')
+for folder in (ga_folder, pf_folder):
+    with open(os.path.join(folder, 'grids_info.json'), 'w') as info_file:
+        json.dump(grids_info, info_file)
+with open(os.path.join(args.output_folder, 'sga.json'), 'w') as sga_file:
+    json.dump(sga, sga_file)
+'''
+
+
+def glare_script():
+    """Get the path to the script that computes glare metrics from NumPy results."""
+    script_id = hashlib.md5(GLARE_SCRIPT.encode('utf-8')).hexdigest()
+    script = os.path.join(
+        tempfile.gettempdir(), 'hb_radiance_glare_metrics_{}.py'.format(script_id))
+    if not os.path.isfile(script):
+        write_to_file(script, GLARE_SCRIPT)
+    return script
+
+
+def read_metric_from_folder(folder, extension, cast=float):
+    """Read the values of a metric for each grid in a folder of post-processed results."""
+    with open(os.path.join(folder, 'grids_info.json')) as inf:
+        grids = json.load(inf)
+    values = []
+    for grid in grids:
+        grid_file = os.path.join(folder, '{}.{}'.format(grid['full_id'], extension))
+        with open(grid_file) as inf:
+            values.append([cast(v) for v in inf.read().split()])
+    return values
+
+
+def glare_autonomy_from_results(res_folder, schedule=None, glare_threshold=0.4,
+                                grids_filter='*'):
+    """Compute glare autonomy from the legacy result files of a folder.
+
+    This matches the glare_autonomy_from_folder function of honeybee-radiance but
+    the compressed archives of the "HB Archive Results" component are read in
+    place of any .dgp files that have been removed.
+    """
+    grids, sun_up_hours = _process_input_folder(res_folder, grids_filter)
+    occ_pattern, total_occ, _ = \
+        filter_schedule_by_hours(sun_up_hours=sun_up_hours, schedule=schedule)
+    ga = []
+    for grid in grids:
+        res_file = result_file(res_folder, grid['full_id'])
+        ga.append([_glare_autonomy(values, occ_pattern, glare_threshold, total_occ)
+                   for values in result_values(res_file)])
+    return ga
+
 
 if all_required_inputs(ghenv.Component):
     # set default values for the thresholds and the grid filter
+    profile = start_profile(ghenv.Component)
     grid_filter_ = '*' if grid_filter_ is None else grid_filter_
     _glare_thresh_ = _glare_thresh_ if _glare_thresh_ else 0.4
 
@@ -121,17 +239,73 @@ if all_required_inputs(ghenv.Component):
     # compute the annual metrics
     res_folder = os.path.dirname(_results[0]) if os.path.isfile(_results[0]) \
         else _results[0]
-    GA = glare_autonomy_from_folder(
-        res_folder, schedule, _glare_thresh_, grid_filter_)
-    GA = list_to_data_tree(GA)
-
-    # process the input values into a readable format
-    ga_mtx = [item[-1] for item in data_tree_to_list(GA)]
     _target_time_ = 95 if _target_time_ is None else _target_time_
+    if os.path.isdir(os.path.join(res_folder, '__static_apertures__')) or \
+            os.path.isfile(os.path.join(res_folder, 'grid_states.json')):
+        dyn_sch = None
+        if len(dyn_sch_) != 0:
+            if os.path.isfile(os.path.join(res_folder, 'grid_states.json')):
+                dyn_sch = dynamic_schedule(dyn_sch_)
+            else:
+                msg = 'No dynamic aperture groups were found in the Model.\n' \
+                    'The input dynamic schedules will be ignored.'
+                print(msg)
+                give_warning(ghenv.Component, msg)
 
-    # determine whether each point passes or fails
-    pass_fail = [[int(val > _target_time_) for val in grid] for grid in ga_mtx]
+        # check whether the results have already been computed for these inputs
+        dyn_sch_dict = dyn_sch.to_dict() if dyn_sch is not None else None
+        sub_folder, is_cached = postprocess_cache(
+            res_folder, 'annual-glare', _glare_thresh_, _target_time_, grid_filter_,
+            schedule, dyn_sch_dict)
+        mark_phase(profile, 'setup')
+        if not is_cached:
+            cmds = [
+                res_folder, sub_folder, '--glare-threshold', str(_glare_thresh_),
+                '--target-time', str(_target_time_)
+            ]
+            if grid_filter_ != '*':
+                cmds.extend(['--grids-filter', grid_filter_])
+            if dyn_sch is not None:
+                dyn_sch_file = input_file(
+                    res_folder, 'dynamic_schedule.json', json.dumps(dyn_sch.to_dict()))
+                cmds.extend(['--states', dyn_sch_file])
+            if schedule is not None:
+                sch_str = '\n'.join(str(h) for h in schedule)
+                sch_file = input_file(res_folder, 'schedule.txt', sch_str)
+                cmds.extend(['--schedule', sch_file])
+            returncode, stdout, stderr, timings = run_postprocess(
+                ghenv.Component, cmds, res_folder, glare_script())
+            print(stderr)
+            print(timings_report(timings))
+            if returncode != 0:
+                shutil.rmtree(os.path.join(res_folder, sub_folder), ignore_errors=True)
+                raise ValueError('Failed to compute annual glare metrics.')
+            cache_postprocess(res_folder, sub_folder)
+            mark_phase(profile, 'post-process', timings)
+        metric_dir = os.path.join(res_folder, sub_folder)
+        GA = read_metric_from_folder(os.path.join(metric_dir, 'ga'), 'ga')
+        pass_fail = read_metric_from_folder(os.path.join(metric_dir, 'pass_fail'), 'pf', int)
+        with open(os.path.join(metric_dir, 'sga.json')) as inf:
+            sGA = json.load(inf)
+    else:
+        if len(dyn_sch_) != 0:
+            msg = 'Dynamic Schedules are currently only supported for Imageless Annual ' \
+                'Glare results stored as NumPy arrays.\nThe input schedules will be ignored.'
+            print(msg)
+            give_warning(ghenv.Component, msg)
+        mark_phase(profile, 'setup')
+        GA = glare_autonomy_from_results(
+            res_folder, schedule, _glare_thresh_, grid_filter_)
 
-    # compute spatial glare autonomy from the pass/fail results
-    sGA = [sum(pf_list) / len(pf_list) for pf_list in pass_fail]
+        # determine whether each point passes or fails and compute spatial glare autonomy
+        pass_fail, sGA = [], []
+        for grid in GA:
+            pf_list = [int(val > _target_time_) for val in grid]
+            pass_fail.append(pf_list)
+            sGA.append(round(100.0 * sum(pf_list) / len(pf_list), 2) if pf_list else 0)
+
+    mark_phase(profile, 'read')
+    GA = list_to_data_tree(GA)
     pass_fail = list_to_data_tree(pass_fail)  # convert matrix to data tree
+    mark_phase(profile, 'tree')
+    write_profile(profile, res_folder)
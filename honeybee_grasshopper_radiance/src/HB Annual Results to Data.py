@@ -35,6 +35,10 @@ deconstructed for detailed analysis with native Grasshopper math components.
         all_vecs_: The data tree of all sensor directions that were used in the simulation.
             This is required in order to look up the index of the sel_vecs_ in
             the results matrices. 
+        cpu_count_: An integer to set the number of CPUs used to process the sensor
+            grids at the same time. This only applies to results that are not
+            in the newer numpy format. If unspecified, all available CPUs will
+            be used. Set to 1 to process the grids one after the other.
 
  Returns:
         report: Reports, errors, warnings, etc.
@@ -52,7 +56,13 @@ ghenv.Component.AdditionalHelpFromDocStrings = '2'
 
 import os
 import json
-import subprocess
+import math
+import mmap
+import array
+import shutil
+import struct
+import hashlib
+import tempfile
 
 try:
     from ladybug.datatype.illuminance import Illuminance
@@ -61,85 +71,245 @@ try:
     from ladybug.datatype.fraction import Fraction
     from ladybug.analysisperiod import AnalysisPeriod
     from ladybug.header import Header
-    from ladybug.datacollection import HourlyContinuousCollection
     from ladybug.futil import write_to_file
 except ImportError as e:
     raise ImportError('\nFailed to import ladybug:\n\t{}'.format(e))
 
 try:
-    from honeybee.config import folders
-except ImportError as e:
-    raise ImportError('\nFailed to import honeybee:\n\t{}'.format(e))
-
-try:
-    from honeybee_radiance.postprocess.annualdaylight import _process_input_folder
+    from ladybug_rhino.config import current_tolerance
+    from ladybug_rhino.togeometry import to_point3d, to_vector3d
+    from ladybug_rhino.grasshopper import all_required_inputs, list_to_data_tree, \
+        data_tree_to_list, give_warning
 except ImportError as e:
-    raise ImportError('\nFailed to import honeybee_radiance:\n\t{}'.format(e))
+    raise ImportError('\nFailed to import ladybug_rhino:\n\t{}'.format(e))
 
 try:
-    from honeybee_radiance_postprocess.dynamic import DynamicSchedule
+    from honeybee_grasshopper_radiance.postprocess import run_postprocess, \
+        timings_report, start_profile, mark_phase, write_profile, input_file, \
+        postprocess_cache, cache_postprocess
+    from honeybee_grasshopper_radiance.results import map_grids, ARCHIVE_EXT, \
+        archive_rows, result_file, results_manifest, row_index, dynamic_schedule, \
+        AnnualDataCollection
 except ImportError as e:
-    raise ImportError('\nFailed to import honeybee_radiance:\n\t{}'.format(e))
+    raise ImportError('\nFailed to import honeybee_grasshopper_radiance:\n\t{}'.format(e))
 
 try:
-    from ladybug_rhino.config import current_tolerance
-    from ladybug_rhino.togeometry import to_point3d, to_vector3d
-    from ladybug_rhino.grasshopper import all_required_inputs, list_to_data_tree, \
-        data_tree_to_list, give_warning
+    import scriptcontext as sc
 except ImportError as e:
-    raise ImportError('\nFailed to import ladybug_rhino:\n\t{}'.format(e))
+    raise ImportError('\nFailed to import scriptcontext:\n\t{}'.format(e))
 tolerance = current_tolerance()
 
 
+EXPORT_SCRIPT = '''
+import os
+import json
+import argparse
+
+import numpy
+from ladybug.header import Header
+from ladybug.analysisperiod import AnalysisPeriod
+from honeybee_radiance_postprocess.dynamic import DynamicSchedule
+from honeybee_radiance_postprocess.results.annual_daylight import AnnualDaylight
+from honeybee_grasshopper_radiance.postprocess import grid_array
+
+CHUNK_SIZE = 500  # number of sensors for which annual values are mapped at once
+parser = argparse.ArgumentParser()
+parser.add_argument('folder')
+parser.add_argument('output_folder')
+parser.add_argument('--states', default=None)
+parser.add_argument('--sensor-index', default=None)
+args = parser.parse_args()
+
+states = DynamicSchedule.from_json(args.states) if args.states else None
+sensor_index = None
+if args.sensor_index:
+    with open(args.sensor_index) as json_file:
+        sensor_index = json.load(json_file)
+results = AnnualDaylight(args.folder)
+
+# write the hourly values of the selected sensors of each grid as a float32 matrix
+header = Header(results.datatype, results.unit, AnalysisPeriod(timestep=results.timestep))
+hoys = numpy.array(header.analysis_period.hoys)
+su_index = numpy.where(numpy.isin(hoys, results.sun_up_hours))[0]
+info = {'header': header.to_dict(), 'grids': []}
+if not os.path.isdir(args.output_folder):
+    os.makedirs(args.output_folder)
+for count, grid_info in enumerate(results.grids_info):
+    grid_id = grid_info['full_id']
+    indices = sensor_index[grid_id] if sensor_index is not None \\
+        else list(range(grid_info['count']))
+    array = grid_array(results, grid_info, states) if len(indices) != 0 else None
+    file_name = 'grid_{}.bin'.format(count)
+    with open(os.path.join(args.output_folder, file_name), 'wb') as bin_file:
+        for st in range(0, len(indices), CHUNK_SIZE):
+            chunk = indices[st:st + CHUNK_SIZE]
+            values = numpy.zeros((len(chunk), len(hoys)), dtype='<f4')
+            values[:, su_index] = array[chunk, :]
+            values.tofile(bin_file)
+    info['grids'].append({'full_id': grid_id, 'file': file_name, 'indices': indices})
+with open(os.path.join(args.output_folder, 'data_info.json'), 'w') as json_file:
+    json.dump(info, json_file)
+'''
+
+
+def export_script():
+    """Get the path to the script that exports annual data as binary arrays."""
+    script_id = hashlib.md5(EXPORT_SCRIPT.encode('utf-8')).hexdigest()
+    script = os.path.join(
+        tempfile.gettempdir(), 'hb_radiance_annual_data_{}.py'.format(script_id))
+    if not os.path.isfile(script):
+        write_to_file(script, EXPORT_SCRIPT)
+    return script
+
+
+def binary_to_data(data_folder):
+    """Get a list of data collections for each grid exported to a data folder.
+
+    The data collections only read the row of their sensor from the binary file
+    of the grid once their values are used, such that the memory scales with
+    the data collections that are used downstream rather than those that are
+    output by the component.
+    """
+    with open(os.path.join(data_folder, 'data_info.json')) as json_file:
+        info = json.load(json_file)
+    header = Header.from_dict(info['header'])
+
+    data = []
+    for grid in info['grids']:
+        bin_file = os.path.join(data_folder, grid['file'])
+        grid_data = []
+        for i, idx in enumerate(grid['indices']):
+            sen_header = header.duplicate()
+            sen_header.metadata['sensor grid'] = grid['full_id']
+            sen_header.metadata['sensor index'] = idx
+            grid_data.append(AnnualDataCollection.from_row(sen_header, bin_file, i))
+        data.append(grid_data)
+    return data
+
+
+def result_rows(res_file, point_filter=None):
+    """Yield the index and a typed array of the values of each row of a result file.
+
+    Compressed archives only decompress the chunks with rows in the point_filter.
+    Otherwise, if there is a point_filter, the rows are read by seeking straight
+    to their offsets in the row index of the file. Otherwise, the file is memory-mapped
+    whenever possible such that the rows are split without decoding the file.
+    """
+    wanted = None if point_filter is None else set(point_filter)
+    if res_file.endswith(ARCHIVE_EXT):
+        for row in archive_rows(res_file, wanted):
+            yield row
+        return
+    idx_file = None if wanted is None else row_index(res_file)
+    if idx_file is not None:
+        row_count = os.path.getsize(idx_file) // 8 - 1
+        with open(idx_file, 'rb') as idx, open(res_file, 'rb') as results:
+            for i in sorted(wanted):
+                if i >= row_count:
+                    break
+                idx.seek(8 * i)
+                start, end = struct.unpack('<2Q', idx.read(16))
+                results.seek(start)
+                yield i, array.array('d', map(float, results.read(end - start).split()))
+        return
+
+    last = None if wanted is None else max(wanted) if len(wanted) != 0 else -1
+    with open(res_file, 'rb') as results:
+        try:
+            res_map = mmap.mmap(results.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:  # empty file or memory-mapping is not supported
+            res_map = None
+        if res_map is None:
+            for i, pt_res in enumerate(results):
+                if last is not None and i > last:
+                    break
+                if wanted is None or i in wanted:
+                    yield i, array.array('d', map(float, pt_res.split()))
+            return
+        try:
+            start, i, size = 0, 0, len(res_map)
+            while start < size:
+                if last is not None and i > last:
+                    break
+                end = res_map.find(b'\n', start)
+                end = size if end == -1 else end
+                if wanted is None or i in wanted:
+                    yield i, array.array('d', map(float, res_map[start:end].split()))
+                start, i = end + 1, i + 1
+        finally:
+            res_map.close()
+
+
 def file_to_data(ill_file, point_filter, su_pattern, header, timestep, grid_id):
     """Get a list of data collections for a given result file."""
+    # create a data collection for each of the requested sensors
     data_colls = []
     new_header = header.duplicate()
     new_header.metadata['sensor grid'] = grid_id
-    with open(ill_file) as results:
+    for i, values in result_rows(ill_file, point_filter):
         if point_filter is None:
-            for pt_res in results:
-                base_values = [0] * 8760 * timestep
-                for val, hr in zip(pt_res.split(), su_pattern):
-                    base_values[hr] = float(val)
-                data_colls.append(HourlyContinuousCollection(new_header, base_values))
+            data_colls.append(
+                AnnualDataCollection.from_array(new_header, values, su_pattern))
         else:
-            for i, pt_res in enumerate(results):
-                if i in point_filter:
-                    new_header = new_header.duplicate()
-                    new_header.metadata['sensor index'] = i
-                    base_values = [0] * 8760 * timestep
-                    for val, hr in zip(pt_res.split(), su_pattern):
-                        base_values[hr] = float(val)
-                    data_colls.append(HourlyContinuousCollection(new_header, base_values))
+            sen_header = new_header.duplicate()
+            sen_header.metadata['sensor index'] = i
+            data_colls.append(
+                AnnualDataCollection.from_array(sen_header, values, su_pattern))
     return data_colls
 
 
-def find_point_in_grid(s_pt, all_pts):
+def geometry_cell(geo):
+    """Get the cell of the spatial hash in which a point or vector lies."""
+    return (int(math.floor(geo.x / tolerance)), int(math.floor(geo.y / tolerance)),
+            int(math.floor(geo.z / tolerance)))
+
+
+def geometry_index(all_geos, sticky_key):
+    """Get a spatial hash of sensor points or vectors that is cached between solves.
+
+    Each point or vector is keyed by the cell of a grid with a spacing equal to
+    the model tolerance such that equivalent geometry is always found in the
+    same cell or one of its neighbors.
+    """
+    geo_key = (tolerance, tuple(len(grid_geos) for grid_geos in all_geos),
+               hash(tuple((g.x, g.y, g.z) for grid_geos in all_geos for g in grid_geos)))
+    cached = sc.sticky.get(sticky_key)
+    if cached is not None and cached[0] == geo_key:
+        return cached[1]
+    geo_index = {}
+    for i, grid_geos in enumerate(all_geos):
+        for j, geo in enumerate(grid_geos):
+            geo_index.setdefault(geometry_cell(geo), []).append((i, j))
+    sc.sticky[sticky_key] = (geo_key, geo_index)
+    return geo_index
+
+
+def find_point_in_grid(s_pt, all_pts, pt_index):
     """Find the index of a point in a list of list of grids."""
+    cx, cy, cz = geometry_cell(s_pt)
     m_pts = []
-    for i, grid_pts in enumerate(all_pts):
-        for j, g_pt in enumerate(grid_pts):
-            if g_pt.is_equivalent(s_pt, tolerance):
-                m_pts.append((i, j))
-    return m_pts
+    for x in (cx - 1, cx, cx + 1):
+        for y in (cy - 1, cy, cy + 1):
+            for z in (cz - 1, cz, cz + 1):
+                for i, j in pt_index.get((x, y, z), ()):
+                    if all_pts[i][j].is_equivalent(s_pt, tolerance):
+                        m_pts.append((i, j))
+    return sorted(m_pts)
 
 
-def find_vec_in_grid(s_v, all_vecs, pt_filter):
+def find_vec_in_grid(s_v, all_vecs, vec_index, pt_filter):
     """Find the index of a vector in a list of list of grids."""
-    m_vecs = []
-    for i, grid in enumerate(pt_filter):
-        for j in grid:
-            if all_vecs[i][j].is_equivalent(s_v, tolerance):
-                m_vecs.append((i, j))
-    return m_vecs
+    m_vecs = set(find_point_in_grid(s_v, all_vecs, vec_index))
+    return [(i, j) for i, grid in enumerate(pt_filter) for j in grid
+            if (i, j) in m_vecs]
 
 
 if all_required_inputs(ghenv.Component):
     # get the relevant .ill files
+    profile = start_profile(ghenv.Component)
     res_folder = os.path.dirname(_results[0]) if os.path.isfile(_results[0]) \
         else _results[0]
-    grids, sun_up_hours = _process_input_folder(res_folder, '*')
+    grids, sun_up_hours = results_manifest(res_folder)
 
     # set up the sensor filter
     pt_filter = [None for i in grids]
@@ -151,8 +321,9 @@ if all_required_inputs(ghenv.Component):
         all_pts = [[to_point3d(pt) for pt in dat[-1]] for dat in data_tree_to_list(_all_pts)]
         assert len(all_pts) != 0, '_all_pts must be connected in order to use _sel_pts.'
         sel_pts = [to_point3d(pt) for pt in _sel_pts]
+        pt_index = geometry_index(all_pts, 'hb_annual_results_to_data_points')
         for s_pt in sel_pts:
-            m_pts = find_point_in_grid(s_pt, all_pts)
+            m_pts = find_point_in_grid(s_pt, all_pts, pt_index)
             for i, j in m_pts:
                 pt_filter[i].append(j)
 
@@ -162,49 +333,59 @@ if all_required_inputs(ghenv.Component):
         all_vecs = [[to_vector3d(v) for v in dat[-1]] for dat in data_tree_to_list(all_vecs_)]
         assert len(all_vecs) != 0, 'all_vecs_ must be connected in order to use sel_vecs_.'
         sel_vecs = [to_vector3d(v) for v in sel_vecs_]
+        vec_index = geometry_index(all_vecs, 'hb_annual_results_to_data_vectors')
         for s_v in sel_vecs:
-            m_vs = find_point_in_grid(s_v, all_vecs) if len(_sel_pts) == 0 else \
-                find_vec_in_grid(s_v, all_vecs, pt_filter)
+            m_vs = find_point_in_grid(s_v, all_vecs, vec_index) if len(_sel_pts) == 0 \
+                else find_vec_in_grid(s_v, all_vecs, vec_index, pt_filter)
             for i, j in m_vs:
                 new_pt_filter[i].append(j)
         pt_filter = new_pt_filter
+    mark_phase(profile, 'setup')
 
     # check to see if results use the newer numpy arrays
     if os.path.isdir(os.path.join(res_folder, '__static_apertures__'))  or \
             os.path.isfile(os.path.join(res_folder, 'grid_states.json')):
-        cmds = [folders.python_exe_path, '-m', 'honeybee_radiance_postprocess',
-                'post-process', 'annual-to-data', res_folder]
-        if pt_filter[0] is not None:
-            sen_dict = {g['full_id']: s_ind for g, s_ind in zip(grids, pt_filter)}
-            si_file = os.path.join(res_folder, 'sensor_indices.json')
-            write_to_file(si_file, json.dumps(sen_dict))
-            cmds.extend(['--sensor-index', si_file])
+        dyn_sch = None
         if len(dyn_sch_) != 0:
             if os.path.isfile(os.path.join(res_folder, 'grid_states.json')):
-                dyn_sch = dyn_sch_[0] if isinstance(dyn_sch_[0], DynamicSchedule) else \
-                    DynamicSchedule.from_group_schedules(dyn_sch_)
-                dyn_sch_file = dyn_sch.to_json(folder=res_folder)
-                cmds.extend(['--states', dyn_sch_file])
+                dyn_sch = dynamic_schedule(dyn_sch_)
             else:
                 msg = 'No dynamic aperture groups were found in the Model.\n' \
                     'The input dynamic schedules will be ignored.'
                 print(msg)
                 give_warning(ghenv.Component, msg)
-        use_shell = True if os.name == 'nt' else False
-        custom_env = os.environ.copy()
-        custom_env['PYTHONHOME'] = ''
-        process = subprocess.Popen(
-            cmds, cwd=res_folder, shell=use_shell, env=custom_env,
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        stdout, stderr = process.communicate()  # wait for the process to finish
-        print(stderr)
-        returncode = process.wait()
-        if returncode != 0:
-            raise ValueError('Failed to compute data collections.')
-        data_dicts = json.loads(stdout)
-        data = [[HourlyContinuousCollection.from_dict(d) for d in data]
-                for data in data_dicts]
+
+        # check whether the data has already been exported for these inputs
+        sen_dict = None if pt_filter[0] is None else \
+            {g['full_id']: s_ind for g, s_ind in zip(grids, pt_filter)}
+        dyn_sch_dict = dyn_sch.to_dict() if dyn_sch is not None else None
+        sub_folder, is_cached = postprocess_cache(
+            res_folder, 'annual-data', sen_dict, dyn_sch_dict)
+        data_folder = os.path.join(res_folder, sub_folder)
+        if not is_cached:
+            cmds = [res_folder, data_folder]
+            if sen_dict is not None:
+                si_file = input_file(res_folder, 'sensor_indices.json', json.dumps(sen_dict))
+                cmds.extend(['--sensor-index', si_file])
+            if dyn_sch is not None:
+                dyn_sch_file = input_file(
+                    res_folder, 'dynamic_schedule.json', json.dumps(dyn_sch_dict))
+                cmds.extend(['--states', dyn_sch_file])
+            returncode, stdout, stderr, timings = run_postprocess(
+                ghenv.Component, cmds, res_folder, export_script())
+            print(stderr)
+            print(timings_report(timings))
+            if returncode != 0:
+                shutil.rmtree(data_folder, ignore_errors=True)
+                raise ValueError('Failed to compute data collections.')
+            mark_phase(profile, 'post-process', timings)
+        # keep the export for as long as this component outputs its data collections
+        owner = str(ghenv.Component.InstanceGuid)
+        cache_postprocess(res_folder, sub_folder, 'export', owner)
+        data = binary_to_data(data_folder)
+        mark_phase(profile, 'read')
         data = list_to_data_tree(data)
+        mark_phase(profile, 'tree')
 
     else:
         if len(dyn_sch_) != 0:
@@ -235,14 +416,17 @@ if all_required_inputs(ghenv.Component):
         dgp_head = Header(Fraction(), 'fraction', aper, metadata={'type': 'Daylight Glare Probability (DGP)'})
 
         # create the data collections from the .ill files
-        data = []
-        for grid_info, p_filt in zip(grids, pt_filter):
+        def grid_data(grid_filter):
+            grid_info, p_filt = grid_filter
             grid_id = grid_info['full_id']
-            ill_file = os.path.join(res_folder, '%s.ill' % grid_id)
-            dgp_file = os.path.join(res_folder, '%s.dgp' % grid_id)
-            if os.path.isfile(dgp_file):
-                data_list = file_to_data(dgp_file, p_filt, sun_up_hours, dgp_head, timestep, grid_id)
-            else:
-                data_list = file_to_data(ill_file, p_filt, sun_up_hours, head, timestep, grid_id)
-            data.append(data_list)
+            res_file = result_file(res_folder, grid_id)
+            if res_file.endswith(('.dgp', '.dgp' + ARCHIVE_EXT)):
+                return file_to_data(res_file, p_filt, sun_up_hours, dgp_head, timestep, grid_id)
+            return file_to_data(res_file, p_filt, sun_up_hours, head, timestep, grid_id)
+
+        data = map_grids(grid_data, list(zip(grids, pt_filter)), cpu_count_)
+        mark_phase(profile, 'read')
         data = list_to_data_tree(data)
+        mark_phase(profile, 'tree')
+
+    write_profile(profile, res_folder)
@@ -62,39 +62,154 @@ ghenv.Component.SubCategory = '4 :: Results'
 ghenv.Component.AdditionalHelpFromDocStrings = '2'
 
 import os
+import sys
 import json
-import subprocess
+import array
+import hashlib
+import tempfile
+import shutil
 
 try:
+    from ladybug.header import Header
     from ladybug.datacollection import HourlyContinuousCollection
     from ladybug.futil import write_to_file
 except ImportError as e:
     raise ImportError('\nFailed to import ladybug:\n\t{}'.format(e))
 
 try:
-    from honeybee.config import folders
+    from ladybug_rhino.grasshopper import all_required_inputs, list_to_data_tree,   \
+        give_warning
 except ImportError as e:
-    raise ImportError('\nFailed to import honeybee:\n\t{}'.format(e))
+    raise ImportError('\nFailed to import ladybug_rhino:\n\t{}'.format(e))
 
 try:
-    from honeybee_radiance_postprocess.dynamic import DynamicSchedule
+    from honeybee_grasshopper_radiance.postprocess import run_postprocess, \
+        timings_report, start_profile, mark_phase, write_profile, input_file, \
+        postprocess_cache, cache_postprocess
+    from honeybee_grasshopper_radiance.results import map_grids, dynamic_schedule
 except ImportError as e:
-    raise ImportError('\nFailed to import honeybee_radiance:\n\t{}'.format(e))
+    raise ImportError('\nFailed to import honeybee_grasshopper_radiance:\n\t{}'.format(e))
 
-try:
-    from pollination_handlers.outputs.helper import read_sensor_grid_result
-except ImportError as e:
-    raise ImportError('\nFailed to import pollination_handlers:\n\t{}'.format(e))
 
-try:
-    from ladybug_rhino.grasshopper import all_required_inputs, list_to_data_tree,   \
-        give_warning
-except ImportError as e:
-    raise ImportError('\nFailed to import ladybug_rhino:\n\t{}'.format(e))
+STATISTIC_NAMES = ('average', 'median', 'minimum', 'maximum', 'cumulative')
+STATISTICS_SCRIPT = '''
+import os
+import sys
+import json
+import argparse
+
+import numpy
+from ladybug.analysisperiod import AnalysisPeriod
+from honeybee_radiance_postprocess.dynamic import DynamicSchedule
+from honeybee_radiance_postprocess.util import hoys_mask
+from honeybee_radiance_postprocess.results.annual_daylight import AnnualDaylight
+from honeybee_radiance_postprocess.results.annual_irradiance import AnnualIrradiance
+
+parser = argparse.ArgumentParser()
+parser.add_argument('folder')
+parser.add_argument('output_folder')
+parser.add_argument('--hoys-file', default=None)
+parser.add_argument('--grids-filter', default='*')
+parser.add_argument('--states', default=None)
+args = parser.parse_args()
+
+hoys = []
+if args.hoys_file:
+    with open(args.hoys_file) as hoys_file:
+        hoys = [float(h) for h in hoys_file.readlines()]
+states = DynamicSchedule.from_json(args.states) if args.states else None
+study_type = 'annual-daylight'
+study_info_file = os.path.join(args.folder, 'study_info.json')
+if os.path.isfile(study_info_file):
+    with open(study_info_file) as json_file:
+        study_type = json.load(json_file).get('study_type', study_type)
+results = AnnualIrradiance(args.folder) if study_type == 'annual-irradiance' \\
+    else AnnualDaylight(args.folder)
+
+# get the hours of the year that the statistics can be non-zero
+sun_up_hours = numpy.array(results.sun_up_hours)
+mask = hoys_mask(results.sun_up_hours, hoys)
+if mask is not None:
+    sun_up_hours = sun_up_hours[mask]
+full_ap = numpy.array(AnalysisPeriod(timestep=results.timestep).hoys)
+indices = numpy.where(numpy.isin(full_ap, sun_up_hours))[0]
+
+# write the five statistics of each grid into a single float32 block
+stats = results.annual_statistics(
+    hoys=hoys, states=states, grids_filter=args.grids_filter, axis=0)
+if not os.path.isdir(args.output_folder):
+    os.makedirs(args.output_folder)
+info = {'indices': indices.tolist(), 'grids': []}
+for count, grid_info in enumerate(stats[-1]):
+    data_colls = [stat[count] for stat in stats[:-1]]
+    if 'header' not in info:
+        header = data_colls[0].header.duplicate()
+        header.metadata = {}
+        info['header'] = header.to_dict()
+    values = numpy.array([data.values for data in data_colls], dtype='<f4')
+    file_name = 'grid_{}.bin'.format(count)
+    values[:, indices].tofile(os.path.join(args.output_folder, file_name))
+    info['grids'].append({'full_id': grid_info['full_id'], 'file': file_name})
+with open(os.path.join(args.output_folder, 'statistics_info.json'), 'w') as json_file:
+    json.dump(info, json_file)
+'''
+
+
+def statistics_script():
+    """Get the path to the script that writes per-timestep statistics as binary blocks."""
+    script_id = hashlib.md5(STATISTICS_SCRIPT.encode('utf-8')).hexdigest()
+    script = os.path.join(
+        tempfile.gettempdir(), 'hb_radiance_timestep_statistics_{}.py'.format(script_id))
+    if not os.path.isfile(script):
+        write_to_file(script, STATISTICS_SCRIPT)
+    return script
+
+
+def binary_statistics(stat_folder):
+    """Get the per-timestep statistics of each grid from a statistics folder.
+
+    All of the grids are read at the same time and the data collections of
+    every grid share the same header as a starting point.
+
+    Returns:
+        A list with a list of data collections for each statistic. Each of these
+        lists has one data collection per grid.
+    """
+    with open(os.path.join(stat_folder, 'statistics_info.json')) as json_file:
+        info = json.load(json_file)
+    if len(info['grids']) == 0:
+        return [[] for _ in STATISTIC_NAMES]
+    header = Header.from_dict(info['header'])
+
+    # map each timestep of the year to a statistics value or the trailing zero
+    step_count = len(info['indices'])
+    hour_map = [step_count] * len(header.analysis_period)
+    for i, hr in enumerate(info['indices']):
+        hour_map[hr] = i
+
+    def load_grid(grid):
+        values = array.array('f')
+        with open(os.path.join(stat_folder, grid['file']), 'rb') as bin_file:
+            values.fromfile(bin_file, step_count * len(STATISTIC_NAMES))
+        if sys.byteorder != 'little':
+            values.byteswap()
+        grid_data = []
+        for i, stat_name in enumerate(STATISTIC_NAMES):
+            row = values[i * step_count:(i + 1) * step_count]
+            row.append(0)
+            stat_header = header.duplicate()
+            stat_header.metadata['Sensor Grid'] = grid['full_id']
+            stat_header.metadata['Metric'] = stat_name.capitalize()
+            grid_data.append(
+                HourlyContinuousCollection(stat_header, [row[j] for j in hour_map]))
+        return grid_data
+
+    return list(zip(*map_grids(load_grid, info['grids'])))
 
 
 if all_required_inputs(ghenv.Component):
     # compute the annual summary
+    profile = start_profile(ghenv.Component)
     grid_filter_ = '*' if grid_filter_ is None else grid_filter_
     res_folder = _results
     per_timestep = False if per_timestep_ is None else per_timestep_
@@ -102,44 +217,52 @@ if all_required_inputs(ghenv.Component):
     # check to see if results use the newer numpy arrays
     if os.path.isdir(os.path.join(res_folder, '__static_apertures__')) or \
         os.path.isfile(os.path.join(res_folder, 'grid_states.json')):
-        cmds = [folders.python_exe_path, '-m', 'honeybee_radiance_postprocess',
-                'post-process', 'annual-statistics', res_folder, '-sf',
-                'statistics']
-        if len(_hoys_) != 0:
-            hoys_str = '\n'.join(str(h) for h in _hoys_)
-            hoys_file = os.path.join(res_folder, 'hoys.txt')
-            write_to_file(hoys_file, hoys_str)
-            cmds.extend(['--hoys-file', hoys_file])
-        if grid_filter_ != '*':
-            cmds.extend(['--grids-filter', grid_filter_])
+        dyn_sch = None
         if len(dyn_sch_) != 0:
             if os.path.isfile(os.path.join(res_folder, 'grid_states.json')):
-                dyn_sch = dyn_sch_[0] if isinstance(dyn_sch_[0], DynamicSchedule) else \
-                    DynamicSchedule.from_group_schedules(dyn_sch_)
-                dyn_sch_file = dyn_sch.to_json(folder=res_folder)
-                cmds.extend(['--states', dyn_sch_file])
+                dyn_sch = dynamic_schedule(dyn_sch_)
             else:
                 msg = 'No dynamic aperture groups were found in the Model.\n' \
                     'The input dynamic schedules will be ignored.'
                 print(msg)
                 give_warning(ghenv.Component, msg)
+
+        # check whether the results have already been computed for these inputs
+        dyn_sch_dict = dyn_sch.to_dict() if dyn_sch is not None else None
+        sub_folder, is_cached = postprocess_cache(
+            res_folder, 'timestep-statistics' if per_timestep else 'annual-statistics',
+            list(_hoys_), grid_filter_, dyn_sch_dict)
+        mark_phase(profile, 'setup')
+        if not is_cached:
+            cmds = [res_folder, sub_folder] if per_timestep else \
+                ['post-process', 'annual-statistics', res_folder, '-sf', sub_folder]
+            if len(_hoys_) != 0:
+                hoys_str = '\n'.join(str(h) for h in _hoys_)
+                hoys_file = input_file(res_folder, 'hoys.txt', hoys_str)
+                cmds.extend(['--hoys-file', hoys_file])
+            if grid_filter_ != '*':
+                cmds.extend(['--grids-filter', grid_filter_])
+            if dyn_sch is not None:
+                dyn_sch_file = input_file(
+                    res_folder, 'dynamic_schedule.json', json.dumps(dyn_sch.to_dict()))
+                cmds.extend(['--states', dyn_sch_file])
+
+            script = statistics_script() if per_timestep else None
+            returncode, stdout, stderr, timings = run_postprocess(
+                ghenv.Component, cmds, res_folder, script)
+            print(stderr)
+            print(timings_report(timings))
+            if returncode != 0:
+                shutil.rmtree(os.path.join(res_folder, sub_folder), ignore_errors=True)
+                raise ValueError('Failed to compute annual statistics values.')
+            cache_postprocess(res_folder, sub_folder)
+            mark_phase(profile, 'post-process', timings)
         
-        if per_timestep:
-            cmds.extend(['--timestep'])
-        
-        use_shell = True if os.name == 'nt' else False
-        custom_env = os.environ.copy()
-        custom_env['PYTHONHOME'] = ''
-        process = subprocess.Popen(
-            cmds, cwd=res_folder, shell=use_shell, env=custom_env,
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        stdout, stderr = process.communicate()  # wait for the process to finish
-        print(stderr)
-        returncode = process.wait()
-        if returncode != 0:
-            raise ValueError('Failed to compute annual statistics values.')
-        
-        res_dir = os.path.join(res_folder, 'statistics')
+        try:  # only import the result readers once there are results to read
+            from pollination_handlers.outputs.helper import read_sensor_grid_result
+        except ImportError as e:
+            raise ImportError('\nFailed to import pollination_handlers:\n\t{}'.format(e))
+        res_dir = os.path.join(res_folder, sub_folder)
         average_values_dir = os.path.join(res_dir, 'average_values')
         median_values_dir = os.path.join(res_dir, 'median_values')
         minimum_values_dir = os.path.join(res_dir, 'minimum_values')
@@ -147,42 +270,23 @@ if all_required_inputs(ghenv.Component):
         cumulative_values_dir = os.path.join(res_dir, 'cumulative_values')
         
         if per_timestep is False:
-            average = list_to_data_tree(read_sensor_grid_result(average_values_dir, 'average', 'full_id', False))
-            median = list_to_data_tree(read_sensor_grid_result(median_values_dir, 'median', 'full_id', False))
-            minimum = list_to_data_tree(read_sensor_grid_result(minimum_values_dir, 'minimum', 'full_id', False))
-            maximum = list_to_data_tree(read_sensor_grid_result(maximum_values_dir, 'maximum', 'full_id', False))
-            cumulative = list_to_data_tree(read_sensor_grid_result(cumulative_values_dir, 'cumulative', 'full_id', False))
+            stats = [
+                read_sensor_grid_result(average_values_dir, 'average', 'full_id', False),
+                read_sensor_grid_result(median_values_dir, 'median', 'full_id', False),
+                read_sensor_grid_result(minimum_values_dir, 'minimum', 'full_id', False),
+                read_sensor_grid_result(maximum_values_dir, 'maximum', 'full_id', False),
+                read_sensor_grid_result(cumulative_values_dir, 'cumulative', 'full_id', False)
+            ]
         else:
-            with open(os.path.join(average_values_dir, 'grids_info.json')) as json_file:
-                grids_info = json.load(json_file)
-            average = []
-            median = []
-            minimum = []
-            maximum = []
-            cumulative = []
-            for grid_info in grids_info:
-                with open(os.path.join(average_values_dir, '{}_average.json'.format(grid_info['full_id']))) as json_file:
-                    data_dict = json.load(json_file)
-                average.append(HourlyContinuousCollection.from_dict(data_dict))
-                with open(os.path.join(median_values_dir, '{}_median.json'.format(grid_info['full_id']))) as json_file:
-                    data_dict = json.load(json_file)
-                median.append(HourlyContinuousCollection.from_dict(data_dict))
-                with open(os.path.join(minimum_values_dir, '{}_minimum.json'.format(grid_info['full_id']))) as json_file:
-                    data_dict = json.load(json_file)
-                minimum.append(HourlyContinuousCollection.from_dict(data_dict))
-                with open(os.path.join(maximum_values_dir, '{}_maximum.json'.format(grid_info['full_id']))) as json_file:
-                    data_dict = json.load(json_file)
-                maximum.append(HourlyContinuousCollection.from_dict(data_dict))
-                with open(os.path.join(cumulative_values_dir, '{}_cumulative.json'.format(grid_info['full_id']))) as json_file:
-                    data_dict = json.load(json_file)
-                cumulative.append(HourlyContinuousCollection.from_dict(data_dict))
-            average = list_to_data_tree(average)
-            median = list_to_data_tree(median)
-            minimum = list_to_data_tree(minimum)
-            maximum = list_to_data_tree(maximum)
-            cumulative = list_to_data_tree(cumulative)
+            stats = [list(stat) for stat in binary_statistics(res_dir)]
+        mark_phase(profile, 'read')
+        average, median, minimum, maximum, cumulative = \
+            [list_to_data_tree(stat) for stat in stats]
+        mark_phase(profile, 'tree')
     else:
         msg = 'Annual Statistics is only supported for Annual Daylight and Annual Irradiance ' \
             'simulations with NumPy arrays.'
         print(msg)
-        give_warning(ghenv.Component, msg)
\ No newline at end of file
+        give_warning(ghenv.Component, msg)
+
+    write_profile(profile, res_folder)
\ No newline at end of file
@@ -18,7 +18,11 @@ results with operable shading devices, then this output is NOT LEED compliant.
     Args:
         _results: An annual results folder containing direct illuminance results.
             This can be the output of the "HB Annual Daylight" component. This can
-            also be just the path to the results folder.
+            also be just the path to the results folder. The results of the
+            "HB Direct Sun Hours" component are also supported, in which case
+            every occupied hour that a sensor sees the sun counts towards ASE
+            and the _threshold_ is not used. Folders of .ill files with direct
+            illuminance are also supported when direct_ is set to True.
         _occ_sch_: An annual occupancy schedule as a Ladybug Data Collection or a HB-Energy
             schedule object. This can also be the identifier of a schedule in
             your HB-Energy schedule library. Any value in this schedule that is
@@ -32,6 +36,14 @@ results with operable shading devices, then this output is NOT LEED compliant.
             first_floor_* will simulate only the sensor grids that have an
             identifier that starts with first_floor_. By default all the grids
             will be processed.
+        direct_: Set to True to note that the .ill files of the _results are direct
+            illuminance. This allows ASE to be computed from the results of a
+            legacy annual simulation of direct illuminance without the need
+            for an enhanced simulation. Note that the .ill files cannot be told
+            apart from total illuminance and so the results of this component
+            will be wrong if the files are not direct illuminance. This input
+            is ignored if the _results come from an enhanced simulation or
+            the "HB Direct Sun Hours" component. (Default: False).
 
     Returns:
         report: Reports, errors, warnings, etc.
@@ -49,18 +61,17 @@ ghenv.Component.SubCategory = '4 :: Results'
 ghenv.Component.AdditionalHelpFromDocStrings = '1'
 
 import os
-import subprocess
 
 try:
     from ladybug.datacollection import BaseCollection
-    from ladybug.futil import write_to_file
 except ImportError as e:
     raise ImportError('\nFailed to import ladybug:\n\t{}'.format(e))
 
 try:
-    from honeybee.config import folders
+    from honeybee_radiance.postprocess.annual import filter_schedule_by_hours, \
+        _process_input_folder
 except ImportError as e:
-    raise ImportError('\nFailed to import honeybee:\n\t{}'.format(e))
+    raise ImportError('\nFailed to import honeybee_radiance:\n\t{}'.format(e))
 
 try:
     from honeybee_energy.lib.schedules import schedule_by_identifier
@@ -68,19 +79,58 @@ except ImportError as e:  # honeybee schedule library is not available
     schedule_by_identifier = None
 
 try:
-    from pollination_handlers.outputs.daylight import read_ase_from_folder, \
-        read_hours_from_folder
+    from ladybug_rhino.grasshopper import all_required_inputs, list_to_data_tree
 except ImportError as e:
-    raise ImportError('\nFailed to import pollination_handlers:\n\t{}'.format(e))
+    raise ImportError('\nFailed to import ladybug_rhino:\n\t{}'.format(e))
 
 try:
-    from ladybug_rhino.grasshopper import all_required_inputs, list_to_data_tree
+    from honeybee_grasshopper_radiance.postprocess import run_postprocess, \
+        timings_report, start_profile, mark_phase, write_profile, input_file
+    from honeybee_grasshopper_radiance.results import ARCHIVE_EXT, result_values
 except ImportError as e:
-    raise ImportError('\nFailed to import ladybug_rhino:\n\t{}'.format(e))
+    raise ImportError('\nFailed to import honeybee_grasshopper_radiance:\n\t{}'.format(e))
+
+
+DIRECT_SUN_FOLDER = 'direct_sun_hours'  # results folder of the direct-sun-hours recipe
+
+
+def sunlight_exposure_from_folder(res_folder, schedule=None, occ_hours=250,
+                                  grids_filter='*', threshold=0):
+    """Compute annual sunlight exposure from a folder of direct results.
+
+    The result files or their compressed archives are streamed one sensor at
+    a time and each occupied hour in which the value of a sensor is above the
+    threshold counts as an hour above the threshold. For direct sun hours
+    results, the threshold is 0 such that each hour that sees the sun counts.
+
+    Returns:
+        A tuple with two values.
+
+        -   ase: A list with the annual sunlight exposure of each grid.
+
+        -   hours_above: A list of lists with the number of occupied hours
+            above the threshold for each sensor of each grid.
+    """
+    grids, sun_up_hours = _process_input_folder(res_folder, grids_filter)
+    occ_pattern = filter_schedule_by_hours(sun_up_hours, schedule)[0]
+    hours_above = []
+    for grid in grids:
+        ill_file = os.path.join(res_folder, '%s.ill' % grid['full_id'])
+        if not os.path.isfile(ill_file) and os.path.isfile(ill_file + ARCHIVE_EXT):
+            ill_file = ill_file + ARCHIVE_EXT
+        hours_above.append([sum(1 for v in occ_values if v > threshold)
+                            for occ_values in result_values(ill_file, occ_pattern)])
+
+    ase = []
+    for grid_hrs in hours_above:
+        over_lit = sum(1 for h in grid_hrs if h >= occ_hours)
+        ase.append(round(100.0 * over_lit / len(grid_hrs), 2) if grid_hrs else 0)
+    return ase, hours_above
 
 
 if all_required_inputs(ghenv.Component):
     # set default values for the thresholds and the grid filter
+    profile = start_profile(ghenv.Component)
     grid_filter_ = '*' if grid_filter_ is None else grid_filter_
     _direct_threshold_ = _threshold_ if _threshold_ else 1000
     _occ_hours_ = _target_hrs_ if _target_hrs_ else 250
@@ -114,9 +164,12 @@ if all_required_inputs(ghenv.Component):
     # compute the annual metrics
     res_folder = os.path.dirname(_results[0]) if os.path.isfile(_results[0]) \
         else _results[0]
+    dsh_folder = os.path.join(res_folder, DIRECT_SUN_FOLDER)
+    if os.path.isdir(dsh_folder):  # the folder of all direct sun hours results
+        res_folder = dsh_folder
+    mark_phase(profile, 'setup')
     if os.path.isfile(os.path.join(res_folder, 'grid_states.json')):
         cmds = [
-            folders.python_exe_path, '-m', 'honeybee_radiance_postprocess',
             'post-process', 'annual-sunlight-exposure', res_folder, '-sf', 'metrics',
             '-dt', str(_direct_threshold_), '-oh', str(_occ_hours_)
         ]
@@ -124,25 +177,36 @@ if all_required_inputs(ghenv.Component):
             cmds.extend(['--grids-filter', grid_filter_])
         if schedule is not None:
             sch_str = '\n'.join(str(h) for h in schedule)
-            sch_file = os.path.join(res_folder, 'schedule.txt')
-            write_to_file(sch_file, sch_str)
+            sch_file = input_file(res_folder, 'schedule.txt', sch_str)
             cmds.extend(['--schedule', sch_file])
-        use_shell = True if os.name == 'nt' else False
-        custom_env = os.environ.copy()
-        custom_env['PYTHONHOME'] = ''
-        process = subprocess.Popen(
-            cmds, cwd=res_folder, shell=use_shell, env=custom_env,
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        stdout, stderr = process.communicate()  # wait for the process to finish
+        returncode, stdout, stderr, timings = run_postprocess(
+            ghenv.Component, cmds, res_folder)
         print(stderr)
-        returncode = process.wait()
+        print(timings_report(timings))
         if returncode != 0:
             raise ValueError('Failed to compute annual sunlight exposure.')
+        mark_phase(profile, 'post-process', timings)
+        try:  # only import the result readers once there are results to read
+            from pollination_handlers.outputs.daylight import read_ase_from_folder, \
+                read_hours_from_folder
+        except ImportError as e:
+            raise ImportError('\nFailed to import pollination_handlers:\n\t{}'.format(e))
         metric_dir = os.path.join(res_folder, 'metrics')
         ASE = read_ase_from_folder(os.path.join(metric_dir, 'ase'))
-        hrs_above = list_to_data_tree(read_hours_from_folder(os.path.join(metric_dir, 'hours_above')))
+        hrs_above = read_hours_from_folder(os.path.join(metric_dir, 'hours_above'))
+    elif os.path.basename(os.path.normpath(res_folder)) == DIRECT_SUN_FOLDER:
+        ASE, hrs_above = sunlight_exposure_from_folder(
+            res_folder, schedule, _occ_hours_, grid_filter_)
+    elif direct_:  # legacy results of direct illuminance
+        ASE, hrs_above = sunlight_exposure_from_folder(
+            res_folder, schedule, _occ_hours_, grid_filter_, _direct_threshold_)
     else:
         raise ValueError(
             'Invalid results folder!\n'
-            'Make sure an enhanced daylight simulation was run'
+            'Make sure an enhanced daylight simulation was run or set direct_ '
+            'to True for results of direct illuminance.'
         )
+    mark_phase(profile, 'read')
+    hrs_above = list_to_data_tree(hrs_above)
+    mark_phase(profile, 'tree')
+    write_profile(profile, res_folder)
@@ -33,7 +33,7 @@ aperture geometry that was run in an annual simulation.
 
 ghenv.Component.Name = 'HB Aperture Group Schedule'
 ghenv.Component.NickName = 'GroupSch'
-ghenv.Component.Message = '1.10.0'
+ghenv.Component.Message = '1.10.1'
 ghenv.Component.Category = 'HB-Radiance'
 ghenv.Component.SubCategory = '4 :: Results'
 ghenv.Component.AdditionalHelpFromDocStrings = '1'
@@ -43,11 +43,6 @@ try:
 except ImportError as e:
     raise ImportError('\nFailed to import honeybee:\n\t{}'.format(e))
 
-try:
-    from honeybee_radiance_postprocess.dynamic import ApertureGroupSchedule
-except ImportError as e:
-    raise ImportError('\nFailed to import honeybee_radiance:\n\t{}'.format(e))
-
 try:
     from ladybug_rhino.grasshopper import all_required_inputs, recipe_result
 except ImportError as e:
@@ -55,6 +50,11 @@ except ImportError as e:
 
 
 if all_required_inputs(ghenv.Component):
+    try:  # only load honeybee_radiance_postprocess once there are apertures
+        from honeybee_radiance_postprocess.dynamic import ApertureGroupSchedule
+    except ImportError as e:
+        raise ImportError('\nFailed to import honeybee_radiance_postprocess:\n\t{}'.format(e))
+
     dyn_sch = []
     dyn_ids = set()
     for ap in _group_aps:
@@ -0,0 +1,156 @@
+# Honeybee: A Plugin for Environmental Analysis (GPL)
+# This file is part of Honeybee.
+#
+# Copyright (c) 2026, Ladybug Tools.
+# You should have received a copy of the GNU Affero General Public License
+# along with Honeybee; If not, see <http://www.gnu.org/licenses/>.
+# 
+# @license AGPL-3.0-or-later <https://spdx.org/licenses/AGPL-3.0-or-later>
+
+"""
+Compress the .ill and .dgp files of an annual results folder into binary archives.
+_
+Each result file is converted into chunks of float32 values that are compressed
+with zlib or lzma, which typically makes the results several times smaller than
+the text files and much faster to read. The archives are written next to the
+original files with a .hbz extension and the components under the 4 :: Results
+sub-tab that post-process legacy results folders will read them in place of any
+text files that have been removed.
+_
+Note that float32 values only keep about 7 significant digits. Values are rounded
+back to the decimal places of the text files when they are read from an archive
+such that they match the text files unless they have more than 7 digits.
+
+-
+    Args:
+        _results: An list of annual Radiance result files from the "HB Annual Daylight",
+            "HB Annual Irradiance" or "HB Imageless Annual Glare" components
+            (containing the .ill or .dgp files and the sun-up-hours.txt).
+            This can also be just the path to the folder containing these
+            result files.
+        _compression_: Text for the compression that is used for the archives. Choose
+            from the following options. (Default: zlib).
+                * zlib - fast and readable everywhere
+                * lzma - smaller but slower and only readable with CPython, which
+                    means that the text files cannot be removed
+        _chunk_size_: An integer for the number of sensors that are compressed together
+            in each chunk of an archive. Smaller chunks allow a few sensors
+            to be read more quickly while larger chunks compress slightly
+            better. (Default: 100).
+        remove_text_: Boolean to note whether the text result files should be deleted
+            once their archive has been written. Only the components of this
+            plugin can read the archives so the text files should be kept if
+            the results are post-processed with other tools. (Default: False).
+        _run: Set to True to compress the results.
+
+    Returns:
+        report: Reports, errors, warnings, etc.
+        results: The path to the results folder, which now contains the archives.
+"""
+
+ghenv.Component.Name = 'HB Archive Results'
+ghenv.Component.NickName = 'ArchiveResults'
+ghenv.Component.Message = '1.10.1'
+ghenv.Component.Category = 'HB-Radiance'
+ghenv.Component.SubCategory = '4 :: Results'
+ghenv.Component.AdditionalHelpFromDocStrings = '3'
+
+import os
+import json
+import hashlib
+import tempfile
+
+try:
+    from ladybug.futil import write_to_file
+except ImportError as e:
+    raise ImportError('\nFailed to import ladybug:\n\t{}'.format(e))
+
+try:
+    from ladybug_rhino.grasshopper import all_required_inputs
+except ImportError as e:
+    raise ImportError('\nFailed to import ladybug_rhino:\n\t{}'.format(e))
+
+try:
+    from honeybee_grasshopper_radiance.postprocess import run_postprocess, \
+        timings_report
+except ImportError as e:
+    raise ImportError('\nFailed to import honeybee_grasshopper_radiance:\n\t{}'.format(e))
+
+
+ARCHIVE_SCRIPT = '''
+import os
+import sys
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from honeybee_grasshopper_radiance.postprocess import archive_file, max_jobs
+
+# the pool starts its processes by importing this script on Windows and Mac
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('folder')
+    parser.add_argument('--compression', default='zlib', choices=('zlib', 'lzma'))
+    parser.add_argument('--chunk-rows', type=int, default=100)
+    parser.add_argument('--remove-text', action='store_true')
+    args = parser.parse_args()
+
+    with open(os.path.join(args.folder, 'grids_info.json')) as inf:
+        grids = json.load(inf)
+    res_files = []
+    for grid in grids:
+        for ext in ('.ill', '.dgp'):
+            res_file = os.path.join(args.folder, grid['full_id'] + ext)
+            if os.path.isfile(res_file):
+                res_files.append(res_file)
+
+    # compress the result files in parallel as parsing the text is CPU-bound
+    count = len(res_files)
+    sys.stderr.write('Compressing %d result files\\n' % count)
+    with ProcessPoolExecutor(max_workers=max_jobs()) as executor:
+        summary = list(executor.map(
+            archive_file, res_files, [args.compression] * count,
+            [args.chunk_rows] * count, [args.remove_text] * count))
+    sys.stdout.write(json.dumps(summary))
+'''
+
+
+def archive_script():
+    """Get the path to the script that compresses the result files of a folder."""
+    script_id = hashlib.md5(ARCHIVE_SCRIPT.encode('utf-8')).hexdigest()
+    script = os.path.join(
+        tempfile.gettempdir(), 'hb_radiance_archive_results_{}.py'.format(script_id))
+    if not os.path.isfile(script):
+        write_to_file(script, ARCHIVE_SCRIPT)
+    return script
+
+
+if all_required_inputs(ghenv.Component) and _run:
+    # set default values for the compression
+    _compression_ = 'zlib' if _compression_ is None else _compression_.lower()
+    assert _compression_ in ('zlib', 'lzma'), 'Compression "{}" is not supported. ' \
+        'Choose from zlib or lzma.'.format(_compression_)
+    _chunk_size_ = 100 if _chunk_size_ is None else int(_chunk_size_)
+    assert _chunk_size_ > 0, '_chunk_size_ must be greater than zero.'
+    assert not (remove_text_ and _compression_ == 'lzma'), 'The text files cannot ' \
+        'be removed for lzma archives since the components cannot read these\n' \
+        'archives within Rhino. Use zlib compression to remove the text files.'
+
+    # compress the result files using the Python of the Ladybug Tools installation
+    res_folder = os.path.dirname(_results[0]) if os.path.isfile(_results[0]) \
+        else _results[0]
+    cmds = [res_folder, '--compression', _compression_, '--chunk-rows', str(_chunk_size_)]
+    if remove_text_:
+        cmds.append('--remove-text')
+    returncode, stdout, stderr, timings = run_postprocess(
+        ghenv.Component, cmds, res_folder, archive_script())
+    print(timings_report(timings))
+    if returncode != 0:
+        print(stderr)
+        raise ValueError('Failed to compress the results.')
+
+    # report the size of the archives relative to the text files
+    for file_name, text_size, arc_size in json.loads(stdout):
+        print('{}: {:.1f} MB -> {:.1f} MB'.format(
+            file_name, text_size / 1048576.0, arc_size / 1048576.0))
+    results = res_folder
@@ -60,7 +60,7 @@ of view-based simulations, the "HB Point-in-time View-based" recipe should be us
 
 ghenv.Component.Name = 'HB Check Scene'
 ghenv.Component.NickName = 'CheckScene'
-ghenv.Component.Message = '1.10.0'
+ghenv.Component.Message = '1.10.1'
 ghenv.Component.Category = 'HB-Radiance'
 ghenv.Component.SubCategory = '3 :: Recipes'
 ghenv.Component.AdditionalHelpFromDocStrings = '6'
@@ -102,12 +102,13 @@ try:
 except ImportError as e:
     raise ImportError('\nFailed to import ladybug_rhino:\n\t{}'.format(e))
 
-# check the Radiance date of the installed radiance
-try:  # import lbt_recipes dependencies
-    from lbt_recipes.version import check_radiance_date
+try:
+    from honeybee_grasshopper_radiance.version import check_radiance_date_once
 except ImportError as e:
-    raise ImportError('\nFailed to import lbt_recipes:\n\t{}'.format(e))
-check_radiance_date()
+    raise ImportError('\nFailed to import honeybee_grasshopper_radiance:\n\t{}'.format(e))
+
+# check the Radiance date of the installed radiance once per Rhino session
+check_radiance_date_once()
 
 # dictionary of supported metrics
 metric_dict = {
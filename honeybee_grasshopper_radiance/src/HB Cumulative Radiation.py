@@ -47,7 +47,11 @@ Irradiance" recipe.
             tracing. (Default: -ab 2 -ad 5000 -lw 2e-05).
         run_settings_: Settings from the "HB Recipe Settings" component that specify
             how the recipe should be run. This can also be a text string of
-            recipe settings.
+            recipe settings. If the recipe has already been run with the same
+            inputs and folder, the results of that run are loaded instead of
+            running the recipe again. To always run the recipe, set enabled
+            to false in the cache_config.json of the __recipe_cache__ folder
+            within the default simulation folder.
         _run: Set to True to run the recipe and get results. This input can also be
             the integer "2" to run the recipe silently.
 
@@ -59,23 +63,28 @@ Irradiance" recipe.
 
 ghenv.Component.Name = 'HB Cumulative Radiation'
 ghenv.Component.NickName = 'CumulativeRadiation'
-ghenv.Component.Message = '1.10.0'
+ghenv.Component.Message = '1.10.1'
 ghenv.Component.Category = 'HB-Radiance'
 ghenv.Component.SubCategory = '3 :: Recipes'
 ghenv.Component.AdditionalHelpFromDocStrings = '3'
 
 try:
-    from lbt_recipes.recipe import Recipe
+    from ladybug_rhino.grasshopper import all_required_inputs, recipe_result
 except ImportError as e:
-    raise ImportError('\nFailed to import lbt_recipes:\n\t{}'.format(e))
+    raise ImportError('\nFailed to import ladybug_rhino:\n\t{}'.format(e))
 
 try:
-    from ladybug_rhino.grasshopper import all_required_inputs, recipe_result
+    from honeybee_grasshopper_radiance.recipecache import recipe_cache, cache_recipe
 except ImportError as e:
-    raise ImportError('\nFailed to import ladybug_rhino:\n\t{}'.format(e))
+    raise ImportError('\nFailed to import honeybee_grasshopper_radiance:\n\t{}'.format(e))
 
 
 if all_required_inputs(ghenv.Component) and _run:
+    try:  # only load the recipe package once the recipe is run
+        from lbt_recipes.recipe import Recipe
+    except ImportError as e:
+        raise ImportError('\nFailed to import lbt_recipes:\n\t{}'.format(e))
+
     # create the recipe and set the input arguments
     recipe = Recipe('cumulative-radiation')
     recipe.input_value_by_name('model', _model)
@@ -86,9 +95,15 @@ if all_required_inputs(ghenv.Component) and _run:
     recipe.input_value_by_name('grid-filter', grid_filter_)
     recipe.input_value_by_name('radiance-parameters', radiance_par_)
 
-    # run the recipe
-    silent = True if _run > 1 else False
-    project_folder = recipe.run(run_settings_, radiance_check=True, silent=silent)
+    # run the recipe unless it has already been run with the same inputs
+    cache_dir, project_folder = recipe_cache(
+        'cumulative-radiation', run_settings_, _model, _wea, _timestep_, _sky_density_,
+        north_, grid_filter_, radiance_par_)
+    if project_folder is None:
+        silent = True if _run > 1 else False
+        project_folder = recipe.run(run_settings_, radiance_check=True, silent=silent)
+    else:
+        print('Loading the results of a previous run with the same inputs.')
 
     # load the results
     try:
@@ -96,3 +111,8 @@ if all_required_inputs(ghenv.Component) and _run:
         radiation = recipe_result(recipe.output_value_by_name('cumulative-radiation', project_folder))
     except Exception:
         raise Exception(recipe.failure_message(project_folder))
+
+    # record the run so that it is reused by any run with the same inputs
+    evict_msg = cache_recipe('cumulative-radiation', cache_dir, project_folder)
+    if evict_msg is not None:
+        print(evict_msg)
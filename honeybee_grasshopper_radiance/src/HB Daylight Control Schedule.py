@@ -45,6 +45,8 @@ illuminance setpoint everywhere in the room.
             will be used.
         _ill_setpoint_: A number for the illuminance setpoint in lux beyond which
             electric lights are dimmed if there is sufficient daylight.
+            This can also be a list of setpoints in order to compute the
+            schedules of each setpoint in a single pass over the results.
             Some common setpoints are listed below. (Default: 300 lux).
             -
             50 lux - Corridors and hallways.
@@ -55,19 +57,26 @@ illuminance setpoint everywhere in the room.
 
         _min_power_in_: A number between 0 and 1 for the the lowest power the lighting
             system can dim down to, expressed as a fraction of maximum
-            input power. (Default: 0.3).
+            input power. This can also be a list of values, which will be
+            matched with the values of _min_light_out_ to describe several
+            dimming curves. (Default: 0.3).
         _min_light_out_: A number between 0 and 1 the lowest lighting output the lighting
             system can dim down to, expressed as a fraction of maximum light
             output. Note that setting this to 1 means lights aren't dimmed at
             all until the illuminance setpoint is reached. This can be used to
             approximate manual light-switching behavior when used in conjunction
-            with the off_at_min_ output below. (Default: 0.2).
+            with the off_at_min_ output below. This can also be a list of
+            values, which will be matched with the values of _min_power_in_
+            to describe several dimming curves. (Default: 0.2).
         off_at_min_: Boolean to note whether lights should switch off completely when
             they get to the minimum power input. (Default: False).
 
     Returns:
         report: Reports, errors, warnings, etc.
-        rooms: The input Rooms with simple daylight controls assigned to them.
+        schedules: Electric lighting schedules with daylight controls, one for each
+            sensor grid. If several setpoints or dimming curves are input, this
+            will be a data tree with one branch for each combination of setpoint
+            and dimming curve, where the setpoints change the slowest.
 """
 
 ghenv.Component.Name = 'HB Daylight Control Schedule'
@@ -79,7 +88,9 @@ ghenv.Component.AdditionalHelpFromDocStrings = '1'
 
 import os
 import json
-import subprocess
+import hashlib
+import tempfile
+import shutil
 
 try:
     from ladybug.datacollection import BaseCollection
@@ -88,17 +99,8 @@ except ImportError as e:
     raise ImportError('\nFailed to import ladybug:\n\t{}'.format(e))
 
 try:
-    from honeybee.config import folders
-except ImportError as e:
-    raise ImportError('\nFailed to import honeybee:\n\t{}'.format(e))
-
-try:
-    from honeybee_radiance.postprocess.electriclight import daylight_control_schedules
-except ImportError as e:
-    raise ImportError('\nFailed to import honeybee_radiance:\n\t{}'.format(e))
-
-try:
-    from honeybee_radiance_postprocess.dynamic import DynamicSchedule
+    from honeybee_radiance.postprocess.annual import generate_default_schedule, \
+        _process_input_folder
 except ImportError as e:
     raise ImportError('\nFailed to import honeybee_radiance:\n\t{}'.format(e))
 
@@ -110,10 +112,85 @@ except ImportError as e:
     raise ImportError('\nFailed to import honeybee_energy:\n\t{}'.format(e))
 
 try:
-    from ladybug_rhino.grasshopper import all_required_inputs, give_warning
+    from ladybug_rhino.grasshopper import all_required_inputs, list_to_data_tree, \
+        give_warning
 except ImportError as e:
     raise ImportError('\nFailed to import ladybug_rhino:\n\t{}'.format(e))
 
+try:
+    from honeybee_grasshopper_radiance.postprocess import run_postprocess, \
+        timings_report, start_profile, mark_phase, write_profile, input_file, \
+        postprocess_cache, cache_postprocess
+    from honeybee_grasshopper_radiance.results import ARCHIVE_EXT, result_values, \
+        dynamic_schedule
+except ImportError as e:
+    raise ImportError('\nFailed to import honeybee_grasshopper_radiance:\n\t{}'.format(e))
+
+
+CONTROL_SCRIPT = '''
+import os
+import json
+import argparse
+
+import numpy
+from honeybee_radiance_postprocess.dynamic import DynamicSchedule
+from honeybee_radiance_postprocess.annual import occupancy_schedule_8_to_6
+from honeybee_radiance_postprocess.electriclight import array_to_dimming_fraction
+from honeybee_radiance_postprocess.results.annual_daylight import AnnualDaylight
+from honeybee_grasshopper_radiance.postprocess import grid_array
+
+parser = argparse.ArgumentParser()
+parser.add_argument('folder')
+parser.add_argument('output_folder')
+parser.add_argument('--control', nargs=3, type=float, action='append', default=[])
+parser.add_argument('--base-schedule-file', default=None)
+parser.add_argument('--off-at-min', action='store_true')
+parser.add_argument('--states', default=None)
+args = parser.parse_args()
+
+results = AnnualDaylight(args.folder)
+states = DynamicSchedule.from_json(args.states) if args.states else None
+if args.base_schedule_file:
+    with open(args.base_schedule_file) as base_schedule:
+        base_schedule = [float(h) for h in base_schedule.readlines()]
+else:
+    base_schedule = occupancy_schedule_8_to_6(timestep=results.timestep)
+base_schedule = numpy.array(base_schedule)
+grids_info = results.grids_info
+sun_up_hours = [int(h) for h in results.sun_up_hours]
+
+# write the schedules of each control into its own folder
+control_folders = []
+for count in range(len(args.control)):
+    control_folder = os.path.join(args.output_folder, 'control_schedules_{}'.format(count))
+    if not os.path.isdir(control_folder):
+        os.makedirs(control_folder)
+    with open(os.path.join(control_folder, 'grids_info.json'), 'w') as info_file:
+        json.dump(grids_info, info_file)
+    control_folders.append(control_folder)
+
+# load each grid once and compute the schedules of all controls from it
+for grid_info in grids_info:
+    array = grid_array(results, grid_info, states)
+    has_results = numpy.any(array)
+    for (setpt, m_pow, m_lgt), control_folder in zip(args.control, control_folders):
+        dim_fract = array_to_dimming_fraction(
+            array, sun_up_hours, setpt, m_pow, m_lgt, args.off_at_min) \\
+            if has_results else numpy.ones(8760)
+        output_file = os.path.join(control_folder, '{}.txt'.format(grid_info['full_id']))
+        numpy.savetxt(output_file, base_schedule * dim_fract, fmt='%.2f')
+'''
+
+
+def control_script():
+    """Get the path to the script that writes the schedules of several controls."""
+    script_id = hashlib.md5(CONTROL_SCRIPT.encode('utf-8')).hexdigest()
+    script = os.path.join(
+        tempfile.gettempdir(), 'hb_radiance_control_schedules_{}.py'.format(script_id))
+    if not os.path.isfile(script):
+        write_to_file(script, CONTROL_SCRIPT)
+    return script
+
 
 def load_schedules_from_folder(folder):
     """Load schedule values from a folder."""
@@ -129,12 +206,79 @@ def load_schedules_from_folder(folder):
     return sch_vals, sch_ids
 
 
+def dimming_fraction(ill_val, setpoint, min_power, min_light, off_at_min):
+    """Get the fraction of lighting power at an illuminance value.
+
+    This follows the same dimming curve as the daylight_control_schedules
+    function of honeybee-radiance.
+    """
+    if ill_val > setpoint:  # dimmed all of the way
+        return 0 if off_at_min else min_power
+    elif ill_val <= min_light:  # not dimmed at all
+        return 1
+    fract_dim = (setpoint - ill_val) / (setpoint - min_light)
+    return fract_dim + ((1 - fract_dim) * min_power)
+
+
+def control_schedules_from_folder(res_folder, base_schedule, controls, off_at_min):
+    """Get the dimmed schedules of several controls from the .ill files of a folder.
+
+    Each .ill file is only read once regardless of the number of controls.
+
+    Args:
+        res_folder: The path to the folder containing the annual daylight
+            result files.
+        base_schedule: A list of 8760 fractional values for the lighting schedule.
+            If None, a schedule from 9AM to 5PM on weekdays will be used.
+        controls: A list of tuples with an illuminance setpoint, a minimum
+            power input and a minimum light output.
+        off_at_min: Boolean to note whether lights should switch off completely
+            when they get to the minimum power input.
+
+    Returns:
+        A tuple with a list of schedule values for each control (each with one
+        list of values per grid) and a list of schedule identifiers.
+    """
+    if base_schedule is None:
+        base_schedule = generate_default_schedule()
+    grids, sun_up_hours = _process_input_folder(res_folder, '*')
+    sun_up_hours = [int(h) for h in sun_up_hours]
+
+    schedules = [[] for _ in controls]
+    for grid_info in grids:
+        ill_file = os.path.join(res_folder, '%s.ill' % grid_info['full_id'])
+        su_values = [[0] * len(sun_up_hours) for _ in controls]
+        sensor_count = 0
+        if not os.path.isfile(ill_file) and os.path.isfile(ill_file + ARCHIVE_EXT):
+            ill_file = ill_file + ARCHIVE_EXT
+        for values in result_values(ill_file):
+            sensor_count += 1
+            for (setpt, m_pow, m_lgt), c_values in zip(controls, su_values):
+                for i, val in enumerate(values):
+                    c_values[i] += dimming_fraction(val, setpt, m_pow, m_lgt, off_at_min)
+        for c_values, c_schedules in zip(su_values, schedules):
+            dim_fract = [1] * 8760
+            if sensor_count != 0:  # grids without sensors keep the base schedule
+                for val, hr in zip(c_values, sun_up_hours):
+                    dim_fract[hr] = float(val) / sensor_count
+            c_schedules.append([b_val * d_val for b_val, d_val in zip(base_schedule, dim_fract)])
+    sch_ids = ['{} Daylight Control'.format(grid_info['full_id']) for grid_info in grids]
+    return schedules, sch_ids
+
+
 if all_required_inputs(ghenv.Component):
     # set default values for all controls
-    _ill_setpoint_ = 300 if _ill_setpoint_ is None else _ill_setpoint_
-    _min_power_in_ = 0.3 if _min_power_in_ is None else _min_power_in_
-    _min_light_out_ = 0.2 if _min_light_out_ is None else _min_light_out_
+    profile = start_profile(ghenv.Component)
+    setpoints = _ill_setpoint_ if len(_ill_setpoint_) != 0 else [300]
+    min_powers = _min_power_in_ if len(_min_power_in_) != 0 else [0.3]
+    min_lights = _min_light_out_ if len(_min_light_out_) != 0 else [0.2]
     off_at_min_ = False if off_at_min_ is None else off_at_min_
+    curve_count = max(len(min_powers), len(min_lights))
+    assert len(min_powers) in (1, curve_count) and len(min_lights) in (1, curve_count), \
+        'The number of _min_power_in_ and _min_light_out_ values must match.'
+    curves = [(min_powers[min(i, len(min_powers) - 1)],
+               min_lights[min(i, len(min_lights) - 1)]) for i in range(curve_count)]
+    controls = [(setpt, m_pow, m_lgt) for setpt in setpoints for m_pow, m_lgt in curves]
 
     # process the base schedule input into a list of values
     if _base_schedule_ is None:
@@ -151,50 +295,56 @@ if all_required_inputs(ghenv.Component):
     # get the relevant .ill files
     res_folder = os.path.dirname(_results[0]) if os.path.isfile(_results[0]) \
         else _results[0]
+    mark_phase(profile, 'setup')
 
     # check to see if results use the newer numpy arrays
     if os.path.isdir(os.path.join(res_folder, '__static_apertures__')) or \
             os.path.isfile(os.path.join(res_folder, 'grid_states.json')):
-        cmds = [
-            folders.python_exe_path, '-m', 'honeybee_radiance_postprocess',
-            'schedule', 'control-schedules', res_folder,
-            '--ill-setpoint', str(_ill_setpoint_),
-            '--min-power-in', str(_min_power_in_),
-            '--min-light-out', str(_min_light_out_),
-            '--sub-folder', 'schedules'
-        ]
-        if _base_schedule_ is not None:
-            sch_str = '\n'.join(str(h) for h in schedule)
-            sch_file = os.path.join(res_folder, 'schedule.txt')
-            write_to_file(sch_file, sch_str)
-            cmds.extend(['--base-schedule-file', sch_file])
-        if off_at_min_:
-            cmds.append('--off-at-min')
+        dyn_sch = None
         if len(dyn_sch_) != 0:
             if os.path.isfile(os.path.join(res_folder, 'grid_states.json')):
-                dyn_sch = dyn_sch_[0] if isinstance(dyn_sch_[0], DynamicSchedule) else \
-                    DynamicSchedule.from_group_schedules(dyn_sch_)
-                dyn_sch_file = dyn_sch.to_json(folder=res_folder)
-                cmds.extend(['--states', dyn_sch_file])
+                dyn_sch = dynamic_schedule(dyn_sch_)
             else:
                 msg = 'No dynamic aperture groups were found in the Model.\n' \
                     'The input dynamic schedules will be ignored.'
                 print(msg)
                 give_warning(ghenv.Component, msg)
-        use_shell = True if os.name == 'nt' else False
-        custom_env = os.environ.copy()
-        custom_env['PYTHONHOME'] = ''
-        process = subprocess.Popen(
-            cmds, cwd=res_folder, shell=use_shell, env=custom_env,
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        stdout, stderr = process.communicate()  # wait for the process to finish
-        print(stderr)
-        returncode = process.wait()
-        if returncode != 0:
-            raise ValueError('Failed to compute control schedule.')
-        cntrl_dir = os.path.join(res_folder, 'schedules', 'control_schedules')
-        if os.path.isdir(cntrl_dir):
-            sch_vals, sch_ids = load_schedules_from_folder(cntrl_dir)
+
+        # check whether the schedules have already been computed for these inputs
+        dyn_sch_dict = dyn_sch.to_dict() if dyn_sch is not None else None
+        base_sch = list(schedule) if schedule is not None else None
+        sub_folder, is_cached = postprocess_cache(
+            res_folder, 'control-schedules', controls, base_sch, bool(off_at_min_),
+            dyn_sch_dict)
+        if not is_cached:
+            cmds = [res_folder, sub_folder]
+            for setpt, m_pow, m_lgt in controls:
+                cmds.extend(['--control', str(setpt), str(m_pow), str(m_lgt)])
+            if base_sch is not None:
+                sch_str = '\n'.join(str(h) for h in base_sch)
+                sch_file = input_file(res_folder, 'schedule.txt', sch_str)
+                cmds.extend(['--base-schedule-file', sch_file])
+            if off_at_min_:
+                cmds.append('--off-at-min')
+            if dyn_sch is not None:
+                dyn_sch_file = input_file(
+                    res_folder, 'dynamic_schedule.json', json.dumps(dyn_sch_dict))
+                cmds.extend(['--states', dyn_sch_file])
+            returncode, stdout, stderr, timings = run_postprocess(
+                ghenv.Component, cmds, res_folder, control_script())
+            print(stderr)
+            print(timings_report(timings))
+            if returncode != 0:
+                shutil.rmtree(os.path.join(res_folder, sub_folder), ignore_errors=True)
+                raise ValueError('Failed to compute control schedule.')
+            cache_postprocess(res_folder, sub_folder)
+            mark_phase(profile, 'post-process', timings)
+        sch_vals = []
+        for count in range(len(controls)):
+            cntrl_dir = os.path.join(
+                res_folder, sub_folder, 'control_schedules_{}'.format(count))
+            c_vals, sch_ids = load_schedules_from_folder(cntrl_dir)
+            sch_vals.append(c_vals)
 
     else:
         if len(dyn_sch_) != 0:
@@ -202,11 +352,20 @@ if all_required_inputs(ghenv.Component):
                 'simulations.\nThe input schedules will be ignored.'
             print(msg)
             give_warning(ghenv.Component, msg)
-        sch_vals, sch_ids = daylight_control_schedules(
-            res_folder, schedule, _ill_setpoint_, _min_power_in_, _min_light_out_, off_at_min_)
+        sch_vals, sch_ids = control_schedules_from_folder(
+            res_folder, schedule, controls, off_at_min_)
+    mark_phase(profile, 'read')
 
     # create the schedule by combining the base schedule with the dimming fraction
     type_limit = schedule_type_limit_by_identifier('Fractional')
     schedules = []
-    for shc_val, sch_id in zip(sch_vals, sch_ids):
-        schedules.append(ScheduleFixedInterval(sch_id, shc_val, type_limit))
+    for (setpt, m_pow, m_lgt), c_vals in zip(controls, sch_vals):
+        c_schedules = []
+        for shc_val, sch_id in zip(c_vals, sch_ids):
+            if len(controls) != 1:  # give each control a unique identifier
+                sch_id = '{} {} lux {} {}'.format(sch_id, setpt, m_pow, m_lgt)
+            c_schedules.append(ScheduleFixedInterval(sch_id, shc_val, type_limit))
+        schedules.append(c_schedules)
+    schedules = schedules[0] if len(controls) == 1 else list_to_data_tree(schedules)
+    mark_phase(profile, 'tree')
+    write_profile(profile, res_folder)
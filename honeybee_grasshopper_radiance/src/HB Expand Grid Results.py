@@ -0,0 +1,68 @@
+# Honeybee: A Plugin for Environmental Analysis (GPL)
+# This file is part of Honeybee.
+#
+# Copyright (c) 2026, Ladybug Tools.
+# You should have received a copy of the GNU Affero General Public License
+# along with Honeybee; If not, see <http://www.gnu.org/licenses/>.
+#
+# @license AGPL-3.0-or-later <https://spdx.org/licenses/AGPL-3.0-or-later>
+
+"""
+Expand compact Grid Results into a data tree of values for each sensor.
+_
+The components under the 4 :: Results sub-tab that output values for each sensor
+can output a compact Grid Results object (with the values of all sensors in one
+array) when their compact_ input is set to True. This component should only be
+used when the values are needed by components that require a data tree, like the
+"LB Spatial Heatmap" component, and it can output only some of the grids to keep
+the data tree small.
+
+-
+    Args:
+        _grid_res: A compact Grid Results object from the "HB Annual Average Values",
+            "HB Annual Peak Values", "HB Annual Cumulative Values" or "HB Annual
+            Daylight Metrics" component.
+        grid_filter_: The name of a grid or a pattern to filter the grids. For instance,
+            first_floor_* will output only the sensor grids that have an
+            identifier that starts with first_floor_. By default all the grids
+            will be output.
+
+    Returns:
+        report: Reports, errors, warnings, etc.
+        grid_ids: The full identifier of each sensor grid, which aligns with the
+            branches of the values.
+        values: A data tree of values with a branch for each sensor grid and a
+            value for each sensor of the grid. These can be plugged into the
+            "LB Spatial Heatmap" component along with meshes of the sensor grids
+            to visualize results.
+"""
+
+ghenv.Component.Name = 'HB Expand Grid Results'
+ghenv.Component.NickName = 'ExpandGridRes'
+ghenv.Component.Message = '1.10.1'
+ghenv.Component.Category = 'HB-Radiance'
+ghenv.Component.SubCategory = '4 :: Results'
+ghenv.Component.AdditionalHelpFromDocStrings = '2'
+
+try:
+    from honeybee_radiance.writer import _filter_by_pattern
+except ImportError as e:
+    raise ImportError('\nFailed to import honeybee_radiance:\n\t{}'.format(e))
+
+try:
+    from ladybug_rhino.grasshopper import all_required_inputs, list_to_data_tree
+except ImportError as e:
+    raise ImportError('\nFailed to import ladybug_rhino:\n\t{}'.format(e))
+
+
+if all_required_inputs(ghenv.Component):
+    assert hasattr(_grid_res, 'grid_values'), 'Expected compact Grid Results. ' \
+        'Got {}.'.format(type(_grid_res))
+    print(_grid_res)
+
+    # get the values of the grids that match the filter
+    grid_filter_ = '*' if grid_filter_ is None else grid_filter_
+    grids = [{'full_id': grid_id} for grid_id in _grid_res.grid_ids]
+    grid_ids = [grid['full_id'] for grid in _filter_by_pattern(grids, grid_filter_)]
+    values = [_grid_res.grid_values(grid_id) for grid_id in grid_ids]
+    values = list_to_data_tree(values)
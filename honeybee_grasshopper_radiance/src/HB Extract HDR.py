@@ -34,7 +34,7 @@ conversions between 180 FOV angular and hemispherical HDR images can be made.
 
 ghenv.Component.Name = 'HB Extract HDR'
 ghenv.Component.NickName = 'ExtractHDR'
-ghenv.Component.Message = '1.10.0'
+ghenv.Component.Message = '1.10.1'
 ghenv.Component.Category = 'HB-Radiance'
 ghenv.Component.SubCategory = '4 :: Results'
 ghenv.Component.AdditionalHelpFromDocStrings = '0'
@@ -60,12 +60,13 @@ try:  # import ladybug_rhino dependencies
 except ImportError as e:
     raise ImportError('\nFailed to import ladybug_rhino:\n\t{}'.format(e))
 
-# check the Radiance date of the installed radiance
-try:  # import lbt_recipes dependencies
-    from lbt_recipes.version import check_radiance_date
+try:
+    from honeybee_grasshopper_radiance.version import check_radiance_date_once
 except ImportError as e:
-    raise ImportError('\nFailed to import lbt_recipes:\n\t{}'.format(e))
-check_radiance_date()
+    raise ImportError('\nFailed to import honeybee_grasshopper_radiance:\n\t{}'.format(e))
+
+# check the Radiance date of the installed radiance once per Rhino session
+check_radiance_date_once()
 
 
 def check_view_hdr(hdr_path):
@@ -52,7 +52,7 @@ Convert a High Dynamic Range (HDR) image file into a falsecolor version of itsel
 
 ghenv.Component.Name = 'HB False Color'
 ghenv.Component.NickName = 'FalseColor'
-ghenv.Component.Message = '1.10.0'
+ghenv.Component.Message = '1.10.1'
 ghenv.Component.Category = 'HB-Radiance'
 ghenv.Component.SubCategory = '4 :: Results'
 ghenv.Component.AdditionalHelpFromDocStrings = '3'
@@ -77,12 +77,13 @@ try:  # import ladybug_rhino dependencies
 except ImportError as e:
     raise ImportError('\nFailed to import ladybug_rhino:\n\t{}'.format(e))
 
-# check the Radiance date of the installed radiance
-try:  # import lbt_recipes dependencies
-    from lbt_recipes.version import check_radiance_date
+try:
+    from honeybee_grasshopper_radiance.version import check_radiance_date_once
 except ImportError as e:
-    raise ImportError('\nFailed to import lbt_recipes:\n\t{}'.format(e))
-check_radiance_date()
+    raise ImportError('\nFailed to import honeybee_grasshopper_radiance:\n\t{}'.format(e))
+
+# check the Radiance date of the installed radiance once per Rhino session
+check_radiance_date_once()
 
 
 def sense_metric_from_hdr(hdr_path):
@@ -64,7 +64,7 @@ http://web.mit.edu/tito_/www/Projects/Glare/GlareRecommendationsForPractice.html
 
 ghenv.Component.Name = 'HB Glare Postprocess'
 ghenv.Component.NickName = 'Glare'
-ghenv.Component.Message = '1.10.0'
+ghenv.Component.Message = '1.10.1'
 ghenv.Component.Category = 'HB-Radiance'
 ghenv.Component.SubCategory = '4 :: Results'
 ghenv.Component.AdditionalHelpFromDocStrings = '3'
@@ -84,12 +84,13 @@ try:  # import ladybug_rhino dependencies
 except ImportError as e:
     raise ImportError('\nFailed to import ladybug_rhino:\n\t{}'.format(e))
 
-# check the Radiance date of the installed radiance
-try:  # import lbt_recipes dependencies
-    from lbt_recipes.version import check_radiance_date
+try:
+    from honeybee_grasshopper_radiance.version import check_radiance_date_once
 except ImportError as e:
-    raise ImportError('\nFailed to import lbt_recipes:\n\t{}'.format(e))
-check_radiance_date()
+    raise ImportError('\nFailed to import honeybee_grasshopper_radiance:\n\t{}'.format(e))
+
+# check the Radiance date of the installed radiance once per Rhino session
+check_radiance_date_once()
 
 
 def check_hdr_luminance_and_fisheye(hdr_path):
@@ -0,0 +1,146 @@
+# Honeybee: A Plugin for Environmental Analysis (GPL)
+# This file is part of Honeybee.
+#
+# Copyright (c) 2026, Ladybug Tools.
+# You should have received a copy of the GNU Affero General Public License
+# along with Honeybee; If not, see <http://www.gnu.org/licenses/>.
+#
+# @license AGPL-3.0-or-later <https://spdx.org/licenses/AGPL-3.0-or-later>
+
+"""
+Record the time and memory that each phase of the result components takes and
+summarize the hot spots of the recorded solutions.
+_
+While profiling is enabled, each solution of the components under the 4 :: Results
+sub-tab that post-process annual results appends a line to a hb_radiance_profile.jsonl
+log in its results folder. Each line notes the seconds and the peak memory of the
+Rhino process for the phases of the solution, which are typically:
+    * setup - processing the inputs and checking the cache of the results folder
+    * post-process - running a command with the Python of the Ladybug Tools
+        installation (including the start, queue and run of the command)
+    * read - parsing the result files
+    * tree - converting the results to Grasshopper data trees
+_
+Note that components only record their phases when they are re-computed after
+profiling has been enabled.
+
+-
+    Args:
+        _profile: Set to True to start recording the solutions of the result components
+            and set to False to stop recording them.
+        logs_: An optional list of hb_radiance_profile.jsonl files or results folders
+            containing such logs to be summarized. If unspecified, all of the
+            solutions that have been recorded in this Rhino session will be
+            summarized.
+
+    Returns:
+        report: Reports, errors, warnings, etc.
+        hot_spots: A list of text for each phase of each component, sorted by the total
+            seconds that the phase took across all recorded solutions. Each
+            item includes the number of solutions, the mean and maximum
+            seconds and the most that the phase has raised the peak memory.
+            The start, queue and run of post-process commands are also
+            included as separate items.
+        logs: The paths to the log files that were summarized.
+"""
+
+ghenv.Component.Name = 'HB Profile Components'
+ghenv.Component.NickName = 'Profile'
+ghenv.Component.Message = '1.10.1'
+ghenv.Component.Category = 'HB-Radiance'
+ghenv.Component.SubCategory = '4 :: Results'
+ghenv.Component.AdditionalHelpFromDocStrings = '2'
+
+import os
+import json
+import uuid
+
+try:
+    from ladybug_rhino.grasshopper import all_required_inputs
+except ImportError as e:
+    raise ImportError('\nFailed to import ladybug_rhino:\n\t{}'.format(e))
+
+try:
+    from honeybee_grasshopper_radiance.postprocess import PROFILE_LOG
+except ImportError as e:
+    raise ImportError('\nFailed to import honeybee_grasshopper_radiance:\n\t{}'.format(e))
+
+try:
+    import scriptcontext as sc
+except ImportError as e:
+    raise ImportError('\nFailed to import scriptcontext:\n\t{}'.format(e))
+
+
+def read_records(log_file, session=None):
+    """Get the records of the solutions in a log, optionally only for one session."""
+    records = []
+    with open(log_file) as log:
+        for line in log:
+            try:
+                record = json.loads(line)
+            except ValueError:  # line that was not completely written
+                continue
+            if session is None or record.get('session') == session:
+                records.append(record)
+    return records
+
+
+def summarize_phases(records):
+    """Get a list of statistics for each phase of each component in the records.
+
+    The start, queue and run of a post-process are summarized as phases of their
+    own and the list is sorted by the total seconds of the phase across the records.
+    """
+    phases = {}
+
+    def add_phase(key, seconds, growth):
+        stat = phases.setdefault(key, {'count': 0, 'total': 0, 'max': 0, 'growth': 0})
+        stat['count'] += 1
+        stat['total'] += seconds
+        stat['max'] = max(stat['max'], seconds)
+        stat['growth'] = max(stat['growth'], growth or 0)
+
+    for record in records:
+        for phase in record['phases']:
+            add_phase((record['component'], phase['phase']),
+                      phase['seconds'], phase.get('growth_mb'))
+            for sub_phase in ('start', 'queue', 'run'):
+                if sub_phase in phase:
+                    key = (record['component'], '{} {}'.format(phase['phase'], sub_phase))
+                    add_phase(key, phase[sub_phase], None)
+    summary = [(key, stat) for key, stat in phases.items()]
+    summary.sort(key=lambda item: item[1]['total'], reverse=True)
+    return summary
+
+
+if all_required_inputs(ghenv.Component):
+    # turn profiling on or off for all of the result components
+    sc.sticky['hb_radiance_profile'] = bool(_profile)
+    if _profile:
+        sc.sticky.setdefault('hb_radiance_profile_session', str(uuid.uuid4()))
+
+    # gather the logs to be summarized
+    if len(logs_) == 0:
+        session = sc.sticky.get('hb_radiance_profile_session')
+        logs = list(sc.sticky.get('hb_radiance_profile_logs', []))
+    else:
+        session = None
+        logs = [os.path.join(log, PROFILE_LOG) if os.path.isdir(log) else log
+                for log in logs_]
+    records = []
+    for log_file in logs:
+        if os.path.isfile(log_file):
+            records.extend(read_records(log_file, session))
+
+    # summarize the hot spots of the recorded solutions
+    hot_spots = []
+    for (component, phase), stat in summarize_phases(records):
+        hot_spots.append(
+            '{} | {}: {:.2f} seconds over {} solutions (mean: {:.3f}, max: {:.3f}, '
+            'peak memory growth: {:.1f} MB)'.format(
+                component, phase, stat['total'], stat['count'],
+                stat['total'] / stat['count'], stat['max'], stat['growth']))
+    total_time = sum(record['seconds'] for record in records)
+    print('{} solutions took {:.2f} seconds in total.'.format(len(records), total_time))
+    if _profile:
+        print('Profiling is enabled. Re-compute the result components to record them.')
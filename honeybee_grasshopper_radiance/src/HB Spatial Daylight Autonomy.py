@@ -24,13 +24,23 @@ compliant.
 -
     Args:
         _DA: A data tree of daylight autonomy values output from the "HB Annual Dalyight"
-            recipe or the "HB Annual Daylight Metrics" component. Note that,
-            unless these DA values follow LM83 dynamic blinds setup, the resulting
-            sDA is not LEED compliant.
+            recipe or the "HB Annual Daylight Metrics" component. This can also
+            be the compact Grid Results of the "HB Annual Daylight Metrics"
+            component. Note that, unless these DA values follow LM83 dynamic
+            blinds setup, the resulting sDA is not LEED compliant.
         mesh_: An optional list of Meshes that align with the _DA data tree above, which
             will be used to assign an area to each sensor. If no mesh is connected
             here, it will be assumed that each sensor represents an equal area
             to all of the others.
+        results_: An optional path to the results folder of the "HB Annual Daylight"
+            component, which contains the area of each sensor's mesh face. If
+            supplied, these areas will be used to weight the sensors instead of
+            the mesh_ above, which avoids converting the meshes on every solve.
+            The branches of the _DA data tree must follow the order of the grids
+            in this folder unless _DA is a compact Grid Results object, in
+            which case the areas are matched to the grids using their identifiers.
+            An error is raised if the areas in the folder were recorded for
+            results other than the ones that are currently in it.
         _target_time_: A minimum threshold of occupied time (eg. 50% of the time), above
             which a given sensor passes and contributes to the spatial daylight
             autonomy. (Default: 50%).
@@ -47,11 +57,14 @@ compliant.
 
 ghenv.Component.Name = 'HB Spatial Daylight Autonomy'
 ghenv.Component.NickName = 'sDA'
-ghenv.Component.Message = '1.10.0'
+ghenv.Component.Message = '1.10.1'
 ghenv.Component.Category = 'HB-Radiance'
 ghenv.Component.SubCategory = '4 :: Results'
 ghenv.Component.AdditionalHelpFromDocStrings = '1'
 
+import os
+import json
+
 try:
     from ladybug_rhino.togeometry import to_mesh3d
 except ImportError as e:
@@ -64,23 +77,80 @@ except ImportError as e:
     raise ImportError('\nFailed to import ladybug_rhino:\n\t{}'.format(e))
 
 
+def sensor_areas_from_folder(res_folder, grid_ids=None):
+    """Get the face area of each sensor for the grids in a results folder.
+
+    The areas of a grid will be None if they were not recorded in the folder.
+    An exception is raised if the areas were written for results other than
+    those currently in the folder, like when the folder has been overwritten
+    by a run of another model that did not record its areas.
+
+    Args:
+        res_folder: The results folder containing the sensor_areas.json.
+        grid_ids: An optional list of the full_id of the grids for which areas
+            will be returned. If None, the areas will be returned for all of the
+            grids in the grids_info.json of the folder.
+    """
+    areas_file = os.path.join(res_folder, 'sensor_areas.json')
+    if not os.path.isfile(areas_file):
+        raise ValueError(
+            'No sensor areas were found in the results folder:\n{}'.format(res_folder))
+    with open(areas_file) as inf:
+        areas_dict = json.load(inf)
+
+    # check that the areas belong to the results in the folder
+    info_file = os.path.join(res_folder, 'grids_info.json')
+    info_stat = os.stat(info_file)
+    with open(info_file) as inf:
+        grids_info = json.load(inf)
+    counts = {grid['full_id']: grid.get('count') for grid in grids_info}
+    areas = areas_dict.get('areas', {})
+    mismatch = [grid_id for grid_id, grid_areas in areas.items()
+                if grid_id in counts and counts[grid_id] is not None and
+                counts[grid_id] != len(grid_areas)]
+    if areas_dict.get('grids_info') != [info_stat.st_size, int(info_stat.st_mtime)] \
+            or mismatch:
+        raise ValueError(
+            'The sensor areas in the results folder are out of date:\n{}\nRe-run '
+            'the "HB Annual Daylight" component or connect the mesh_ instead '
+            'of the results_.'.format(res_folder))
+
+    if grid_ids is None:
+        grid_ids = [grid['full_id'] for grid in grids_info]
+    return [areas.get(grid_id) for grid_id in grid_ids]
+
+
 if all_required_inputs(ghenv.Component):
     # process the input values into a rokable format
     da_mtx = [item[-1] for item in data_tree_to_list(_DA)]
+    grid_ids = None
+    if len(da_mtx) == 1 and len(da_mtx[0]) == 1 and hasattr(da_mtx[0][0], 'to_lists'):
+        # compact Grid Results from the "HB Annual Daylight Metrics" component
+        grid_ids = da_mtx[0][0].grid_ids
+        da_mtx = da_mtx[0][0].to_lists()
     _target_time_ = 50 if _target_time_ is None else _target_time_
-    lb_meshes = [to_mesh3d(mesh) for mesh in mesh_]
+
+    # get the area of each sensor from the results folder or the meshes
+    if results_ is not None:
+        res_folder = os.path.dirname(results_) if os.path.isfile(results_) \
+            else results_
+        grid_areas = sensor_areas_from_folder(res_folder, grid_ids)
+        assert len(grid_areas) == len(da_mtx), 'The number of grids in the results ' \
+            'folder ({}) does not match the _DA ({}).'.format(len(grid_areas), len(da_mtx))
+    else:
+        grid_areas = [to_mesh3d(mesh).face_areas for mesh in mesh_]
 
     # determine whether each point passes or fails
     pass_fail = [[int(val > _target_time_) for val in grid] for grid in da_mtx]
 
     # compute spatial daylight autonomy from the pass/fail results
-    if len(lb_meshes) == 0:  # all sensors represent the same area
-        sDA = [round(sum(pf_list) / len(pf_list) * 100, 2) for pf_list in pass_fail]
-    else:  # weight the sensors based on the area of mesh faces
-        sDA = []
-        for i, mesh in enumerate(lb_meshes):
-            m_area = mesh.area
-            weights = [fa / m_area for fa in mesh.face_areas]
-            sDA.append(round(sum(v * w for v, w in zip(pass_fail[i], weights)) * 100, 2))
+    sDA = []
+    for i, pf_list in enumerate(pass_fail):
+        areas = grid_areas[i] if i < len(grid_areas) else None
+        if not areas:  # all sensors represent the same area
+            sDA.append(round(sum(pf_list) / len(pf_list) * 100, 2))
+        else:  # weight the sensors based on the area of mesh faces
+            pass_area = sum(fa for fa, v in zip(areas, pf_list) if v)
+            sDA.append(round(pass_area / sum(areas) * 100, 2))
 
     pass_fail = list_to_data_tree(pass_fail)  # convert matrix to data tree
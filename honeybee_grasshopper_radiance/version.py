@@ -0,0 +1,23 @@
+"""Check the installation of Radiance that is used by the components."""
+
+try:
+    import scriptcontext as sc
+    sticky = sc.sticky
+except ImportError:  # not running inside of Rhino
+    sticky = {}
+
+
+def check_radiance_date_once():
+    """Check that the date of the installed Radiance is compatible once per Rhino session.
+
+    The check is recorded in the sticky such that components that call this
+    every time that they solve only pay for the check the first time.
+    """
+    if sticky.get('radiance_date_checked'):
+        return
+    try:  # import lbt_recipes dependencies
+        from lbt_recipes.version import check_radiance_date
+    except ImportError as e:
+        raise ImportError('\nFailed to import lbt_recipes:\n\t{}'.format(e))
+    check_radiance_date()
+    sticky['radiance_date_checked'] = True